@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+""" Settings commit benchmark.
+
+Times representative sequences of *set_* and *gen_* calls with autocommit,
+each call committing as it would in a user script, and the same sequences
+merged in to one commit by deferred_commit. Runs against the local emulator,
+so the time includes a loopback network round trip per request but not the
+device's own processing.
+"""
+import timeit
+
+from pymoku.instruments import Oscilloscope, WaveformGenerator
+from pymoku.tools.emulator import emulated_moku
+
+UNIT = 'ns'
+
+N = 20
+
+
+def _osc_setup(i):
+    i.set_frontend(1, fiftyr=True)
+    i.set_frontend(2, fiftyr=True)
+    i.set_timebase(-1e-3, 1e-3)
+    i.set_trigger('in1', 'rising', 0)
+
+
+def _wavegen_setup(i):
+    i.gen_sinewave(1, 0.5, 1e6)
+    i.gen_squarewave(2, 0.5, 1e3)
+
+
+def _deferred(fn):
+    def run(i):
+        with i.deferred_commit():
+            fn(i)
+    return run
+
+
+_SEQUENCES = [
+    ('osc_timebase', Oscilloscope, lambda i: i.set_timebase(-1e-3, 1e-3)),
+    ('osc_setup', Oscilloscope, _osc_setup),
+    ('osc_setup_deferred', Oscilloscope, _deferred(_osc_setup)),
+    ('wavegen_setup', WaveformGenerator, _wavegen_setup),
+    ('wavegen_setup_deferred', WaveformGenerator, _deferred(_wavegen_setup)),
+]
+
+
+def run(n=N):
+    """ Returns a dict of benchmark name to time per sequence in ns. """
+    results = {}
+
+    with emulated_moku(frame_rate=0) as (_, m):
+        for name, cls, seq in _SEQUENCES:
+            i = m.deploy_instrument(cls)
+            results[name] = min(timeit.repeat(lambda: seq(i), number=n,
+                                              repeat=3)) / n * 1e9
+
+    return results
+
+
+def main():
+    for name, t in sorted(run().items()):
+        print("%-24s %12.1f ns" % (name, t))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+""" Stream data parsing benchmark.
+
+Measures the rate, in rows per second, at which two-channel Datalogger and
+Phasemeter records are parsed by each available data parser, formatted as
+CSV, and read back from an LI file. A row is one time-aligned record from
+each channel, i.e. one line of CSV.
+
+The records are synthetic, packed to the instruments' binary record formats;
+the processing and format strings are taken from instruments deployed on the
+local emulator.
+"""
+import os
+import shutil
+import tempfile
+import timeit
+
+from pymoku import dataparser
+from pymoku.dataparser import SlowDataParser, ArrayDataParser
+from pymoku.dataparser import LIDataFileReader, LIDataFileWriterV1
+from pymoku.instruments import Datalogger, Phasemeter
+from pymoku.tools.emulator import _pack_records, emulated_moku
+
+UNIT = 'rows/s'
+
+ROWS = 4096
+
+# Records per chunk, as the device sends them
+_CHUNK = 256
+
+
+def _formats(m):
+    fmts = {}
+
+    for name, cls in [('datalogger', Datalogger), ('phasemeter', Phasemeter)]:
+        i = m.deploy_instrument(cls)
+        i.ch1 = i.ch2 = True
+        i.nch = 2
+        i._update_datalogger_params()
+        fmts[name] = (i.id, i.binstr, list(i.procstr), i.fmtstr, i.hdrstr,
+                      i.timestep)
+
+    return fmts
+
+
+def _parsers(binstr, procstr):
+    parsers = {'slow': SlowDataParser}
+
+    if dataparser.LIDataParser is not SlowDataParser:
+        parsers['fast'] = dataparser.LIDataParser
+
+    if ArrayDataParser.supports(binstr, procstr):
+        parsers['array'] = ArrayDataParser
+
+    return parsers
+
+
+def _chunks(binstr, rows):
+    data = _pack_records(binstr, rows)
+    step = len(data) * _CHUNK // rows
+    return [data[x:x + step] for x in range(0, len(data), step)]
+
+
+def _new_parser(cls, fmt):
+    instr, binstr, procstr, fmtstr, hdrstr, timestep = fmt
+    return cls(True, True, binstr, procstr, fmtstr, hdrstr, timestep, 0,
+               [1.0, 1.0], 0)
+
+
+def _parse(cls, fmt, chunks):
+    p = _new_parser(cls, fmt)
+    for ch in (0, 1):
+        idx = 0
+        for c in chunks:
+            p.parse(c, ch, start_idx=idx)
+            idx += len(c)
+    return p
+
+
+def _write_li(fname, fmt, chunks):
+    instr, binstr, procstr, fmtstr, hdrstr, timestep = fmt
+    w = LIDataFileWriterV1(fname, instr, 0, 3, binstr, procstr, fmtstr,
+                           hdrstr, [1.0, 1.0], timestep, 0)
+    for c in chunks:
+        w.add_data(c, 0)
+        w.add_data(c, 1)
+    w.finalize()
+
+
+def _read_li(fname):
+    reader = LIDataFileReader(fname)
+    try:
+        return reader.readall()
+    finally:
+        reader.close()
+
+
+def _rate(fn, rows, setup=None):
+    def timed():
+        args = setup() if setup else ()
+        t0 = timeit.default_timer()
+        fn(*args)
+        return timeit.default_timer() - t0
+
+    return rows / min(timed() for _ in range(3))
+
+
+def run(rows=ROWS):
+    """ Returns a dict of benchmark name to rows per second. """
+    results = {}
+    tmp = tempfile.mkdtemp()
+
+    with emulated_moku(frame_rate=0) as (_, m):
+        fmts = _formats(m)
+
+    try:
+        for name, fmt in fmts.items():
+            binstr, procstr = fmt[1], fmt[2]
+            chunks = _chunks(binstr, rows)
+
+            for pname, cls in _parsers(binstr, procstr).items():
+                results['parse_%s_%s' % (name, pname)] = _rate(
+                    lambda: _parse(cls, fmt, chunks), rows)
+
+            # CSV formatting of already processed records
+            results['csv_%s' % name] = _rate(
+                lambda p: p.dump_csv(), rows,
+                setup=lambda: (_parse(SlowDataParser, fmt, chunks),))
+
+            fname = os.path.join(tmp, name + '.li')
+            _write_li(fname, fmt, chunks)
+            results['lireader_%s' % name] = _rate(
+                lambda: _read_li(fname), rows)
+    finally:
+        shutil.rmtree(tmp)
+
+    return results
+
+
+def main():
+    for name, r in sorted(run().items()):
+        print("%-28s %12.0f rows/s" % (name, r))
+
+
+if __name__ == '__main__':
+    main()
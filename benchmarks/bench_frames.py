@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+""" Frame decode benchmark.
+
+Times decoding one frame (both channel packets, through add_packet and
+process_complete) of VoltsData, SpectrumData and FRAData from synthetic
+packets, against instruments deployed on the local emulator so that their
+scales come from a real commit. The *_py* cases disable NumPy to show the
+pure Python fallback.
+"""
+import math
+import struct
+import timeit
+
+from pymoku import _frequency_response_analyzer_data, _specan_data
+from pymoku.instruments import Oscilloscope, SpectrumAnalyzer
+from pymoku.instruments import FrequencyResponseAnalyzer
+from pymoku.instruments import VoltsData, SpectrumData, FRAData
+from pymoku.tools.emulator import emulated_moku
+
+UNIT = 'ns'
+
+N = 200
+
+_HDR = struct.Struct('<BBBBI')
+
+
+def _packets(i, samples):
+    data = struct.pack('<%di' % len(samples), *samples)
+    return [_HDR.pack(i._stateid, i._stateid, chan, i.id, 1) +
+            b'\x00' * 32 + data for chan in (0, 1)]
+
+
+def _decoder(cls, i, packets):
+    def decode():
+        fr = cls(instrument=i, scales=i.scales)
+        for p in packets:
+            fr.add_packet(p)
+        return fr
+    return decode
+
+
+def _without_numpy(module, fn):
+    def run():
+        np, module.np = module.np, None
+        try:
+            return fn()
+        finally:
+            module.np = np
+    return run
+
+
+def _cases(m):
+    cases = {}
+
+    i = m.deploy_instrument(Oscilloscope)
+    i._data_syncd = True
+    samples = [int(2 ** 20 * math.sin(x / 50.0)) for x in range(1024)]
+    cases['volts'] = _decoder(VoltsData, i, _packets(i, samples))
+
+    i = m.deploy_instrument(SpectrumAnalyzer)
+    i._data_syncd = True
+    samples = [1000 + x for x in range(1024)]
+    decode = _decoder(SpectrumData, i, _packets(i, samples))
+    cases['spectrum'] = decode
+    cases['spectrum_py'] = _without_numpy(_specan_data, decode)
+
+    i = m.deploy_instrument(FrequencyResponseAnalyzer)
+    i._data_syncd = True
+    n = len(i.scales[i._stateid]['gain_correction'])
+    samples = [1000 * (k % 7 - 3) + 1 for k in range(2 * n)]
+    decode = _decoder(FRAData, i, _packets(i, samples))
+    cases['fra'] = decode
+    cases['fra_py'] = _without_numpy(_frequency_response_analyzer_data,
+                                     decode)
+
+    return cases
+
+
+def run(n=N):
+    """ Returns a dict of benchmark name to time per frame in ns. """
+    results = {}
+
+    with emulated_moku(frame_rate=0) as (_, m):
+        for name, fn in _cases(m).items():
+            results[name] = min(timeit.repeat(fn, number=n, repeat=3)) \
+                / n * 1e9
+
+    return results
+
+
+def main():
+    for name, t in sorted(run().items()):
+        print("%-20s %12.1f ns" % (name, t))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+""" Protocol codec micro-benchmark.
+
+Compares building and parsing property and register packets with
+pymoku._protocol against the byte-slicing code that Moku._get_properties and
+_read_regs used, for a calibration-sized property section.
+
+Runs without a Moku:Lab attached.
+"""
+import struct
+import timeit
+
+from pymoku import _protocol
+
+UNIT = 'ns'
+
+N = 2000
+
+PROPS = [('calibration.%s-%d' % (k, ch), '%.6f' % (i * 0.1))
+         for i, k in enumerate(['AG', 'AO', 'DG', 'DO', 'DOT', 'DGT'] * 20)
+         for ch in (1, 2)]
+
+
+def _old_request(seq, properties):
+    pkt = bytearray([0x46, seq, len(properties)])
+    for p in properties:
+        pkt += bytearray([1, len(p)])
+        pkt += p.encode('ascii')
+        pkt += bytearray([0])
+    return pkt
+
+
+def _old_parse(reply):
+    hdr, seq, stat, nr = struct.unpack("<BBBB", reply[:4])
+    reply = reply[4:]
+    ret = []
+    for n in range(nr):
+        plen, reply = ord(reply[:1]), reply[1:]
+        p, reply = reply[:plen].decode('ascii'), reply[plen:]
+        dlen, reply = ord(reply[:1]), reply[1:]
+        d, reply = reply[:dlen].decode('ascii'), reply[dlen:]
+        ret.append((p, d))
+    return ret
+
+
+def _old_regs(ack, n):
+    return [struct.unpack('<BI', ack[x:x + 5]) for x in range(3, n * 5, 5)]
+
+
+def run(n=N):
+    """ Returns a dict of benchmark name to time per operation in ns. """
+    names = [p for p, _ in PROPS]
+    reply = bytes(_protocol.pack_property_reply(1, 0, PROPS))
+    regs = bytes(_protocol.pack_reg_reply([(r, r) for r in range(128)]))
+
+    cases = {
+        'prop_request': lambda: _protocol.pack_property_read(1, names),
+        'prop_request_old': lambda: _old_request(1, names),
+        'prop_parse': lambda: _protocol.unpack_property_reply(reply),
+        'prop_parse_old': lambda: _old_parse(reply),
+        'reg_parse': lambda: _protocol.unpack_reg_reply(regs),
+        'reg_parse_old': lambda: _old_regs(regs, 128),
+    }
+
+    return {name: min(timeit.repeat(fn, number=n, repeat=3)) / n * 1e9
+            for name, fn in cases.items()}
+
+
+def main():
+    for name, t in sorted(run().items()):
+        print("%-20s %10.1f ns" % (name, t))
+
+
+if __name__ == '__main__':
+    main()
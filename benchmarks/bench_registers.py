@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+""" Register accessor micro-benchmark.
+
+Compares reading and writing instrument register attributes through the
+class-level descriptors against the per-access table lookup (the
+_accessor_get/_accessor_set path that __getattr__/__setattr__ used), and
+against building the to_reg/from_reg transforms on every access as the
+Trigger, PID and SweepGenerator properties used to.
+
+Runs without a Moku:Lab attached.
+"""
+import timeit
+
+from pymoku.instruments import Oscilloscope
+from pymoku._instrument import to_reg_signed, from_reg_signed
+
+UNIT = 'ns'
+
+N = 100000
+
+
+def _instrument():
+    i = Oscilloscope()
+    i._remoteregs = [0] * 128
+    i._localregs = [None] * 128
+    return i
+
+
+def run(n=N):
+    """ Returns a dict of benchmark name to time per operation in ns. """
+    i = _instrument()
+    trig = i._trigger
+    reg, set_xform, get_xform = i._accessor_dict['decimation_rate']
+    treg = trig.reg_base + trig._REG_LEVEL
+
+    cases = {
+        'attr_get': lambda: i.decimation_rate,
+        'attr_get_table': lambda: i._accessor_get(reg, get_xform),
+        'attr_set': lambda: setattr(i, 'decimation_rate', 10),
+        'attr_set_table': lambda: i._accessor_set(reg, set_xform, 10),
+        'block_get': lambda: trig.level,
+        'block_get_closure': lambda: i._accessor_get(
+            treg, from_reg_signed(0, 32)),
+        'block_set': lambda: setattr(trig, 'level', 10),
+        'block_set_closure': lambda: i._accessor_set(
+            treg, to_reg_signed(0, 32), 10),
+    }
+
+    return {name: min(timeit.repeat(fn, number=n, repeat=3)) / n * 1e9
+            for name, fn in cases.items()}
+
+
+def main():
+    for name, t in sorted(run().items()):
+        print("%-20s %8.1f ns" % (name, t))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+""" Runs the pymoku benchmarks and records the results as JSON.
+
+    python benchmarks/run.py -o results.json
+    python benchmarks/run.py frames dataparser --compare results.json
+
+Each benchmark module (bench_<name>.py in this directory) has a run()
+function returning a dict of case name to result, and a UNIT saying what the
+results mean: 'ns' per operation, lower is better, or a rate such as
+'rows/s', higher is better. With --compare, each result is checked against
+an earlier JSON file and the run fails if any case is more than --tolerance
+worse.
+
+None of the benchmarks need a Moku:Lab; those that need an attached
+instrument use the local emulator, so the Moku:Lab ports on 127.0.0.1 must
+be free.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+
+import pymoku
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BENCHMARKS = ['protocol', 'registers', 'frames', 'dataparser', 'commit']
+
+
+def _worse(unit, new, old):
+    # Fractional change in the bad direction for this unit. A zero on either
+    # side means a case that didn't run properly, so counts as a regression.
+    if new == old:
+        return 0.0
+    if not new or not old:
+        return float('inf')
+    if unit == 'ns':
+        return new / old - 1
+    return old / new - 1
+
+
+def run(names):
+    """ Runs the named benchmarks, returning the result document. """
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    results = {}
+
+    for name in names:
+        mod = importlib.import_module('bench_' + name)
+        for case, value in mod.run().items():
+            results['%s.%s' % (name, case)] = {'value': value,
+                                               'unit': mod.UNIT}
+
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'pymoku': pymoku.PYMOKU_VERSION,
+        'python': platform.python_version(),
+        'numpy': np.__version__ if np is not None else None,
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def compare(doc, baseline, tolerance):
+    """ Prints each result against *baseline*, returning the names of the
+    cases more than *tolerance* worse. """
+    regressions = []
+
+    for name, r in sorted(doc['results'].items()):
+        old = baseline['results'].get(name)
+        line = "%-36s %14.1f %-6s" % (name, r['value'], r['unit'])
+
+        if old is None or old['unit'] != r['unit']:
+            print(line)
+            continue
+
+        worse = _worse(r['unit'], r['value'], old['value'])
+        flag = ' REGRESSION' if worse > tolerance else ''
+        print("%s %+7.1f%%%s" % (line, -100 * worse, flag))
+        if worse > tolerance:
+            regressions.append(name)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run pymoku benchmarks")
+    parser.add_argument('benchmarks', nargs='*',
+                        help="Benchmarks to run, from %s (default all)"
+                        % ', '.join(BENCHMARKS))
+    parser.add_argument('-o', '--output', help="Write results to this JSON "
+                        "file")
+    parser.add_argument('--compare', help="Compare with results in this JSON "
+                        "file")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="Fraction a case can be worse than the "
+                        "comparison before it's a regression (default 0.1)")
+    args = parser.parse_args()
+
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error("Unknown benchmark(s): %s" % ', '.join(sorted(unknown)))
+
+    doc = run(args.benchmarks or BENCHMARKS)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(doc, f, indent=2, sort_keys=True)
+
+    baseline = {'results': {}}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    regressions = compare(doc, baseline, args.tolerance)
+    if regressions:
+        print("%d regression(s): %s"
+              % (len(regressions), ', '.join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,14 +7,16 @@ import zmq.auth
 import pymoku.version
 
 import pkg_resources
-import threading
 import tarfile
 
 from functools import wraps
+from timeit import default_timer
 import warnings
 
 from pymoku.tools import compat as cp
 from pymoku import dataparser
+from pymoku import _protocol
+from pymoku._rpc import ReqChannel, MuxChannel, RPCStats, rpc_op
 
 __version__ = pkg_resources.get_distribution("pymoku").version
 
@@ -221,7 +223,8 @@ class Moku(object):
     """
     PORT = 27184
 
-    def __init__(self, ip_addr, load_instruments=None, force=False):
+    def __init__(self, ip_addr, load_instruments=None, force=False,
+                 multiplex=False):
         """Create a connection to the Moku:Lab unit at the given IP address
 
         :type ip_addr: string
@@ -236,29 +239,35 @@ class Moku(object):
         :param force: Ignore firmware and network compatibility checks and
         force the instrument to deploy. This is dangerous on many levels, leave
         *False* unless you know what you're doing.
+
+        :type multiplex: bool
+        :param multiplex: Allow control requests from different threads (e.g.
+        register access while a file transfer is running) to overlap rather
+        than queue behind one another. Falls back to one request at a time if
+        the Moku:Lab doesn't respond to multiplexed requests.
         """
         self._ip = ip_addr
         self._seq = 0
         self._instrument = None
         self._known_mokus = []
 
+        # Local cache of instrument state, enabled by deploy_or_connect
+        self._state_cache = None
+
+        # Control channel instrumentation, see enable_rpc_stats
+        self._rpc_stats = None
+        self._rpc_stats_hook = None
+
         self._ctx = zmq.Context.instance()
-        self._conn_lock = threading.RLock()
+        self._encrypted = True
 
         try:
-            self._conn = self._ctx.socket(zmq.REQ)
-            self._conn.setsockopt(zmq.LINGER, 5000)
-            self._conn.curve_publickey, \
-                self._conn.curve_secretkey = zmq.curve_keypair()
-            self._conn.curve_serverkey, _ = \
-                zmq.auth.load_certificate(os.path.join(data_folder, '000'))
-            self._conn.connect("tcp://%s:%d" % (self._ip, Moku.PORT))
+            self._rpc = ReqChannel(self._connect(zmq.REQ))
 
             # Getting the serial should be fairly quick; it's a simple
             # operation. More importantly we don't wait to block the fall-back
             # operation for too long
-            self._conn.setsockopt(zmq.SNDTIMEO, 1000)
-            self._conn.setsockopt(zmq.RCVTIMEO, 1000)
+            self._rpc.set_timeout(1000, 1000)
 
             self.serial = self.get_serial()
             self._set_timeout()
@@ -269,14 +278,16 @@ class Moku(object):
                 raise
 
             # If we're force-connecting, try falling back to non-encrypted.
-            self._conn = self._ctx.socket(zmq.REQ)
-            self._conn.setsockopt(zmq.LINGER, 5000)
-            self._conn.connect("tcp://%s:%d" % (self._ip, Moku.PORT))
+            self._encrypted = False
+            self._rpc = ReqChannel(self._connect(zmq.REQ))
 
             self._set_timeout()
 
             self.serial = self.get_serial()
 
+        if multiplex:
+            self._enable_multiplex()
+
         self.name = None
         self.led = None
         self.led_colours = None
@@ -297,6 +308,41 @@ class Moku(object):
         else:
             self.load_instruments = self.get_bootmode() == 'normal'
 
+    def _connect(self, kind):
+        skt = self._ctx.socket(kind)
+        skt.setsockopt(zmq.LINGER, 5000)
+
+        if self._encrypted:
+            skt.curve_publickey, skt.curve_secretkey = zmq.curve_keypair()
+            skt.curve_serverkey, _ = \
+                zmq.auth.load_certificate(os.path.join(data_folder, '000'))
+
+        skt.connect("tcp://%s:%d" % (self._ip, Moku.PORT))
+        return skt
+
+    def _enable_multiplex(self):
+        # Switch the control channel to a DEALER socket, keeping the REQ
+        # socket if the device doesn't answer on it.
+        if isinstance(self._rpc, MuxChannel):
+            return True
+
+        mux = MuxChannel(self._ctx, self._connect(zmq.DEALER))
+        mux.set_timeout(1000, 1000)
+
+        try:
+            mux.request(_protocol.pack_property_read(self._get_seq(),
+                                                     ['device.serial']))
+        except zmq.error.Again:
+            log.warning("Moku:Lab doesn't support multiplexed requests, "
+                        "falling back to serial requests")
+            mux.close()
+            return False
+
+        self._rpc.close()
+        self._rpc = mux
+        self._set_timeout()
+        return True
+
     @staticmethod
     def list_mokus(timeout=5, all_versions=True):
         """ Discovers all compatible Moku instances on the network.
@@ -460,10 +506,99 @@ class Moku(object):
             if not short:
                 base *= 2
 
-        # A send should always be quick
-        self._conn.setsockopt(zmq.SNDTIMEO, base)
-        # A receive might need to wait on processing
-        self._conn.setsockopt(zmq.RCVTIMEO, 2 * base)
+        # A send should always be quick, a receive might need to wait on
+        # processing
+        self._rpc.set_timeout(base, 2 * base)
+
+    def _transact(self, pkt):
+        # Send a request on the control channel and return the reply. Shadowed
+        # by _transact_timed on the instance while stats are enabled.
+        return self._rpc.request(pkt)
+
+    def _transact_timed(self, pkt):
+        op = rpc_op(pkt)
+        start = default_timer()
+
+        try:
+            reply = self._rpc.request(pkt)
+        except zmq.error.Again:
+            self._record_rpc(op, len(pkt), 0, default_timer() - start, True)
+            raise
+
+        self._record_rpc(op, len(pkt), len(reply), default_timer() - start,
+                         False)
+        return reply
+
+    def _record_rpc(self, op, sent, received, latency, error):
+        self._rpc_stats.add(op, sent, received, latency, error=error)
+
+        hook = self._rpc_stats_hook
+        if hook is not None:
+            # A broken hook mustn't fail the request it's reporting on
+            try:
+                hook(op, sent, received, latency, error)
+            except Exception:
+                log.exception("RPC stats hook failed")
+
+    def enable_rpc_stats(self, hook=None):
+        """ Start recording the number, size and latency of the requests made
+        to the Moku:Lab, read back with :any:`rpc_stats`.
+
+        Recording is off by default and costs nothing until enabled.
+
+        :type hook: callable
+        :param hook: Optional function called after every request with the
+            request type (e.g. ``'register.read'``), bytes sent, bytes
+            received, latency in seconds and whether the request timed out.
+            Called from the thread that made the request so must return
+            promptly; exceptions it raises are logged and otherwise ignored.
+        """
+        if hook is not None and not callable(hook):
+            raise InvalidOperationException("Stats hook must be callable")
+
+        if self._rpc_stats is None:
+            self._rpc_stats = RPCStats()
+
+        self._rpc_stats_hook = hook
+        self._transact = self._transact_timed
+
+    def disable_rpc_stats(self):
+        """ Stop recording request statistics. Those already recorded can
+        still be read with :any:`rpc_stats`. """
+        self._rpc_stats_hook = None
+        self.__dict__.pop('_transact', None)
+
+    def rpc_stats(self):
+        """ Get the request statistics recorded since :any:`enable_rpc_stats`
+        (or :any:`reset_rpc_stats`).
+
+        The returned dictionary holds the device *serial* and *ip*, the
+        *elapsed* time in seconds and, under *ops*, an entry per request type
+        with the *count* of requests, the number of *errors* (timeouts), the
+        *bytes_out* and *bytes_in* and a *latency* histogram of the round
+        trip time in seconds. The histograms have the same form as those of
+        :any:`FrameBasedInstrument.stats
+        <pymoku._frame_instrument.FrameBasedInstrument.stats>`.
+
+        Comparing the total latency against the wall-clock time of a script
+        separates time spent waiting on the network and device from time
+        spent in Python.
+
+        :rtype: dict
+        :return: Request statistics, or *None* if they were never enabled.
+        """
+        if self._rpc_stats is None:
+            return None
+
+        stats = self._rpc_stats.as_dict()
+        stats['serial'] = self.serial
+        stats['ip'] = self._ip
+        return stats
+
+    def reset_rpc_stats(self):
+        """ Reset all counters returned by :any:`rpc_stats` to zero. """
+        if self._rpc_stats is not None:
+            self._rpc_stats.reset()
 
     def _get_seq(self):
         self._seq = (self._seq + 1) % 256
@@ -473,9 +608,7 @@ class Moku(object):
         name = socket.gethostname()[:255]
         packet_data = struct.pack("<BBB", t, len(name) + 1, flags)
         packet_data += name.encode('ascii')
-        with self._conn_lock:
-            self._conn.send(packet_data)
-            rep = self._conn.recv()
+        rep = self._transact(packet_data)
 
         t, plen, own = struct.unpack("<BBB", rep[:3])
         rep = rep[3:]
@@ -537,33 +670,25 @@ class Moku(object):
         return self._ownership(0x41, 0)[0] == 2
 
     def _read_regs(self, commands):
-        packet_data = bytearray([0x47, 0x00, len(commands)])
-        packet_data += b''.join([struct.pack('<B', x) for x in commands])
+        packet_data = _protocol.pack_reg_read(commands)
 
-        with self._conn_lock:
-            self._conn.send(packet_data)
-            ack = self._conn.recv()
+        ack = self._transact(packet_data)
 
-        t, err, length = struct.unpack('<BBB', ack[:3])
+        t, err, regs = _protocol.unpack_reg_reply(ack)
 
-        if t != 0x47 or length != len(commands) or err:
+        if t != _protocol.PKT_REGISTER or len(regs) != len(commands) or err:
             raise NetworkError()
 
-        return [struct.unpack('<BI', ack[x:x + 5])
-                for x in range(3, len(commands) * 5, 5)]
+        return regs
 
     def _write_regs(self, commands):
-        packet_data = bytearray([0x47, 0x00, len(commands)])
-        packet_data += b''.join([struct.pack('<BI', x[0] + 0x80, x[1])
-                                 for x in commands])
+        packet_data = _protocol.pack_reg_write(commands)
 
-        with self._conn_lock:
-            self._conn.send(packet_data)
-            ack = self._conn.recv()
+        ack = self._transact(packet_data)
 
-        t, err, length = struct.unpack('<BBB', ack[:3])
+        t, err, regs = _protocol.unpack_reg_reply(ack)
 
-        if t != 0x47 or err or length:
+        if t != _protocol.PKT_REGISTER or err or regs:
             raise NetworkError()
 
     def _slotdata_write_commit(self):
@@ -592,9 +717,7 @@ class Moku(object):
     def _slot_packet(self, data, read=True):
         packet_data = struct.pack("<BQB", 0x55, len(data), 0 if read else 1)
 
-        with self._conn_lock:
-            self._conn.send(packet_data + data)
-            ack = self._conn.recv()
+        ack = self._transact(packet_data + data)
 
         t, _, c = struct.unpack("<BQQ", ack[:17])
 
@@ -626,9 +749,7 @@ class Moku(object):
 
         flags = (sub_index << 2) | (int(is_partial) << 1) | int(use_external)
 
-        with self._conn_lock:
-            self._conn.send(bytearray([0x43, self._instrument.id, flags]))
-            ack = self._conn.recv()
+        ack = self._transact(bytearray([0x43, self._instrument.id, flags]))
 
         self._set_timeout(short=True)
 
@@ -643,19 +764,13 @@ class Moku(object):
         return struct.unpack("<H", ack[3:5])[0]
 
     def _reset_instrument(self):
-        with self._conn_lock:
-            self._conn.send(bytearray([0x48, self._get_seq()]))
-            self._conn.recv()
+        self._transact(bytearray([0x48, self._get_seq()]))
 
     def _set_clock_source(self, use_external=False):
-        with self._conn_lock:
-            self._conn.send(struct.pack("<BBB", 0x54, 0x01, use_external))
-            self._conn.recv()
+        self._transact(struct.pack("<BBB", 0x54, 0x01, use_external))
 
     def _get_clock_source(self):
-        with self._conn_lock:
-            self._conn.send(bytearray([0x54, 0x02]))
-            ack = self._conn.recv()
+        ack = self._transact(bytearray([0x54, 0x02]))
         status = struct.unpack("<BBB", ack)[2]
 
         return bool(status & 0x02), bool(status & 0x01)
@@ -667,131 +782,51 @@ class Moku(object):
         return self._get_clock_source()[1]
 
     def _get_properties(self, properties):
-        ret = []
-
         if len(properties) > 255:
             raise InvalidOperationException("Properties request too long (%d)"
                                             "" % len(properties))
-        pkt = bytearray([0x46, self._get_seq(), len(properties)])
+        pkt = _protocol.pack_property_read(self._get_seq(), properties)
 
-        for p in properties:
-            pkt += bytearray([1, len(p)])  # Read action
-            pkt += p.encode('ascii')
-            pkt += bytearray([0])  # No data for reads
+        reply = self._transact(pkt)
 
-        with self._conn_lock:
-            self._conn.send(pkt)
-            reply = self._conn.recv()
+        return self._property_reply(reply)
 
-        hdr, seq, stat, nr = struct.unpack("<BBBB", reply[:4])
-        reply = reply[4:]
+    def _property_reply(self, reply):
+        hdr, seq, stat, ret = _protocol.unpack_property_reply(reply)
 
-        if hdr != 0x46:
+        if hdr != _protocol.PKT_PROPERTY:
             raise NetworkError("Bad header %d" % hdr)
 
-        p, d = '', ''
-        for n in range(nr):
-            plen, reply = ord(reply[:1]), reply[1:]
-            p, reply = reply[:plen].decode('ascii'), reply[plen:]
-            dlen, reply = ord(reply[:1]), reply[1:]
-            d, reply = reply[:dlen].decode('ascii'), reply[dlen:]
-
-            if stat == 0:
-                ret.append((p, d))
-            else:
-                break
-
-        # Reply should just contain the \r\n by this time.
-
         if stat:
             # An error will have exactly one property reply, the property that
             # caused the error with empty data
+            p = ret[0][0] if ret else ''
             raise InvalidOperationException(
                 "Property Read Error, status %d on property %s" % (stat, p))
 
         return ret
 
     def _get_property_section(self, section):
-        ret = []
-
-        pkt = struct.pack("<BBBBB", 0x46, self._get_seq(), 1, 3, len(section))
-        pkt += section.encode('ascii')
-        pkt += bytearray([0])  # No data for reads
+        pkt = _protocol.pack_property_section(self._get_seq(), section)
 
-        with self._conn_lock:
-            self._conn.send(pkt)
-            reply = self._conn.recv()
-        hdr, seq, stat, nr = struct.unpack("<BBBB", reply[:4])
-        reply = reply[4:]
+        reply = self._transact(pkt)
 
-        if hdr != 0x46:
-            raise NetworkError("Bad header %d" % hdr)
-
-        p, d = '', ''
-        for n in range(nr):
-            plen, reply = ord(reply[:1]), reply[1:]
-            p, reply = reply[:plen].decode('ascii'), reply[plen:]
-            dlen, reply = ord(reply[:1]), reply[1:]
-            d, reply = reply[:dlen].decode('ascii'), reply[dlen:]
-
-            if stat == 0:
-                ret.append((p, d))
-            else:
-                break
-
-        if stat:
-            # An error will have exactly one property reply, the property that
-            # caused the error with empty data
-            raise InvalidOperationException("Property Read Error, status %d "
-                                            "on property %s" % (stat, p))
-
-        return ret
+        return self._property_reply(reply)
 
     def _get_property_single(self, prop):
         r = self._get_properties([prop])
         return r[0][1]
 
     def _set_properties(self, properties):
-        ret = []
         if len(properties) > 255:
             raise InvalidOperationException("Properties request too long (%d)"
                                             % len(properties))
-        pkt = struct.pack("<BBB", 0x46, self._get_seq(), len(properties))
-
-        for p, d in properties:
-            pkt += bytearray([2, len(p)])
-            pkt += p.encode('ascii')
-            pkt += bytearray([len(d)])
-            pkt += d.encode('ascii')
-
-        with self._conn_lock:
-            self._conn.send(pkt)
-            reply = self._conn.recv()
-        hdr, seq, stat, nr = struct.unpack("<BBBB", reply[:4])
-        reply = reply[4:]
+        pkt = _protocol.pack_property_write(self._get_seq(), properties)
 
-        if hdr != 0x46:
-            raise NetworkError("Bad header %d" % hdr)
-
-        for n in range(nr):
-            plen, reply = ord(reply[:1]), reply[1:]
-            p, reply = reply[:plen].decode('ascii'), reply[plen:]
-            dlen, reply = ord(reply[:1]), reply[1:]
-            d, reply = reply[:dlen].decode('ascii'), reply[dlen:]
+        reply = self._transact(pkt)
 
-            if stat == 0:
-                # Writes have the new value echoed back
-                ret.append((p, d))
-            else:
-                break
-
-        if stat:
-            # An error will have exactly one property reply, the property that
-            # caused the error with empty data
-            raise InvalidOperationException("Property Read Error, status %d "
-                                            "on property %s" % (stat, p))
-
-        return ret
+        # Writes have the new value echoed back
+        return self._property_reply(reply)
 
     def _set_property_single(self, prop, val):
         r = self._set_properties([(prop, val)])
@@ -843,9 +878,7 @@ class Moku(object):
 
         hdr = struct.pack("<BI", 0x53, len(pkt))
 
-        with self._conn_lock:
-            self._conn.send(hdr + pkt)
-            reply = self._conn.recv()
+        reply = self._transact(hdr + pkt)
 
         hdr, l, seq, ae, stat = struct.unpack("<BIBBB", reply[:8])
 
@@ -854,9 +887,7 @@ class Moku(object):
 
     def _stream_start(self):
         pkt = struct.pack("<BIBB", 0x53, 2, 0, 4)
-        with self._conn_lock:
-            self._conn.send(pkt)
-            reply = self._conn.recv()
+        reply = self._transact(pkt)
 
         hdr, l, seq, ae, stat = struct.unpack("<BIBBB", reply[:8])
 
@@ -864,9 +895,7 @@ class Moku(object):
 
     def _stream_stop(self):
         pkt = struct.pack("<BIBB", 0x53, 2, 0, 2)
-        with self._conn_lock:
-            self._conn.send(pkt)
-            reply = self._conn.recv()
+        reply = self._transact(pkt)
 
         hdr, l, seq, ae, stat, bt = struct.unpack("<BIBBBQ", reply[:16])
 
@@ -874,30 +903,21 @@ class Moku(object):
 
     def _stream_status(self):
         pkt = struct.pack("<BIBB", 0x53, 2, 0, 3)
-        with self._conn_lock:
-            self._conn.send(pkt)
-            reply = self._conn.recv()
+        reply = self._transact(pkt)
 
         hdr, l, seq, ae, stat, bt, trems, treme, flags, fname_len = \
             struct.unpack("<BIBBBQiiBH", reply[:27])
         fname = reply[27:27 + fname_len].decode('ascii')
         return stat, bt, trems, treme, fname
 
-    def _fs_send_generic(self, action, data):
-        pkt = struct.pack("<BQB", 0x49, len(data) + 1, action)
-        pkt += data
-        self._conn.send(pkt)
+    def _fs_request(self, action, data):
+        reply = self._transact(_protocol.pack_fs_request(action, data))
+        hdr, length, actual, act, status, data = \
+            _protocol.unpack_fs_reply(reply)
 
-    def _fs_receive_generic(self, action):
-        reply = self._conn.recv()
-        hdr, length = struct.unpack("<BQ", reply[:9])
-        pkt = reply[9:]
-
-        if length != len(pkt):
-            raise NetworkError("Unexpected file reply length {d}/{d}"
-                               "".format(length, len(pkt)))
-
-        act, status = struct.unpack("BB", pkt[:2])
+        if length != actual or status is None:
+            raise NetworkError("Unexpected file reply length {}/{}"
+                               "".format(length, actual))
 
         if status:
             if status == _ERR_INVAL:
@@ -922,16 +942,21 @@ class Moku(object):
             else:
                 ex = NetworkError("Received invalid status ID: %d" % status)
 
-            ex.dat = pkt[2:]
+            ex.dat = data
             raise ex
 
-        return pkt[2:]
+        return data
 
     def _send_file_bytes(self, mp, remotename, data, offset=0):
         # NOTE: The calling function should also perform a "finalise request"
         # on completion of byte sending to ensure the file resource becomes
         # available for use.
-        data = bytearray(data)
+        try:
+            # Send slices of the caller's buffer (e.g. a NumPy array)
+            # rather than copying the whole thing first
+            data = memoryview(data).cast('B')
+        except (AttributeError, TypeError):
+            data = bytearray(data)
         data_length = len(data)
         fname = mp + ":" + remotename
 
@@ -946,9 +971,7 @@ class Moku(object):
             pkt += fname.encode('ascii')
             pkt += struct.pack("<QQ", offset+i, len(pkt_data))
             pkt += pkt_data
-            with self._conn_lock:
-                self._fs_send_generic(2, pkt)
-                self._fs_receive_generic(2)
+            self._fs_request(2, pkt)
 
             # Increment the offset counter
             i += len(pkt_data)
@@ -995,9 +1018,7 @@ class Moku(object):
                 pkt += qfname.encode('ascii')
                 pkt += struct.pack("<QQ", i, to_transfer)
 
-                with self._conn_lock:
-                    self._fs_send_generic(1, pkt)
-                    reply = self._fs_receive_generic(1)
+                reply = self._fs_request(1, pkt)
 
                 f.write(reply[8:])
 
@@ -1011,9 +1032,7 @@ class Moku(object):
         pkt = bytearray([len(fname)])
         pkt += fname.encode('ascii')
 
-        with self._conn_lock:
-            self._fs_send_generic(3, pkt)
-            rep = self._fs_receive_generic(3)
+        rep = self._fs_request(3, pkt)
         return struct.unpack("<I", rep)[0]
 
     def _fs_sha(self, mp, fname):
@@ -1022,9 +1041,7 @@ class Moku(object):
         pkt = bytearray([len(fname)])
         pkt += fname.encode('ascii')
 
-        with self._conn_lock:
-            self._fs_send_generic(10, pkt)
-            rep = self._fs_receive_generic(10)
+        rep = self._fs_request(10, pkt)
 
         return rep.decode('ascii')
 
@@ -1034,9 +1051,7 @@ class Moku(object):
         pkt = bytearray([len(fname)])
         pkt += fname.encode('ascii')
 
-        with self._conn_lock:
-            self._fs_send_generic(4, pkt)
-            rep = self._fs_receive_generic(4)
+        rep = self._fs_request(4, pkt)
 
         return struct.unpack("<Q", rep)[0]
 
@@ -1048,36 +1063,12 @@ class Moku(object):
         data = mp.encode('ascii')
         data += bytearray([flags])
 
-        with self._conn_lock:
-            self._fs_send_generic(5, data)
-            reply = self._fs_receive_generic(5)
-
-        n = struct.unpack("<H", reply[:2])[0]
-        reply = reply[2:]
-
-        names = []
-
-        for i in range(n):
-            if calculate_sha:
-                chk = reply[:64].decode('ascii')
-                reply = reply[64:]
-            elif calculate_crc:
-                chk = struct.unpack("<I", reply[:4])
-                reply = reply[4:]
-            else:
-                chk = ''
-
-            bl, fl = struct.unpack("<QB", reply[:9])
-            reply = reply[9:]
-            names.append((reply[:fl].decode(), chk, bl))
-            reply = reply[fl:]
+        reply = self._fs_request(5, data)
 
-        return names
+        return _protocol.unpack_fs_list(reply, calculate_crc, calculate_sha)
 
     def _fs_free(self, mp):
-        with self._conn_lock:
-            self._fs_send_generic(6, mp.encode('ascii'))
-            rep = self._fs_receive_generic(6)
+        rep = self._fs_request(6, mp.encode('ascii'))
 
         t, f = struct.unpack("<QQ", rep)
 
@@ -1089,9 +1080,7 @@ class Moku(object):
         pkt += fname.encode('ascii')
         pkt += struct.pack('<Q', fsize)
 
-        with self._conn_lock:
-            self._fs_send_generic(7, pkt)
-            self._fs_receive_generic(7)
+        self._fs_request(7, pkt)
 
     def _fs_finalise_fromlocal(self, mp, localname, remotename=None):
         fsize = os.path.getsize(localname)
@@ -1110,22 +1099,18 @@ class Moku(object):
         flags = 1 if move else 0
         pkt += bytearray([flags])
 
-        with self._conn_lock:
-            self._fs_send_generic(8, pkt)
-            rep = self._fs_receive_generic(8)
+        rep = self._fs_request(8, pkt)
 
         return rep
 
     def _fs_rename_status(self):
 
-        with self._conn_lock:
-            self._fs_send_generic(9, b'')
-            try:
-                dat = self._fs_receive_generic(9)
-                stat = _ERR_OK
-            except MokuBusy as e:
-                dat = e.dat
-                stat = _ERR_BUSY
+        try:
+            dat = self._fs_request(9, b'')
+            stat = _ERR_OK
+        except MokuBusy as e:
+            dat = e.dat
+            stat = _ERR_BUSY
 
         size, pc = struct.unpack("<QB", dat)
 
@@ -1187,18 +1172,16 @@ class Moku(object):
 
     def _trigger_fwload(self):
         self._set_timeout(seconds=20)
-        with self._conn_lock:
-            self._conn.send(bytearray([0x52, 0x01]))
-            hdr, reply = struct.unpack("<BB", self._conn.recv())
+        ack = self._transact(bytearray([0x52, 0x01]))
+        hdr, reply = struct.unpack("<BB", ack)
         self._set_timeout()
         if reply:
             raise InvalidOperationException(
                 "Firmware update failure %d" % reply)
 
     def _restart_board(self):
-        with self._conn_lock:
-            self._conn.send(bytearray([0x52, 0x02]))
-            hdr, reply = struct.unpack("<BB", self._conn.recv())
+        ack = self._transact(bytearray([0x52, 0x02]))
+        hdr, reply = struct.unpack("<BB", ack)
         if reply:
             raise InvalidOperationException("Reboot failed %d" % reply)
 
@@ -1386,7 +1369,7 @@ class Moku(object):
         return self._instrument
 
     def deploy_or_connect(self, instrument, set_default=True,
-                          use_external=False):
+                          use_external=False, use_cache=False):
         """
         Ensures the Moku:Lab is running the given instrument, either by
         connecting to an already-running instance, or deploying a new one.
@@ -1408,10 +1391,19 @@ class Moku(object):
         :type use_external: bool
         :param use_external: Attempt to lock to an external reference clock.
 
+        :type use_cache: bool
+        :param use_cache: Keep a local copy of the instrument state when this
+        connection is closed, and use it to connect more quickly next time if
+        the instrument configuration hasn't changed in the meantime. See
+        :any:`discover_instrument`.
+
         :return:
             An object of type *instrument* representing the running Instrument.
         """
-        i = self.discover_instrument()
+        if use_cache:
+            self._enable_state_cache()
+
+        i = self.discover_instrument(use_cache=use_cache)
         if i is None or pymoku.instruments.id_table[i.id] != instrument:
             log.debug("New %s required", instrument.__name__)
             i = instrument()
@@ -1445,9 +1437,18 @@ class Moku(object):
         """
         return self._instrument
 
-    def discover_instrument(self):
+    def discover_instrument(self, use_cache=False):
         """Query a Moku:Lab device to see what instrument is currently running.
 
+        Normally the full register state of the running instrument is read
+        back and interpreted. If *use_cache* is set, the state saved locally
+        when this device was last closed is used instead, as long as the
+        device's state ID shows that it hasn't been reconfigured since.
+
+        :type use_cache: bool
+        :param use_cache: Use, and keep up to date, the local instrument state
+        cache.
+
         :rtype: :any:`MokuInstrument` or `None`
         :returns:
             The detected instrument ready to be controlled, otherwise None.
@@ -1463,15 +1464,83 @@ class Moku(object):
 
         running = instr()
         running.attach_moku(self)
-        running._sync_registers()
+
+        if use_cache:
+            self._enable_state_cache()
+
+        cached = use_cache and self._load_cached_state(running)
+        if not cached:
+            running._sync_registers()
+
         running._set_running(True)
         self._instrument = running
+
+        if use_cache and not cached:
+            self._save_cached_state()
+
         return running
 
+    def _enable_state_cache(self):
+        from pymoku._state_cache import StateCache
+        if self._state_cache is None:
+            self._state_cache = StateCache()
+
+    def _load_cached_state(self, instrument):
+        # Apply the cached state of the instrument if it still matches the
+        # device; one register read checks the instrument build and that
+        # the state ID hasn't moved on.
+        from pymoku._instrument import REG_ID1, REG_ID2, REG_STATE
+
+        snapshot = self._state_cache.load(self.serial, instrument.id)
+        if snapshot is None:
+            return False
+
+        regs = snapshot['registers']
+        for reg, val in self._read_regs([REG_ID1, REG_ID2, REG_STATE]):
+            if reg == REG_STATE:
+                val, cached = val & 0xFF, (regs[reg] or 0) & 0xFF
+            else:
+                cached = regs[reg]
+
+            if val != cached:
+                log.debug("Cached state of %s is stale, syncing registers",
+                          instrument.type)
+                return False
+
+        try:
+            instrument._sync_snapshot(snapshot)
+        except Exception:
+            log.exception("Invalid cached state, syncing registers")
+            return False
+
+        log.debug("Connected to %s using cached state %d",
+                  instrument.type, instrument._stateid)
+        return True
+
+    def _save_cached_state(self):
+        instrument = self._instrument
+        if self._state_cache is None or instrument is None:
+            return
+
+        try:
+            # After a deploy, registers that have never been written aren't
+            # known locally; fill them from the device so the cached image is
+            # complete.
+            if None in instrument._remoteregs:
+                regs = self._read_regs(list(range(128)))
+                instrument._remoteregs = [
+                    r if r is not None else v for r, (_, v)
+                    in zip(instrument._remoteregs, regs)]
+
+            self._state_cache.save(self.serial, instrument.snapshot())
+        except Exception:
+            log.exception("Unable to save instrument state to the cache")
+
     def close(self):
         """Close connection to the Moku:Lab."""
 
         if self._instrument is not None:
+            self._save_cached_state()
             self._instrument._set_running(False)
 
         try:
@@ -1481,8 +1550,7 @@ class Moku(object):
             # ownership packet format changes
             pass
         finally:
-            with self._conn_lock:
-                self._conn.close()
+            self._rpc.close()
 
         # Don't clobber the ZMQ context as it's global to the interpretter,
         # if the user has multiple Moku objects then we don't want to mess
@@ -14,6 +14,11 @@ from pymoku._utils import str_to_val
 from pymoku._trigger import Trigger
 from pymoku._sweep_generator import SweepGenerator
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 log = logging.getLogger(__name__)
 
 REG_ARB_SETTINGS1 = 88
@@ -32,6 +37,18 @@ _ARB_MODE_250 = 0x2
 _ARB_MODE_125 = 0x3
 
 _ARB_LUT_LENGTH = 8192
+# Number of times the LUT is repeated in the memory map, and the number of
+# points in each repeat, for each mode
+_ARB_LUT_STEPS = [(8, 8192), (4, 8192 * 2), (2, 8192 * 4), (1, 8192 * 8)]
+# Bytes in one channel's LUT image
+_ARB_LUT_IMAGE_SIZE = _ARB_LUT_LENGTH * 8 * 4
+# Changed regions of a LUT image closer than this many bytes are uploaded
+# together, and if there are more than _ARB_LUT_MAX_RANGES regions the whole
+# image is sent; it's cheaper than the extra round trips.
+_ARB_LUT_MERGE_GAP = 4096
+_ARB_LUT_MAX_RANGES = 16
+# Block size compared when finding changes without NumPy
+_ARB_LUT_BLOCK = 1024
 _ARB_LUT_LSB = 2.0**32
 _ARB_LUT_INTERPLOATION_LENGTH = 2**32
 
@@ -52,10 +69,98 @@ _ARB_INPUT_SMPS = ADC_SMP_RATE
 _ARB_CHN_BUFLEN = 2**13
 
 
+def _lut_image_list(data, mode):
+    steps, stepsize = _ARB_LUT_STEPS[mode]
+
+    # Each point is a 16-bit sample followed by 16 bits of padding
+    samples = []
+    for d in data:
+        samples += [int(math.ceil((2.0 ** 15 - 1) * d)), 0]
+
+    step = struct.pack('<%dh' % len(samples), *samples)
+    step += b'\0' * (stepsize * 4 - len(step))
+
+    return bytearray(step * steps)
+
+
+def _lut_image_array(data, mode):
+    steps, stepsize = _ARB_LUT_STEPS[mode]
+
+    # Each point is a 16-bit sample followed by 16 bits of padding. The
+    # samples are broadcast across all steps in one operation.
+    image = np.zeros((steps, stepsize, 2), dtype='<i2')
+    image[:, :len(data), 0] = np.ceil((2.0 ** 15 - 1) * data)
+
+    return image
+
+
+def _merge_ranges(ranges):
+    merged = []
+    for start, end in ranges:
+        if merged and start - merged[-1][1] <= _ARB_LUT_MERGE_GAP:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _lut_dirty_ranges_list(old, new):
+    ranges = []
+    for i in range(0, len(new), _ARB_LUT_BLOCK):
+        if old[i:i + _ARB_LUT_BLOCK] != new[i:i + _ARB_LUT_BLOCK]:
+            ranges.append((i, min(i + _ARB_LUT_BLOCK, len(new))))
+    return _merge_ranges(ranges)
+
+
+def _lut_dirty_ranges_array(old, new):
+    # Compare whole points (sample and padding) at a time
+    changed = np.flatnonzero(old.view('<u4').ravel() !=
+                             new.view('<u4').ravel())
+    if not len(changed):
+        return []
+
+    breaks = np.flatnonzero(np.diff(changed) > _ARB_LUT_MERGE_GAP // 4)
+    starts = np.concatenate(([changed[0]], changed[breaks + 1])) * 4
+    ends = (np.concatenate((changed[breaks], [changed[-1]])) + 1) * 4
+
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def _lut_dirty_ranges(old, new):
+    """ Return the list of (start, end) byte ranges that differ between two
+    LUT images from :any:`_lut_image`. If there's no *old* image, the whole
+    of *new* is dirty. """
+    if old is None:
+        return [(0, _ARB_LUT_IMAGE_SIZE)]
+
+    if np is not None:
+        ranges = _lut_dirty_ranges_array(old, new)
+    else:
+        ranges = _lut_dirty_ranges_list(old, new)
+
+    if len(ranges) > _ARB_LUT_MAX_RANGES:
+        return [(0, _ARB_LUT_IMAGE_SIZE)]
+    return ranges
+
+
+def _lut_image(data, mode):
+    """ Pack normalised LUT *data* in to the memory map image for *mode*.
+
+    The result supports the buffer protocol and is always the full image
+    for one channel, with the data repeated once per step of the mode.
+    """
+    if np is not None:
+        return _lut_image_array(data, mode)
+    else:
+        return _lut_image_list(data, mode)
+
+
 class ArbitraryWaveGen(_CoreOscilloscope):
     """
     .. automethod:: pymoku.instruments.WaveformGenerator.__init__
     """
+    _snapshot_exclude = _CoreOscilloscope._snapshot_exclude | \
+        frozenset(['_lut_image1', '_lut_image2'])
 
     def __init__(self):
         super(ArbitraryWaveGen, self).__init__()
@@ -82,6 +187,16 @@ class ArbitraryWaveGen(_CoreOscilloscope):
         self.mode1 = _ARB_MODE_125
         self.mode2 = _ARB_MODE_125
 
+        # Lookup tables last written to each channel, kept so they can be
+        # uploaded again when restoring a snapshot
+        self._lut_data1 = None
+        self._lut_data2 = None
+
+        # Image of the lookup table last uploaded to each channel, so only
+        # the parts that change need to be sent again
+        self._lut_image1 = None
+        self._lut_image2 = None
+
     @needs_commit
     def set_defaults(self):
         """Sets the Arbitrary Waveform Generator instrument to sane defaults
@@ -145,6 +260,8 @@ class ArbitraryWaveGen(_CoreOscilloscope):
 
         :type data: float array;
         :param data: Lookup table coefficients normalised to range [-1.0, 1.0].
+            May be a list, NumPy array or other object supporting the buffer
+            protocol (e.g. `array.array('d')`).
 
         :type mode: int; {125, 250, 500, 1000} MSmps
         :param mode: defines the output sample rate of the AWG.
@@ -157,7 +274,14 @@ class ArbitraryWaveGen(_CoreOscilloscope):
               units="MSmps", allow_none=True)
 
         # Check that all coefficients are between -1.0 and 1.0
-        if not all(map(lambda x: abs(x) <= 1.0, data)):
+        if np is not None:
+            data = np.asarray(data, dtype=float).ravel()
+            in_range = bool(np.all(np.abs(data) <= 1.0))
+        else:
+            data = [float(d) for d in data]
+            in_range = all(abs(d) <= 1.0 for d in data)
+
+        if not in_range:
             raise ValueOutOfRangeException(
                 "Lookup table coefficients must be in the range [-1.0, 1.0].")
 
@@ -195,27 +319,66 @@ class ArbitraryWaveGen(_CoreOscilloscope):
         self._set_mode(ch, mode, len(data))
         self.commit()
 
-        # picks the stepsize and the steps based in the mode
-        steps, stepsize = [(8, 8192),
-                           (4, 8192 * 2),
-                           (2, 8192 * 4),
-                           (1, 8192 * 8)][mode]
+        self._upload_lut(ch, mode, data)
 
-        byte_data = bytearray()
-        for step in range(steps):
-            byte_data += bytearray(b''.join([
-                struct.pack('<hh', int(math.ceil((2.0 ** 15 - 1) * d)), 0)
-                for d in data]))
-            byte_data += bytearray(b'\0' * (stepsize * 4 - (len(data) * 4)))
+    def _upload_lut(self, ch, mode, data):
+        if np is not None:
+            data = np.asarray(data, dtype=float)
 
-        # Write the data to AWG memory map
+        if ch == 1:
+            self._lut_data1 = data
+            shadow = self._lut_image1
+        else:
+            self._lut_data2 = data
+            shadow = self._lut_image2
+
+        image = _lut_image(data, mode)
+        ranges = _lut_dirty_ranges(shadow, image)
+
+        if not ranges:
+            log.debug("LUT %d unchanged, skipping upload", ch)
+            return
+
+        # Flat byte view of the image so the dirty ranges can be sliced out
+        if np is not None:
+            buf = image.reshape(-1).view(np.uint8)
+        else:
+            buf = image
+
+        # Write the changed data to AWG memory map
         self._set_mmap_access(True)
-        self._moku._send_file_bytes('j', '', byte_data,
-                                    offset=_ARB_LUT_LENGTH * 8 * 4 * (ch - 1))
+        for start, end in ranges:
+            self._moku._send_file_bytes(
+                'j', '', buf[start:end],
+                offset=_ARB_LUT_IMAGE_SIZE * (ch - 1) + start)
         self._set_mmap_access(False)
 
         # Release the memory map "file" to other resources
-        self._moku._fs_finalise('j', '', _ARB_LUT_LENGTH * 8 * 4 * 2)
+        self._moku._fs_finalise('j', '', _ARB_LUT_IMAGE_SIZE * 2)
+
+        if ch == 1:
+            self._lut_image1 = image
+        else:
+            self._lut_image2 = image
+
+    def _invalidate_lut(self):
+        # Forget what's in the device LUT memory so the next upload sends the
+        # whole image
+        self._lut_image1 = None
+        self._lut_image2 = None
+
+    def attach_moku(self, moku):
+        super(ArbitraryWaveGen, self).attach_moku(moku)
+        self._invalidate_lut()
+
+    def _restore_mmap(self):
+        # The device memory may have changed since the snapshot was taken
+        self._invalidate_lut()
+
+        if self._lut_data1 is not None:
+            self._upload_lut(1, self.mode1, self._lut_data1)
+        if self._lut_data2 is not None:
+            self._upload_lut(2, self.mode2, self._lut_data2)
 
     @needs_commit
     def gen_waveform(self, ch, period, amplitude, phase=0, offset=0,
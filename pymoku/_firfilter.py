@@ -14,6 +14,11 @@ from pymoku._instrument import struct
 from pymoku._oscilloscope import _CoreOscilloscope
 from . import _utils
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 log = logging.getLogger(__name__)
 
 REG_FIR_CONTROL = 96
@@ -33,6 +38,8 @@ REG_FIR_MATRIXGAIN_CH2 = 114
 _FIR_NUM_BLOCKS = 29
 _FIR_BLOCK_SIZE = 511
 _FIR_MMAP_BLOCK_SIZE = 2**17
+# Bytes per block in the coefficient image: a length word then the taps
+_FIR_BLOCK_BYTES = (_FIR_BLOCK_SIZE + 1) * 4
 
 # Monitor probe locations (for A and B channels)
 _FIR_MON_NONE = 0
@@ -65,6 +72,79 @@ _FIR_CHN_BUFLEN = 2**13
 _ADC_DEFAULT_CALIBRATION = 3750.0  # Bits/V (No attenuation)
 
 
+def _coeff_image_list(coeffs):
+    n = max(1, int(math.ceil(len(coeffs) / float(_FIR_NUM_BLOCKS))))
+    blocks = [coeffs[x:x + n] for x in range(0, len(coeffs), n)]
+    blocks += [[]] * (_FIR_NUM_BLOCKS - len(blocks))
+
+    image = bytearray()
+    for b in blocks:
+        taps = [int(round((2.0**24 - 1) * c)) for c in reversed(b)]
+        image += struct.pack('<I%di' % len(taps), len(taps), *taps)
+        image += b'\x00' * 4 * (_FIR_BLOCK_SIZE - len(taps))
+
+    return image
+
+
+def _coeff_image_array(coeffs):
+    image = np.zeros((_FIR_NUM_BLOCKS, _FIR_BLOCK_SIZE + 1), dtype='<i4')
+    length = len(coeffs)
+    if not length:
+        return image
+
+    n = int(math.ceil(length / float(_FIR_NUM_BLOCKS)))
+    nblocks = int(math.ceil(length / float(n)))
+
+    taps = np.zeros(nblocks * n)
+    taps[:length] = np.round((2.0**24 - 1) * np.asarray(coeffs, dtype=float))
+    taps = taps.reshape(nblocks, n)
+
+    # Each block holds its taps in reverse order, the last may be short
+    last = length - (nblocks - 1) * n
+    image[:nblocks - 1, 1:n + 1] = taps[:-1, ::-1]
+    image[nblocks - 1, 1:last + 1] = taps[-1, last - 1::-1]
+    image[:nblocks, 0] = n
+    image[nblocks - 1, 0] = last
+
+    return image
+
+
+def _coeff_image(coeffs):
+    """ Pack FIR *coeffs* in to the memory map image for one channel.
+
+    The coefficients are split evenly between the FIR blocks; each block is
+    a tap count followed by its taps, reversed, as 24-bit fractions. The
+    result supports the buffer protocol.
+    """
+    if np is not None:
+        return _coeff_image_array(coeffs)
+    else:
+        return _coeff_image_list(coeffs)
+
+
+def _coeff_dirty_blocks(old, new):
+    """ Return the (start, end) ranges of FIR blocks that differ between two
+    coefficient images, merging adjacent blocks. If there's no *old* image,
+    all blocks are dirty. """
+    if old is None:
+        return [(0, _FIR_NUM_BLOCKS)]
+
+    if np is not None:
+        dirty = np.flatnonzero((old != new).any(axis=1)).tolist()
+    else:
+        dirty = [b for b in range(_FIR_NUM_BLOCKS)
+                 if old[b * _FIR_BLOCK_BYTES:(b + 1) * _FIR_BLOCK_BYTES] !=
+                 new[b * _FIR_BLOCK_BYTES:(b + 1) * _FIR_BLOCK_BYTES]]
+
+    ranges = []
+    for b in dirty:
+        if ranges and ranges[-1][1] == b:
+            ranges[-1] = (ranges[-1][0], b + 1)
+        else:
+            ranges.append((b, b + 1))
+    return ranges
+
+
 class _DecFilter(object):
     REG_DECIMATION = 0
     REG_INTERP_WDFRATES = 1
@@ -291,6 +371,9 @@ class FIRFilter(_CoreOscilloscope):
         Name of this instrument.
 
     """
+    _snapshot_exclude = _CoreOscilloscope._snapshot_exclude | \
+        frozenset(['_coeff_image1', '_coeff_image2'])
+
     def __init__(self):
         super(FIRFilter, self).__init__()
         self._register_accessors(_fir_reg_handlers)
@@ -323,6 +406,16 @@ class FIRFilter(_CoreOscilloscope):
         self._input_offset2 = 0
         self._output_offset2 = 0
 
+        # Coefficients last written to each channel, kept so they can be
+        # uploaded again when restoring a snapshot
+        self._filter_coeffs1 = None
+        self._filter_coeffs2 = None
+
+        # Coefficient image last uploaded to each channel, so only the blocks
+        # that change need to be sent again
+        self._coeff_image1 = None
+        self._coeff_image2 = None
+
     @needs_commit
     def set_defaults(self):
         super(FIRFilter, self).set_defaults()
@@ -503,7 +596,13 @@ class FIRFilter(_CoreOscilloscope):
             [0, _FIR_NUM_BLOCKS * min(2**decimation_factor, 2**9 - 1)],
             'filter coefficient array length')
         # Check that all coefficients are between -1.0 and 1.0
-        if not all(map(lambda x: abs(x) <= 1.0, filter_coefficients)):
+        if np is not None:
+            filter_coefficients = np.asarray(filter_coefficients, dtype=float)
+            in_range = bool(np.all(np.abs(filter_coefficients) <= 1.0))
+        else:
+            in_range = all(abs(c) <= 1.0 for c in filter_coefficients)
+
+        if not in_range:
             raise ValueOutOfRangeException("set_filter filter coefficients "
                                            "must be in the range "
                                            "[-1.0, 1.0].")
@@ -682,35 +781,67 @@ class FIRFilter(_CoreOscilloscope):
         assert len(coeffs) <= _FIR_NUM_BLOCKS * _FIR_BLOCK_SIZE, \
             "Invalid number of filter coefficients."
 
-        coeffs = list(coeffs)
+        if np is not None:
+            coeffs = np.array(coeffs, dtype=float)
+        else:
+            coeffs = list(coeffs)
 
-        # Create a list of coefficients in each FIR block
-        n = int(math.ceil(len(coeffs)/float(_FIR_NUM_BLOCKS)))
-        blocks = [coeffs[x:x+n] for x in range(0, len(coeffs), n)]
-        blocks += [[]] * (_FIR_NUM_BLOCKS - len(blocks))
+        if ch == 1:
+            self._filter_coeffs1 = coeffs
+            shadow = self._coeff_image1
+        else:
+            self._filter_coeffs2 = coeffs
+            shadow = self._coeff_image2
 
-        # Construct a bytearray from the FIR block contents
-        coeff_bytes = bytearray()
-        for b in blocks:
-            b.reverse()
-            coeff_bytes += bytearray(struct.pack('<I', len(b)))
-            coeff_bytes += bytearray(struct.pack('<' + 'i'*len(b),
-                                     *[int(round((2.0**24-1) * c))
-                                     for c in b]))
-            coeff_bytes += bytearray(b'\x00'*4*(_FIR_BLOCK_SIZE-len(b)))
+        image = _coeff_image(coeffs)
+        ranges = _coeff_dirty_blocks(shadow, image)
 
-        # Sanity check the coefficient byte array length
-        assert len(coeff_bytes) == (_FIR_BLOCK_SIZE+1) * _FIR_NUM_BLOCKS * 4, \
-            "Invalid length for FIR coefficient memory map."
+        # Flat byte view of the image so the changed blocks can be sliced out
+        if np is not None:
+            buf = image.reshape(-1).view(np.uint8)
+        else:
+            buf = image
 
-        # Write the coefficients to the FIR coefficient memory map
+        # Write the changed blocks to the FIR coefficient memory map. The
+        # access bit is toggled even if nothing has changed, as it also
+        # resets the decimation blocks.
         self._set_mmap_access(True)
-        self._moku._send_file_bytes('j', '', coeff_bytes,
-                                    offset=_FIR_MMAP_BLOCK_SIZE*(ch-1))
+        for start, end in ranges:
+            start, end = start * _FIR_BLOCK_BYTES, end * _FIR_BLOCK_BYTES
+            self._moku._send_file_bytes(
+                'j', '', buf[start:end],
+                offset=_FIR_MMAP_BLOCK_SIZE * (ch - 1) + start)
         self._set_mmap_access(False)
 
-        # Release the memory map "file" to other resources
-        self._moku._fs_finalise('j', '', _FIR_MMAP_BLOCK_SIZE*2)
+        if ranges:
+            # Release the memory map "file" to other resources
+            self._moku._fs_finalise('j', '', _FIR_MMAP_BLOCK_SIZE*2)
+        else:
+            log.debug("FIR %d coefficients unchanged, skipping upload", ch)
+
+        if ch == 1:
+            self._coeff_image1 = image
+        else:
+            self._coeff_image2 = image
+
+    def _invalidate_coeffs(self):
+        # Forget what's in the device coefficient memory so the next upload
+        # sends every block
+        self._coeff_image1 = None
+        self._coeff_image2 = None
+
+    def attach_moku(self, moku):
+        super(FIRFilter, self).attach_moku(moku)
+        self._invalidate_coeffs()
+
+    def _restore_mmap(self):
+        # The device memory may have changed since the snapshot was taken
+        self._invalidate_coeffs()
+
+        if self._filter_coeffs1 is not None:
+            self._write_coeffs(1, self._filter_coeffs1)
+        if self._filter_coeffs2 is not None:
+            self._write_coeffs(2, self._filter_coeffs2)
 
     def _signal_source_volts_per_bit(self, source, scales, trigger=False):
         """
@@ -1,13 +1,10 @@
 
 # Pull in Python 3 string object on Python 2.
-import sys
 import logging
 import time
 import threading
 import zmq
 
-from collections import deque
-from queue import Queue, Empty
 from . import _instrument
 from . import _get_autocommit
 from . import _input_instrument
@@ -15,69 +12,167 @@ from . import UncommittedSettings
 from . import NotDeployedException
 from . import NoDataException
 from . import FrameTimeout
+from . import InvalidOperationException
+from . import ValueOutOfRangeException
 from ._instrument import needs_commit
 from ._frame_instrument_data import InstrumentData
+from ._frame_instrument_data import SegmentData
+from ._frame_recorder import FrameRecorder
+from ._histogram import Histogram
 
-log = logging.getLogger(__name__)
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
+log = logging.getLogger(__name__)
 
-class FrameQueue(Queue):
-    def put(self, item, block=True, timeout=None):
-        # Behaves the same way as default except that instead of raising Full,
-        # it just pushes the item on to the deque anyway, throwing away old
-        # frames.
-        self.not_full.acquire()
-        try:
-            if self.maxsize > 0 and block:
-                if timeout is None:
-                    while self._qsize() == self.maxsize:
-                        self.not_full.wait()
-                elif timeout < 0:
-                    raise ValueError("'timeout' must be a non-negative number")
-                else:
-                    endtime = Queue._time() + timeout
-                    while self._qsize() == self.maxsize:
-                        remaining = endtime - Queue._time()
-                        if remaining <= 0.0:
-                            break
-                        self.not_full.wait(remaining)
-            self._put(item)
-            self.unfinished_tasks += 1
-            self.not_empty.notify()
-        finally:
-            self.not_full.release()
 
-    def get(self, block=True, timeout=None):
-        item = None
-        while True:
-            try:
-                item = Queue.get(self, block=block, timeout=timeout or 1)
-            except Empty:
-                if timeout is None:
-                    continue
-                else:
-                    raise
-            else:
-                return item
-
-    # The default _init for a Queue doesn't actually bound the deque, relying
-    # on the put function to bound.
-    def _init(self, maxsize):
-        self.queue = deque(maxlen=maxsize)
+class FrameStats(object):
+    """
+    Counters describing the flow of frames from the Moku:Lab through to the
+    caller of :any:`get_realtime_data`. Read these through
+    :any:`FrameBasedInstrument.stats` rather than directly.
+
+    Frames are lost, by design, at several points in the pipeline; the
+    *dropped* counters say where:
+
+    - *incomplete*: a packet never arrived (e.g. the frame socket's receive
+      high water mark was reached) so a partial frame was abandoned.
+    - *rejected*: the frame was complete but discarded by the instrument's
+      frame processing.
+    - *superseded*: the frame was replaced by a newer one before anyone
+      called :any:`get_realtime_data`.
+    - *stale*: the frame was skipped by :any:`get_realtime_data` as it was
+      captured with old instrument settings.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.decode_time = Histogram()
+        self.latency = Histogram()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.packets = 0
+            self.bytes = 0
+            self.completed = 0
+            self.delivered = 0
+            self.incomplete = 0
+            self.rejected = 0
+            self.superseded = 0
+            self.stale = 0
+            self.reconnects = 0
+            self.decode_time.reset()
+            self.latency.reset()
+            self.started = time.time()
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'elapsed': time.time() - self.started,
+                'packets': self.packets,
+                'bytes': self.bytes,
+                'completed': self.completed,
+                'delivered': self.delivered,
+                'dropped': {
+                    'incomplete': self.incomplete,
+                    'rejected': self.rejected,
+                    'superseded': self.superseded,
+                    'stale': self.stale,
+                },
+                'reconnects': self.reconnects,
+                'decode_time': self.decode_time.as_dict(),
+                'latency': self.latency.as_dict(),
+            }
+
+
+def log_frame_stats(stats):
+    """ Frame statistics hook that logs a one-line summary.
+
+    Pass to :any:`set_stats_hook
+    <pymoku._frame_instrument.FrameBasedInstrument.set_stats_hook>`.
+    """
+    log.info("Frames: %d completed, %d delivered, dropped %s, %d reconnects, "
+             "decode %.1fms mean, latency %.1fms mean",
+             stats['completed'], stats['delivered'], stats['dropped'],
+             stats['reconnects'], stats['decode_time']['mean'] * 1000,
+             stats['latency']['mean'] * 1000)
+
+
+class _SegmentCapture(object):
+    # Collects distinct waveforms from the frame worker in to a preallocated
+    # SegmentData block. Only frames rendered and triggered in the given state
+    # are kept, and each waveformid is kept at most once.
+    def __init__(self, n, width, stateid):
+        self.data = SegmentData(n, width)
+        self.data._stateid = stateid
+        self.stateid = stateid
+        self.done = threading.Event()
+        self._last_id = None
+
+    def add(self, frame, timestamp):
+        if self.done.is_set():
+            return
+
+        if frame._trigstate != self.stateid or \
+                frame._stateid != self.stateid or \
+                not frame.synchronised or \
+                frame.waveformid == self._last_id:
+            return
+
+        self._last_id = frame.waveformid
+
+        if self.data._add_frame(frame, timestamp):
+            self.done.set()
 
 
 # Revisit: Should this be a Mixin? Are there more instrument classifications
 # of this type, recording ability, for example?
 class FrameBasedInstrument(_input_instrument.InputInstrument,
                            _instrument.MokuInstrument):
+
+    _snapshot_exclude = _input_instrument.InputInstrument._snapshot_exclude \
+        | frozenset(['skt', 'mon_skt', '_frame', '_frame_seq', '_frame_taken',
+                     '_frame_seen', '_skipped_frames', '_stats_hook',
+                     '_stats_interval', '_hb_forced', '_segments',
+                     '_recorder', 'get_data_timings', '_data_syncd'])
+
     def __init__(self):
         super(FrameBasedInstrument, self).__init__()
-        self._buflen = 1
-        self._queue = FrameQueue(maxsize=self._buflen)
+        # Most recent complete frame from the frame worker. _frame_seq counts
+        # frames published to the slot, _frame_taken is the sequence number
+        # of the last one returned to a caller.
+        self._frame_cond = threading.Condition()
+        self._frame = None
+        self._frame_seq = 0
+        self._frame_taken = 0
+
+        # Sequence number of the last frame looked at by get_realtime_data,
+        # whether or not it was returned
+        self._frame_seen = 0
+
+        # Number of stale frames skipped by the last get_realtime_data call
+        self._skipped_frames = 0
+
+        # Frame pipeline counters, and the optional periodic export of them
+        self._stats = FrameStats()
+        self._stats_hook = None
+        self._stats_interval = 10.0
+
         self._hb_forced = False
 
         self.skt, self.mon_skt = None, None
 
+        # Active segmented capture, filled by the frame worker
+        self._segments = None
+
+        # Active raw frame recording, written by the frame worker
+        self._recorder = None
+
+        # Time taken by each phase of the last get_data call
+        self.get_data_timings = {}
+
         # Tracks whether the waveformid of frames received so far has wrapped
         self._data_syncd = False
 
@@ -86,23 +181,26 @@ class FrameBasedInstrument(_input_instrument.InputInstrument,
         self._frame_kwargs = frame_kwargs
 
     def _flush(self):
-        """ Clear the Frame Buffer.
+        """ Discard the most recently received frame.
         This is normally not required as one can simply wait for the
         correctly-generated frames to propagate through using the appropriate
         arguments to :any:`get_data`.
         """
-        with self._queue.mutex:
-            self._queue.queue.clear()
-
-    def _set_buffer_length(self, buflen):
-        """ Set the internal frame buffer length."""
-        self._buflen = buflen
-        self._queue = FrameQueue(maxsize=buflen)
-
-    def _get_buffer_length(self):
-        """ Return the current length of the internal frame buffer
-        """
-        return self._buflen
+        with self._frame_cond:
+            self._frame_taken = self._frame_seq
+            self._frame_seen = self._frame_seq
+
+    def _publish_frame(self, frame):
+        # Called from the frame worker. Replaces the latest-frame slot and
+        # wakes anyone waiting on a frame.
+        with self._frame_cond:
+            if self._frame_seq > self._frame_seen:
+                with self._stats._lock:
+                    self._stats.superseded += 1
+
+            self._frame = frame
+            self._frame_seq += 1
+            self._frame_cond.notify_all()
 
     def set_defaults(self):
         """ Set instrument default parameters"""
@@ -125,7 +223,11 @@ class FrameBasedInstrument(_input_instrument.InputInstrument,
 
         The download process may take a second or so to complete. If you
         require high rate data, e.g. for rendering a plot, see
-        `get_realtime_data`.
+        `get_realtime_data`. The time spent in each phase of the most recent
+        download, in seconds, is recorded in the *get_data_timings*
+        dictionary: *wait* for a valid frame, *pause* and resume the
+        instrument, *transfer* the buffer over the network, *decode* the
+        samples and the *total*.
 
         If the *wait* parameter is true (the default), this function will
         wait for any new settings to be applied before returning. That is, if
@@ -152,6 +254,8 @@ class FrameBasedInstrument(_input_instrument.InputInstrument,
         if self._moku is None:
             raise NotDeployedException()
 
+        t_start = time.time()
+
         if self.check_uncommitted_state():
             raise UncommittedSettings("Detected uncommitted "
                                       "instrument settings.")
@@ -175,6 +279,8 @@ class FrameBasedInstrument(_input_instrument.InputInstrument,
                 raise FrameTimeout("Timed out waiting on instrument data.")
             frame = self.get_realtime_data(timeout=timeout, wait=wait)
 
+        t_wait = time.time()
+
         # Check if it is already paused
         was_paused = self._get_pause()
 
@@ -184,6 +290,8 @@ class FrameBasedInstrument(_input_instrument.InputInstrument,
             if not _get_autocommit():
                 self.commit()
 
+        t_pause = time.time()
+
         # Get buffer data using a network stream
         self._stream_start(start=0, duration=0, use_sd=False, ch1=True,
                            ch2=True, filetype='net')
@@ -197,6 +305,8 @@ class FrameBasedInstrument(_input_instrument.InputInstrument,
         # Clean up data streaming threads
         self._stream_stop()
 
+        t_transfer = time.time()
+
         # Set pause state to what it was before
         if not was_paused:
             self._set_pause(False)
@@ -206,6 +316,17 @@ class FrameBasedInstrument(_input_instrument.InputInstrument,
         channel_data = self._stream_get_processed_samples()
         self._stream_clear_processed_samples()
 
+        t_end = time.time()
+        decode = self._dldecode_time
+        self.get_data_timings = {
+            'wait': t_wait - t_start,
+            'pause': (t_pause - t_wait) + (t_end - t_transfer),
+            'transfer': t_transfer - t_pause - decode,
+            'decode': decode,
+            'total': t_end - t_start,
+        }
+        log.debug("get_data timings: %s", self.get_data_timings)
+
         # Take the channel buffer data and put it into an 'InstrumentData'
         # object
         if(getattr(self, '_frame_class', None)):
@@ -243,6 +364,10 @@ class FrameBasedInstrument(_input_instrument.InputInstrument,
         particularly suitable for plotting in real time. If you require
         high-accuracy, high-resolution data for analysis, see `get_data`.
 
+        Only the most recently received frame is held, so if frames arrive
+        faster than this function is called, the intermediate frames are
+        skipped. Each frame is returned at most once.
+
         If the *wait* parameter is true (the default), this function will wait
         for any new settings to be applied before returning. That is, if you
         have set a new timebase (for example), calling this with *wait=True*
@@ -264,27 +389,203 @@ class FrameBasedInstrument(_input_instrument.InputInstrument,
 
         :return: :any:`InstrumentData` subclass, specific to the instrument.
         """
-        try:
-            # Dodgy hack, infinite timeout gets translated in to just an
-            # exceedingly long one
-            endtime = time.time() + (timeout or sys.maxsize)
+        endtime = None if timeout is None else time.time() + timeout
+        skipped = 0
+
+        with self._frame_cond:
+            seen = self._frame_taken
+
             while self._running:
-                frame = self._queue.get(block=True, timeout=timeout)
-                # Return only frames with a triggered and rendered state being
-                # equal (so we can interpret the data correctly using the
-                # entire state)
-                # If wait is set, only frames that have the triggered state
-                # equal to the currently committed state will be returned.
-                if (not wait and frame._trigstate == frame._stateid) or \
-                        (frame._trigstate == self._stateid):
-                    return frame
-                elif time.time() > endtime:
-                    raise FrameTimeout()
-                else:
+                if self._frame_seq > seen:
+                    frame = self._frame
+                    self._frame_seen = max(self._frame_seen, self._frame_seq)
+                    # Return only frames with a triggered and rendered state
+                    # being equal (so we can interpret the data correctly
+                    # using the entire state)
+                    # If wait is set, only frames that have the triggered
+                    # state equal to the currently committed state will be
+                    # returned.
+                    if (not wait and frame._trigstate == frame._stateid) or \
+                            (frame._trigstate == self._stateid):
+                        self._frame_taken = self._frame_seq
+                        self._skipped_frames = skipped
+
+                        with self._stats._lock:
+                            self._stats.delivered += 1
+                            if frame._rxtime is not None:
+                                self._stats.latency.add(
+                                    time.time() - frame._rxtime)
+                        return frame
+
                     log.debug("Incorrect state received: %d/%d",
                               frame._trigstate, self._stateid)
-        except Empty:
-            raise FrameTimeout()
+                    with self._stats._lock:
+                        self._stats.stale += 1
+                    skipped += self._frame_seq - seen
+                    seen = self._frame_seq
+
+                # Wake at least once a second so we notice the instrument
+                # being stopped, and so an indefinite wait can be interrupted
+                if endtime is None:
+                    self._frame_cond.wait(1.0)
+                else:
+                    remaining = endtime - time.time()
+                    if remaining <= 0:
+                        self._skipped_frames = skipped
+                        raise FrameTimeout()
+                    self._frame_cond.wait(min(remaining, 1.0))
+
+            self._skipped_frames = skipped
+
+    def stats(self):
+        """ Get counters describing the flow of frames from the Moku:Lab.
+
+        The returned dictionary holds the number of packets and bytes
+        received, frames *completed* (decoded) and *delivered* through
+        :any:`get_realtime_data`, the number of frames *dropped* at each
+        stage of the pipeline (see :any:`FrameStats`) and the number of
+        times the frame connection was re-established. The *decode_time*
+        and *latency* entries are histograms of the time taken to decode each
+        frame, and from frame arrival to it being returned to the caller.
+        Each histogram has a *count*, *mean* and *max* (in seconds) and a list
+        of (upper edge, count) *buckets*.
+
+        This is cheap to call and does not communicate with the Moku:Lab.
+
+        :return: dict of frame pipeline statistics
+        """
+        return self._stats.as_dict()
+
+    def reset_stats(self):
+        """ Reset all counters returned by :any:`stats` to zero. """
+        self._stats.reset()
+
+    def set_stats_hook(self, hook, interval=10.0):
+        """ Periodically export the frame pipeline statistics.
+
+        While the instrument is running, *hook* is called with the result of
+        :any:`stats` every *interval* seconds. The hook is called from the
+        background frame handler so must return promptly. For example, to
+        log a summary every minute:
+
+        i.set_stats_hook(pymoku._frame_instrument.log_frame_stats, 60)
+
+        :type hook: callable
+        :param hook: Function taking the statistics dict, or *None* to stop
+            exporting.
+
+        :type interval: float
+        :param interval: Seconds between calls to *hook*.
+        """
+        if hook is not None and not callable(hook):
+            raise InvalidOperationException("Stats hook must be callable")
+
+        if interval <= 0:
+            raise ValueOutOfRangeException("Invalid stats interval %s"
+                                           % interval)
+
+        self._stats_interval = interval
+        self._stats_hook = hook
+
+    def _export_stats(self):
+        hook = self._stats_hook
+        if hook is None:
+            return
+
+        try:
+            hook(self.stats())
+        except Exception:
+            log.exception("Frame stats hook failed")
+
+    def capture_segments(self, n, timeout=None):
+        """ Capture *n* distinct triggered waveforms in to a 2-D array.
+
+        This is equivalent to calling :any:`get_realtime_data` in a loop and
+        keeping every frame with a new *waveformid*, but the frames are
+        filtered and copied in the background frame handler as they arrive so
+        the capture can keep up with the instrument's trigger and frame rate.
+
+        Only waveforms captured with the currently-committed settings are
+        kept. As with :any:`get_realtime_data`, a trigger event must occur
+        after the settings have been applied before any waveform can be
+        captured, so the *timeout* should be set appropriately.
+
+        Requires NumPy.
+
+        :type n: int
+        :param n: Number of distinct waveforms to capture
+
+        :type timeout: float
+        :param timeout: Maximum time to wait for all *n* waveforms, or *None*
+            for indefinite.
+
+        :return: :any:`SegmentData` holding *n* waveforms, their receive
+            timestamps and waveform IDs.
+
+        :raises FrameTimeout: if fewer than *n* waveforms arrived within the
+            timeout.
+        """
+        if np is None:
+            raise InvalidOperationException("Segmented capture requires "
+                                            "NumPy.")
+        if self._moku is None:
+            raise NotDeployedException()
+
+        if self.check_uncommitted_state():
+            raise UncommittedSettings("Detected uncommitted "
+                                      "instrument settings.")
+
+        if int(n) < 1:
+            raise ValueOutOfRangeException("Invalid number of segments %d"
+                                           % n)
+
+        if self._segments is not None:
+            raise InvalidOperationException("A segmented capture is already "
+                                            "running.")
+
+        capture = _SegmentCapture(int(n), self.frame_length, self._stateid)
+        self._segments = capture
+
+        try:
+            if not capture.done.wait(timeout):
+                raise FrameTimeout("Captured %d of %d segments."
+                                   % (capture.data.count, n))
+        finally:
+            self._segments = None
+
+        return capture.data
+
+    def start_frame_recording(self, filename):
+        """ Start recording raw frame data to a local file.
+
+        Every frame packet received from the Moku:Lab is appended to
+        *filename* as it arrives, along with its receive time and the scaling
+        factors needed to interpret it. The recording can be decoded offline
+        using :any:`FrameReplayer`.
+
+        Recording continues until :any:`stop_frame_recording` is called.
+
+        :type filename: str
+        :param filename: Local file to record to. Overwritten if it exists.
+        """
+        if self._recorder is not None:
+            raise InvalidOperationException("A frame recording is already "
+                                            "running.")
+
+        self._recorder = FrameRecorder(filename, self)
+
+    def stop_frame_recording(self):
+        """ Stop a frame recording started by :any:`start_frame_recording`.
+
+        :return: Number of packets recorded.
+        """
+        rec, self._recorder = self._recorder, None
+
+        if rec is None:
+            return 0
+
+        rec.close()
+        return rec.packets
 
     def _set_running(self, state):
         prev_state = self._running
@@ -294,6 +595,9 @@ class FrameBasedInstrument(_input_instrument.InputInstrument,
             self._fr_worker.start()
         elif not state and prev_state:
             self._fr_worker.join()
+            # Release anyone still waiting on a frame
+            with self._frame_cond:
+                self._frame_cond.notify_all()
 
     def _make_frame_socket(self):
 
@@ -313,22 +617,55 @@ class FrameBasedInstrument(_input_instrument.InputInstrument,
             self._make_frame_socket()
 
             fr = self._frame_class(**self._frame_kwargs)
+            stats = self._stats
+            next_export = time.time() + self._stats_interval
 
             try:
                 while self._running:
                     if self.skt in zmq.select([self.skt], [], [], 1.0)[0]:
                         connected = True
                         d = self.skt.recv()
+                        rxtime = time.time()
+
+                        recorder = self._recorder
+                        if recorder is not None:
+                            recorder.add_packet(d, rxtime)
+
+                        start = time.time()
                         fr.add_packet(d)
+                        decode_time = time.time() - start
+
+                        with stats._lock:
+                            stats.packets += 1
+                            stats.bytes += len(d)
+                            stats.incomplete += fr._incomplete
+                            stats.rejected += fr._rejected
+                            if fr._complete:
+                                stats.completed += 1
+                                stats.decode_time.add(decode_time)
+                        fr._incomplete = fr._rejected = 0
 
                         if fr._complete:
-                            self._queue.put_nowait(fr)
+                            fr._rxtime = rxtime
+                            self._publish_frame(fr)
+
+                            segments = self._segments
+                            if segments is not None:
+                                segments.add(fr, time.time())
+
                             fr = self._frame_class(**self._frame_kwargs)
                     else:
                         if connected:
                             connected = False
                             log.info("Frame socket reconnecting")
+                            with stats._lock:
+                                stats.reconnects += 1
                             self._make_frame_socket()
+
+                    if self._stats_hook is not None and \
+                            time.time() >= next_export:
+                        next_export = time.time() + self._stats_interval
+                        self._export_stats()
             except Exception:
                 log.exception("Closed Frame worker")
             finally:
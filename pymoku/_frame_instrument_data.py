@@ -1,8 +1,14 @@
 import struct
 
 import logging
+from collections import OrderedDict
 log = logging.getLogger('frdat')
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 class InstrumentData(object):
     """
@@ -41,6 +47,16 @@ class InstrumentData(object):
 
         self._flags = None
 
+        # Pipeline counters, collected by the frame worker. The number of
+        # partially-received frames abandoned because a packet from a newer
+        # frame arrived (i.e. a packet was dropped), and the number of
+        # complete frames discarded by process_complete.
+        self._incomplete = 0
+        self._rejected = 0
+
+        # Local time at which the frame was completed by the frame worker
+        self._rxtime = None
+
     def add_packet(self, packet):
         hdr_len = 8
         meta_len = 8 * 4
@@ -51,6 +67,8 @@ class InstrumentData(object):
 
         if self.waveformid != waveformid or self._stateid != \
                 stateid or self._trigstate != trigstate:
+            if any(self._chs_valid):
+                self._incomplete += 1
             self.waveformid = waveformid
             self._stateid = stateid
             self._trigstate = trigstate
@@ -67,6 +85,7 @@ class InstrumentData(object):
 
         if self._complete:
             if not self.process_complete():
+                self._rejected += 1
                 self._complete = False
                 self._chs_valid = [False, False]
 
@@ -91,3 +110,117 @@ class InstrumentData(object):
         # Designed to be overridden by subclasses needing to add x-axis to
         # buffer data etc.
         return True
+
+
+class ScalesRegistry(object):
+    """
+    Per-state store of the scaling factors needed to interpret frames.
+
+    Instruments save a dictionary of scales against each state ID as it's
+    committed; frames look up the scales for the state they were rendered in.
+    Anything the frame decode needs that depends only on the state (time or
+    frequency axes, correction vectors) is computed once on insertion by the
+    *derive* callable and cached alongside, so per-frame work is limited to
+    applying it to the data.
+
+    State IDs are 8 bits, so by default no more than 256 states are kept; the
+    oldest is discarded first.
+    """
+    def __init__(self, derive=None, maxlen=256):
+        self._derive = derive
+        self._maxlen = maxlen
+        self._states = OrderedDict()
+
+    def __setitem__(self, stateid, scales):
+        derived = self._derive(scales) if self._derive else {}
+
+        # Re-inserting a wrapped state ID should make it the newest entry
+        self._states.pop(stateid, None)
+        self._states[stateid] = (scales, derived)
+
+        while len(self._states) > self._maxlen:
+            self._states.popitem(last=False)
+
+    def __getitem__(self, stateid):
+        return self._states[stateid][0]
+
+    def __contains__(self, stateid):
+        return stateid in self._states
+
+    def __len__(self):
+        return len(self._states)
+
+    def get(self, stateid, default=None):
+        entry = self._states.get(stateid)
+        return entry[0] if entry is not None else default
+
+    def derived(self, stateid):
+        """ Return the cached values derived from the scales of *stateid* """
+        return self._states[stateid][1]
+
+    def lookup(self, stateid):
+        """ Return the (scales, derived) pair for *stateid*, or
+        (None, None) if the state is unknown. """
+        return self._states.get(stateid, (None, None))
+
+    def clear(self):
+        self._states.clear()
+
+
+class SegmentData(object):
+    """
+    Object representing a block of distinct triggered waveforms, captured
+    back-to-back by :any:`capture_segments
+    <pymoku._frame_instrument.FrameBasedInstrument.capture_segments>`.
+
+    Each row of the channel arrays holds the data of one waveform, in the same
+    units as the instrument's :any:`InstrumentData` frames. Samples that were
+    invalid in the original frame are NaN.
+
+    - ``ch1`` = ``[[CH1_DATA], ...]``, shape (n, width)
+    - ``ch2`` = ``[[CH2_DATA], ...]``, shape (n, width)
+    - ``timestamps`` = ``[t, ...]``, local receive time of each segment
+    - ``waveformids`` = ``[n, ...]``, *waveformid* of each segment
+    """
+    def __init__(self, n, width):
+        #: Channel 1 segments, one waveform per row
+        self.ch1 = np.full((n, width), np.nan)
+
+        #: Channel 2 segments, one waveform per row
+        self.ch2 = np.full((n, width), np.nan)
+
+        #: Local time (seconds since the epoch) each segment was received
+        self.timestamps = np.zeros(n)
+
+        #: Waveform ID of each segment
+        self.waveformids = np.zeros(n, dtype=np.uint32)
+
+        # Number of rows filled so far
+        self.count = 0
+
+        self._stateid = None
+
+    def __json__(self):
+        return {'ch1': self.ch1.tolist(),
+                'ch2': self.ch2.tolist(),
+                'timestamps': self.timestamps.tolist(),
+                'waveform_ids': self.waveformids.tolist()}
+
+    def __len__(self):
+        return self.count
+
+    def _add_frame(self, frame, timestamp):
+        # Copy a decoded frame's channel data in to the next free row.
+        # Returns True once the block is full.
+        i = self.count
+        width = self.ch1.shape[1]
+
+        ch1 = np.asarray(frame.ch1[:width], dtype=float)
+        ch2 = np.asarray(frame.ch2[:width], dtype=float)
+        self.ch1[i, :len(ch1)] = ch1
+        self.ch2[i, :len(ch2)] = ch2
+        self.timestamps[i] = timestamp
+        self.waveformids[i] = frame.waveformid
+
+        self.count += 1
+        return self.count == len(self.timestamps)
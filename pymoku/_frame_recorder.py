@@ -0,0 +1,188 @@
+import json
+import struct
+import threading
+import time
+import logging
+
+from pymoku import InvalidFileException
+
+log = logging.getLogger(__name__)
+
+_FR_MAGIC = b'LIFR'
+_FR_VERSION = 1
+
+# File header: magic, version, instrument ID
+_FR_HDR = struct.Struct('<4sBB')
+# Record header: record type, receive timestamp, payload length
+_FR_REC = struct.Struct('<BdI')
+
+_FR_REC_PACKET = 1
+_FR_REC_SCALES = 2
+
+
+class FrameRecorder(object):
+    """
+    Records the raw frame packets received by a :any:`FrameBasedInstrument`
+    to a compact binary file, for later replay with :any:`FrameReplayer`.
+
+    Every packet is stored exactly as received on the frame socket, prefixed
+    by its local receive timestamp and length. The scaling factors of each
+    instrument state are stored once, ahead of the first packet in that
+    state, so the file can be decoded without the original instrument.
+
+    Normally created by :any:`start_frame_recording
+    <pymoku._frame_instrument.FrameBasedInstrument.start_frame_recording>`
+    rather than directly.
+    """
+    def __init__(self, filename, instrument):
+        self.filename = filename
+        self.packets = 0
+
+        self._instrument = instrument
+        self._lock = threading.Lock()
+        self._states = {}
+
+        self.file = open(filename, 'wb')
+        self.file.write(_FR_HDR.pack(_FR_MAGIC, _FR_VERSION, instrument.id))
+
+    def _write_record(self, rtype, timestamp, payload):
+        self.file.write(_FR_REC.pack(rtype, timestamp, len(payload)))
+        self.file.write(payload)
+
+    def add_packet(self, packet, timestamp):
+        """ Append a raw frame packet received at *timestamp* """
+        stateid = struct.unpack('<B', packet[:1])[0]
+        scales = self._instrument.scales.get(stateid)
+
+        with self._lock:
+            if self.file is None:
+                return
+
+            # The state ID wraps, so check the scales object itself rather
+            # than just whether we've seen the ID before.
+            if scales is not None and self._states.get(stateid) is not scales:
+                self._states[stateid] = scales
+                payload = json.dumps({'stateid': stateid,
+                                      'scales': scales}).encode('ascii')
+                self._write_record(_FR_REC_SCALES, timestamp, payload)
+
+            self._write_record(_FR_REC_PACKET, timestamp, bytes(packet))
+            self.packets += 1
+
+    def close(self):
+        with self._lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class FrameReplayer(object):
+    """
+    Reads a file written by :any:`FrameRecorder` and feeds the packets back
+    through the instrument's own frame decoding.
+
+    The *instrument* should be a new (undeployed) object of the same type as
+    was recording, e.g. ``FrameReplayer('osc.fr', Oscilloscope())``. The
+    recorded scaling factors are loaded in to it so that the resulting frames
+    are identical to those originally returned by :any:`get_realtime_data`.
+
+    Presents the iterator interface and the context manager interface:
+
+    with FrameReplayer('osc.fr', Oscilloscope()) as r:
+        for frame in r:
+            do_something(frame.ch1)
+    """
+    def __init__(self, filename, instrument):
+        self.filename = filename
+        self.file = open(filename, 'rb')
+
+        self._instrument = instrument
+
+        magic, version, instr = _FR_HDR.unpack(self.file.read(_FR_HDR.size))
+
+        if magic != _FR_MAGIC:
+            raise InvalidFileException("Bad Magic")
+        if version != _FR_VERSION:
+            raise InvalidFileException("Unknown File Version %d" % version)
+        if instr != instrument.id:
+            raise InvalidFileException("File recorded from instrument %d, "
+                                       "can't replay through %d"
+                                       % (instr, instrument.id))
+
+    def _records(self):
+        while True:
+            hdr = self.file.read(_FR_REC.size)
+            if len(hdr) < _FR_REC.size:
+                return
+
+            rtype, timestamp, length = _FR_REC.unpack(hdr)
+            payload = self.file.read(length)
+            if len(payload) < length:
+                log.warning("Truncated frame record in %s", self.filename)
+                return
+
+            yield rtype, timestamp, payload
+
+    def _load_scales(self, payload):
+        d = json.loads(payload.decode('ascii'))
+        self._instrument.scales[d['stateid']] = d['scales']
+
+    def packets(self):
+        """ Iterate over the raw recorded packets.
+
+        :return: generator of (timestamp, packet) tuples
+        """
+        for rtype, timestamp, payload in self._records():
+            if rtype == _FR_REC_SCALES:
+                self._load_scales(payload)
+            elif rtype == _FR_REC_PACKET:
+                yield timestamp, payload
+
+    def frames(self, realtime=False):
+        """ Iterate over the decoded frames.
+
+        :type realtime: bool
+        :param realtime: If *True*, frames are returned at the same rate as
+            they were originally received, otherwise as fast as they can be
+            decoded.
+
+        :return: generator of :any:`InstrumentData` subclass objects
+        """
+        instr = self._instrument
+        fr = instr._frame_class(**instr._frame_kwargs)
+        start, first = None, None
+
+        for timestamp, packet in self.packets():
+            fr.add_packet(packet)
+
+            if not fr._complete:
+                continue
+
+            if realtime:
+                if start is None:
+                    start, first = time.time(), timestamp
+                else:
+                    delay = (timestamp - first) - (time.time() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+
+            yield fr
+            fr = instr._frame_class(**instr._frame_kwargs)
+
+    def close(self):
+        self.file.close()
+
+    def __iter__(self):
+        return self.frames()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
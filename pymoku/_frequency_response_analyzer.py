@@ -13,10 +13,17 @@ from pymoku._instrument import SWEEP
 from pymoku._instrument import FULL_FRAME
 from pymoku._instrument import RDR_DDS
 from pymoku._instrument import ValueOutOfRangeException
+from pymoku._instrument import InvalidOperationException
 from pymoku import _frame_instrument
 from pymoku import _utils
 
 from ._frequency_response_analyzer_data import FRAData
+from ._frame_instrument_data import ScalesRegistry
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 log = logging.getLogger(__name__)
 
@@ -49,17 +56,26 @@ _FRA_SCREEN_WIDTH = 1024
 _FRA_FREQ_SCALE = 2**48 / _FRA_DAC_SMPS
 _FRA_FXP_SCALE = 2.0**30
 
+# Accumulator gain for each range of predicted averaging period (in FPGA
+# clock cycles), up to and including the given bound
+_FRA_AVERAGE_PERIODS = [2**15, 2**20, 2**25, 2**30, 2**35]
+_FRA_AVERAGE_GAINS = [2**4, 2**-1, 2**-6, 2**-11, 2**-16, 2**-20]
+
 
 class FrequencyResponseAnalyzer(_frame_instrument.FrameBasedInstrument):
     """ Frequency Response Analyzer instrument object.
 
     This should be instantiated and attached to a :any:`Moku` instance.
     """
+    _snapshot_exclude = \
+        _frame_instrument.FrameBasedInstrument._snapshot_exclude | \
+        frozenset(['_sweep_key', '_sweep_scales'])
+
     def __init__(self):
         super(FrequencyResponseAnalyzer, self).__init__()
         self._register_accessors(_fra_reg_handlers)
 
-        self.scales = {}
+        self.scales = ScalesRegistry()
         self._set_frame_class(FRAData, instrument=self, scales=self.scales)
 
         self.id = 9
@@ -68,6 +84,11 @@ class FrequencyResponseAnalyzer(_frame_instrument.FrameBasedInstrument):
         self.sweep_amp_volts_ch1 = 0
         self.sweep_amp_volts_ch2 = 0
 
+        # Frequency axis and gain correction for the last sweep settings seen
+        # by _calculate_scales, keyed on those settings
+        self._sweep_key = None
+        self._sweep_scales = None
+
     def _calculate_sweep_delta(self, start_frequency, end_frequency,
                                sweep_length, log_scale):
 
@@ -87,6 +108,15 @@ class FrequencyResponseAnalyzer(_frame_instrument.FrameBasedInstrument):
         f_start = self.sweep_freq_min
         fs = []
 
+        if np is not None:
+            n = np.arange(self.sweep_length)
+            if self.log_en:
+                fs = f_start * (1 + (self.sweep_freq_delta / _FRA_FXP_SCALE)) \
+                    ** n
+            else:
+                fs = f_start + n * (self.sweep_freq_delta / _FRA_FREQ_SCALE)
+            return fs.tolist()
+
         if self.log_en:
             # Delta register becomes a multiplier in the logarithmic case
             # Fixed-point precision is used in the FPGA multiplier
@@ -99,6 +129,9 @@ class FrequencyResponseAnalyzer(_frame_instrument.FrameBasedInstrument):
         return fs
 
     def _calculate_gain_correction(self, fs):
+        if np is not None:
+            return self._calculate_gain_correction_array(fs)
+
         sweep_freq = fs
 
         cycles_time = [0.0] * self.sweep_length
@@ -156,6 +189,61 @@ class FrequencyResponseAnalyzer(_frame_instrument.FrameBasedInstrument):
 
         return gain_scale
 
+    def _calculate_gain_correction_array(self, fs):
+        # Array version of _calculate_gain_correction
+        sweep_freq = np.asarray(fs, dtype=float)
+        averaging_time = self.averaging_time
+        averaging_cycles = self.averaging_cycles
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sweep_period = 1 / sweep_freq
+
+            if np.all(sweep_freq):
+                cycles_time = averaging_cycles / sweep_freq
+            else:
+                cycles_time = np.zeros(len(sweep_freq))
+
+            points_per_freq = np.ceil(
+                sweep_freq * np.maximum(averaging_time, cycles_time) - 1e-12)
+
+            # Predict how many FPGA clock cycles each frequency averages for
+            average_period_cycles = averaging_cycles * sweep_period \
+                * _FRA_FPGA_CLOCK
+            average_period_time = np.where(
+                np.mod(averaging_time, sweep_period) == 0,
+                averaging_time * _FRA_FPGA_CLOCK,
+                np.ceil(averaging_time / sweep_period) * sweep_period
+                * _FRA_FPGA_CLOCK)
+            average_period = np.maximum(average_period_time,
+                                        average_period_cycles)
+
+            # Scale according to the predicted accumulator counter size
+            average_gain = np.take(
+                _FRA_AVERAGE_GAINS,
+                np.searchsorted(_FRA_AVERAGE_PERIODS, average_period,
+                                side='left'))
+
+            gain_scale = np.where(
+                sweep_freq > 0.0,
+                np.ceil(average_gain * points_per_freq * _FRA_FPGA_CLOCK
+                        / sweep_freq),
+                average_gain)
+
+        return gain_scale.tolist()
+
+    def _calculate_sweep_scales(self):
+        # The frequency axis and gain correction only depend on the sweep and
+        # averaging settings, so are only recalculated when those change.
+        key = (self.sweep_freq_min, self.sweep_freq_delta, self.sweep_length,
+               self.log_en, self.averaging_time, self.averaging_cycles)
+
+        if key != self._sweep_key:
+            fs = self._calculate_freq_axis()
+            self._sweep_scales = (fs, self._calculate_gain_correction(fs))
+            self._sweep_key = key
+
+        return self._sweep_scales
+
     @needs_commit
     def set_input_range(self, ch, input_range):
         """Set the input range for a channel.
@@ -178,8 +266,7 @@ class FrequencyResponseAnalyzer(_frame_instrument.FrameBasedInstrument):
 
     def _calculate_scales(self):
         g1, g2 = self._adc_gains()
-        fs = self._calculate_freq_axis()
-        gs = self._calculate_gain_correction(fs)
+        fs, gs = self._calculate_sweep_scales()
 
         return {'g1': g1,
                 'g2': g2,
@@ -497,6 +584,16 @@ class FrequencyResponseAnalyzer(_frame_instrument.FrameBasedInstrument):
         return super(FrequencyResponseAnalyzer,
                      self).get_realtime_data(timeout, wait)
 
+    def capture_segments(self, n, timeout=None):
+        """ Not supported on the FrequencyResponseAnalyzer.
+
+        Each frame is a complete sweep rather than a triggered waveform; use
+        :any:`get_data <pymoku.instruments.FrequencyResponseAnalyzer.get_data>`
+        instead.
+        """
+        raise InvalidOperationException("Segmented capture is not supported "
+                                        "by the Frequency Response Analyzer.")
+
     def commit(self):
         # Restart the sweep as instrument settings are being changed
         self._restart_sweep()
@@ -508,6 +605,9 @@ class FrequencyResponseAnalyzer(_frame_instrument.FrameBasedInstrument):
         self.scales[self._stateid] = self._calculate_scales()
     commit.__doc__ = MokuInstrument.commit.__doc__
 
+    def _on_restore(self):
+        self._restart_sweep()
+
 
 _fra_reg_handlers = {
     'loop_sweep':
@@ -3,12 +3,36 @@ import struct
 
 from pymoku import _frame_instrument
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _to_list(a):
+    # Array to list, with NaNs replaced by None to match the Python path
+    data = a.tolist()
+    invalid = np.isnan(a)
+    if invalid.any():
+        for i in np.flatnonzero(invalid):
+            data[i] = None
+    return data
+
 
 class _FRAChannelData():
 
     def __init__(self, input_signal, gain_correction,
                  front_end_scale, output_amp):
 
+        # Complex transfer function (measured signal relative to the output
+        # amplitude). Only computed when the input is a NumPy array.
+        self.transfer = None
+
+        if np is not None and isinstance(input_signal, np.ndarray):
+            self._process_array(input_signal, gain_correction,
+                                front_end_scale, output_amp)
+            return
+
         # Extract the length of the signal (this varies with number of
         # sweep points)
         sig_len = len(gain_correction)
@@ -42,6 +66,38 @@ class _FRAChannelData():
                       else (math.atan2(Q or 0, I or 0)) / (2.0 * math.pi)
                       for I, Q in zip(self.i_sig, self.q_sig)]
 
+    def _process_array(self, input_signal, gain_correction,
+                       front_end_scale, output_amp):
+        # Array version of the above. The input signal is interleaved I/Q
+        # floats with NaN marking invalid samples.
+        sig_len = min(len(gain_correction), len(input_signal) // 2)
+
+        # De-interleave IQ values as strided views of the input
+        self.i_sig = input_signal[0:2 * sig_len:2]
+        self.q_sig = input_signal[1:2 * sig_len:2]
+
+        gain = np.asarray(gain_correction[:sig_len], dtype=float)
+        gain = np.where(gain == 0, 1.0, gain)
+
+        iq = self.i_sig + 1j * self.q_sig
+        mag = 2.0 * np.abs(iq) * front_end_scale / gain
+
+        # As above, no valid dB or transfer function without an output_amp
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if output_amp:
+                self.transfer = 2.0 * iq * front_end_scale / gain / output_amp
+                mag_db = 20.0 * np.log10(mag / output_amp)
+                mag_db[mag == 0] = np.nan
+            else:
+                self.transfer = np.full(sig_len, np.nan, dtype=complex)
+                mag_db = np.full(sig_len, np.nan)
+
+        phase = np.angle(iq) / (2.0 * math.pi)
+
+        self.magnitude = _to_list(mag)
+        self.magnitude_dB = _to_list(mag_db)
+        self.phase = _to_list(phase)
+
     def __json__(self):
         return {'magnitude': self.magnitude,
                 'magnitude_dB': self.magnitude_dB,
@@ -67,6 +123,8 @@ class FRAData(_frame_instrument.InstrumentData):
     - ``ch2.magnitude`` = ``[CH2_MAG_DATA]``
     - ``ch2.magnitude_dB`` = ``[CH2_MAG_DATA_DB]``
     - ``ch2.phase`` = ``[CH2_PHASE_DATA]``
+    - ``ch1.transfer``, ``ch2.transfer`` = complex transfer function arrays
+      (only when NumPy is installed, otherwise *None*)
     - ``frequency`` = ``[FREQ]``
     - ``waveformid`` = ``n``
 
@@ -102,6 +160,9 @@ class FRAData(_frame_instrument.InstrumentData):
         # configuration
         scales = self.scales[self._stateid]
 
+        if np is not None:
+            return self._process_complete_array(scales)
+
         try:
             self.frequency = scales['frequency_axis']
 
@@ -133,3 +194,32 @@ class FRAData(_frame_instrument.InstrumentData):
 
         # A valid frame is there's at least one valid sample in each channel
         return self.ch1 and self.ch2
+
+    def _bits_array(self, raw):
+        dat = np.frombuffer(raw, dtype='<i4')
+        bits = dat.astype(float)
+        bits[dat == -0x80000000] = np.nan
+        return bits
+
+    def _process_complete_array(self, scales):
+        try:
+            self.frequency = scales['frequency_axis']
+
+            self.ch1_bits = self._bits_array(self._raw1)
+            self.ch1 = _FRAChannelData(self.ch1_bits,
+                                       scales['gain_correction'],
+                                       scales['g1'],
+                                       scales['sweep_amplitude_ch1'])
+
+            self.ch2_bits = self._bits_array(self._raw2)
+            self.ch2 = _FRAChannelData(self.ch2_bits,
+                                       scales['gain_correction'],
+                                       scales['g2'],
+                                       scales['sweep_amplitude_ch2'])
+        except ValueError:
+            # Truncated packet, force a reinitialisation on next packet
+            self._frameid = None
+            self._complete = False
+            return False
+
+        return True
@@ -0,0 +1,34 @@
+import bisect
+
+# Upper bucket edges, in seconds, of the frame pipeline and RPC timing
+# histograms
+_HIST_EDGES = [0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05,
+               0.1, 0.2, 0.5, 1.0, float('inf')]
+
+
+class Histogram(object):
+    """ Fixed-bucket histogram of durations, cheap enough to update per frame
+    or per request. """
+    def __init__(self, edges=_HIST_EDGES):
+        self.edges = edges
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * len(self.edges)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'buckets': list(zip(self.edges, self.counts)),
+        }
@@ -14,6 +14,9 @@ class IIRBlock(object):
         self._gain_frac_width = gain_frac_width
         self.use_mmap = use_mmap
 
+        # Coefficient registers all share the one format
+        self._coeff_xform = to_reg_signed(0, coeff_frac_width + 2)
+
     def _convert_coeffs(self, filt_coeffs):
 
         intermediate_filter = deepcopy(filt_coeffs)
@@ -76,8 +79,5 @@ class IIRBlock(object):
         for stage in range(self.num_stages):
             for coeff in range(6):
                 r = self.reg_base + 6 * stage + coeff
-                self._instr._accessor_set(r,
-                                          to_reg_signed(
-                                              0,
-                                              self._coeff_frac_width + 2),
+                self._instr._accessor_set(r, self._coeff_xform,
                                           coeffs_converted[stage][coeff])
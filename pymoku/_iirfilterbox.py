@@ -1,7 +1,6 @@
 
 import logging
 import struct
-from copy import deepcopy
 from pymoku._oscilloscope import _CoreOscilloscope
 from pymoku._instrument import to_reg_signed
 from pymoku._instrument import from_reg_signed
@@ -76,6 +75,61 @@ _IIR_CHN_BUFLEN = 2**13
 _ADC_DEFAULT_CALIBRATION = 3750.0  # Bits/V (No attenuation)
 
 
+def _convert_filter(filter_coefficients):
+    """ Check an array of SOS filter coefficients in the format described by
+    :any:`IIRFilterBox` and convert it to the table loaded in to the device.
+
+    The table has a row for each SOS stage. The s coefficients are
+    multiplied in to the b coefficients and replaced by 1.0, except for the
+    final stage where s is replaced by the gain G.
+    """
+    rows = [list(r) for r in filter_coefficients]
+
+    # Array dimension check
+    if len(rows) != 5:
+        _utils.check_parameter_valid('set', len(rows), [5],
+                                     'number of coefficient array rows')
+    if len(rows[0]) != 1:
+        _utils.check_parameter_valid(
+            'set', len(rows[0]), [1],
+            'number of columns in coefficient array row 0')
+    for m in range(1, 5):
+        if len(rows[m]) != 6:
+            _utils.check_parameter_valid(
+                'set', len(rows[m]), [6],
+                "number of columns in coefficient array row %s" % m)
+
+    # Array values check
+    _utils.check_parameter_valid(
+        'range', rows[0][0], [-8e6, 8e6 - 2**(-24)],
+        "coefficient array entry m = 0, n = 0")
+    for m, n in [(m, n) for m in range(1, 5) for n in range(6)
+                 if not -4.0 <= rows[m][n] <= 4.0 - 2**(-45)]:
+        _utils.check_parameter_valid(
+            'range', rows[m][n], [-4.0, 4.0 - 2**(-45)],
+            "coefficient array entry m = %s, n = %s" % (m, n))
+
+    table = [[1.0, s * b0, s * b1, s * b2, a1, a2]
+             for s, b0, b1, b2, a1, a2 in rows[1:]]
+    table[3][0] = rows[0][0]
+
+    return table
+
+
+def _filter_image(filter_ch1, filter_ch2):
+    """ Pack the coefficient tables of both channels in to the memory map
+    image: for each channel, for each coefficient, the value for each SOS
+    stage as a signed 64-bit fixed-point number. """
+    scales = [2.0 ** (_IIR_COEFFWIDTH - 24)] + \
+        [2.0 ** (_IIR_COEFFWIDTH - 3)] * 5
+
+    values = [int(round(scales[y] * table[x][y]))
+              for table in (filter_ch1, filter_ch2)
+              for y in range(6) for x in range(4)]
+
+    return struct.pack('<%dq' % len(values), *values)
+
+
 class IIRFilterBox(_CoreOscilloscope):
     """
 
@@ -130,6 +184,9 @@ class IIRFilterBox(_CoreOscilloscope):
         filter performance. Filter responses should be checked prior to use.
 
     """
+    _snapshot_exclude = _CoreOscilloscope._snapshot_exclude | \
+        frozenset(['_filter_image'])
+
     def __init__(self):
         """Create a new IIR FilterBox instrument, ready to be attached to a
         Moku."""
@@ -170,6 +227,10 @@ class IIRFilterBox(_CoreOscilloscope):
         self.filter_ch1 = [[0, 0, 0, 0, 0, 0]] * 4
         self.filter_ch2 = [[0, 0, 0, 0, 0, 0]] * 4
 
+        # Coefficient image last uploaded, so unchanged filters aren't sent
+        # again
+        self._filter_image = None
+
     @needs_commit
     def set_defaults(self):
         """ Reset the IIR to sane defaults. """
@@ -281,6 +342,8 @@ class IIRFilterBox(_CoreOscilloscope):
         Set SOS filter sample rate and filter coefficients. This also enables
         the input and outputs of the specified Moku:Lab channel.
 
+        To set both channels at once, use :any:`set_filters`.
+
         :type ch: int; {1,2}
         :param ch: target channel
 
@@ -292,112 +355,56 @@ class IIRFilterBox(_CoreOscilloscope):
         :param filter_coefficients: array containing SOS filter coefficients.
             Format is described in class documentation above.
         """
-        _utils.check_parameter_valid('set', ch, [1, 2], 'filter channel')
-        _utils.check_parameter_valid('set', sample_rate, ['high', 'low'],
-                                     'filter sample rate')
+        self.set_filters({ch: (sample_rate, filter_coefficients)})
 
-        # Set the filter input samplerate
-        factor = (8 if sample_rate == 'high' else 1024)
-        if ch == 1:
-            self._decfilter1.set_samplerate(factor)
-        else:
-            self._decfilter2.set_samplerate(factor)
-
-        # Conversion of input array (typically generated by Scipy/Matlab) to
-        # HDL memory map format
-        if filter_coefficients is not None:
-
-            # Deep copy to avoid modifying user's original input array
-            intermediate_filter = deepcopy(filter_coefficients)
-
-            # Array dimension check
-            if len(filter_coefficients) != 5:
-                _utils.check_parameter_valid('set',
-                                             len(filter_coefficients),
-                                             [5],
-                                             'number of coefficient array rows'
-                                             )
-            for m in range(4):
-                if m == 0:
-                    if len(filter_coefficients[0]) != 1:
-                        _utils.check_parameter_valid(
-                            'set', len(filter_coefficients[0]),
-                            [1],
-                            'number of columns in coefficient array row 0')
-                else:
-                    if len(filter_coefficients[m]) != 6:
-                        _utils.check_parameter_valid(
-                            'set',
-                            len(filter_coefficients[m]), [6],
-                            ("number of columns in coefficient array row %s"
-                             % (m)))
-
-            # Array values check
-            _utils.check_parameter_valid(
-                'range', filter_coefficients[0][0], [-8e6, 8e6 - 2**(-24)],
-                ("coefficient array entry m = %s, n = %s" % (0, 0)))
-            for m in range(1, 5):
-                for n in range(6):
-                    _utils.check_parameter_valid(
-                        'range', filter_coefficients[m][n],
-                        [-4.0, 4.0 - 2**(-45)],
-                        ("coefficient array entry m = %s, n = %s" % (0, 0)))
-
-            # multiply S coefficients into B coefficients and replace all S
-            # coefficients with 1.0
-            for n in range(1, 5):
-                intermediate_filter[n][1] *= intermediate_filter[n][0]
-                intermediate_filter[n][2] *= intermediate_filter[n][0]
-                intermediate_filter[n][3] *= intermediate_filter[n][0]
-                intermediate_filter[n][0] = 1.0
-
-            # place gain factor G into S coefficient position 4 to comply
-            # with HDL requirements:
-            intermediate_filter[4][0] = intermediate_filter[0][0]
-            intermediate_filter = intermediate_filter[1: 5]
+    # NOTE: This function avoids @needs_commit because it calls
+    # _set_mmap_access which requires an immediate commit
+    def set_filters(self, filters):
+        """
+        Set the SOS filter sample rate and filter coefficients of one or both
+        channels. This also enables the inputs and outputs of those channels.
+
+        Equivalent to calling :any:`set_filter` for each channel, except that
+        the coefficients of both channels are uploaded to the Moku:Lab
+        together and the settings are applied in a single commit. If the
+        coefficients are the same as those already loaded, they aren't
+        uploaded again. For example::
+
+            i.set_filters({1: ('high', coeffs1), 2: ('low', coeffs2)})
 
+        :type filters: dict
+        :param filters: map of channel {1,2} to a (*sample_rate*,
+            *filter_coefficients*) tuple, see :any:`set_filter`.
+        """
+        # Check all channels before changing any settings
+        tables = {}
+        for ch, (sample_rate, filter_coefficients) in filters.items():
+            _utils.check_parameter_valid('set', ch, [1, 2], 'filter channel')
+            _utils.check_parameter_valid('set', sample_rate, ['high', 'low'],
+                                         'filter sample rate')
+            if filter_coefficients is not None:
+                tables[ch] = _convert_filter(filter_coefficients)
+
+        for ch, (sample_rate, _) in filters.items():
+            # Set the filter input samplerate
+            factor = (8 if sample_rate == 'high' else 1024)
             if ch == 1:
-                self.filter_ch1 = intermediate_filter
+                self._decfilter1.set_samplerate(factor)
             else:
-                self.filter_ch2 = intermediate_filter
-
-        # combine both filter arrays:
-        filter_coeffs = [[0.0] * 6] * 4
-        coeff_list = [[[0 for k in range(2)] for x in range(6)]
-                      for y in range(8)]
-        for n in range(4):
-            filter_coeffs[n] = self.filter_ch1[n] + self.filter_ch2[n]
-
-        for k in range(2):
-            for x in range(4):
-                for y in range(6):
-                    if y == 0:
-                        coeff_list[x][y][k] = int(
-                            round(2 ** (_IIR_COEFFWIDTH - 24) * (
-                                filter_coeffs[x][y + k * 6])))
-                    else:
-                        coeff_list[x][y][k] = int(
-                            round(2 ** (_IIR_COEFFWIDTH - 3) * (
-                                filter_coeffs[x][y + k * 6])))
-        coeff_bytes = bytearray()
-        for k in range(2):
-            for y in range(6):
-                for x in range(4):
-                    coeff_bytes += bytearray(
-                        struct.pack('<q', coeff_list[x][y][k]))
+                self._decfilter2.set_samplerate(factor)
 
-        self._set_mmap_access(True)
-        self._moku._send_file_bytes('j', '', coeff_bytes)
-        self._set_mmap_access(False)
+        if 1 in tables:
+            self.filter_ch1 = tables[1]
+        if 2 in tables:
+            self.filter_ch2 = tables[2]
 
-        # Release the memory map "file" to other resources
-        self._moku._fs_finalise('j', '', len(coeff_bytes))
+        self._upload_filters()
 
-        # Enable the output and input of the set channel
-        if ch == 1:
+        # Enable the output and input of the set channels
+        if 1 in filters:
             self.output_en1 = True
             self.input_en1 = True
-        else:
+        if 2 in filters:
             self.output_en2 = True
             self.input_en2 = True
 
@@ -405,6 +412,34 @@ class IIRFilterBox(_CoreOscilloscope):
         # not used in this function
         self.commit()
 
+    def _upload_filters(self):
+        image = _filter_image(self.filter_ch1, self.filter_ch2)
+        changed = image != self._filter_image
+
+        # The access bit is toggled even if nothing has changed, as it also
+        # resets the decimation blocks after a sample rate change.
+        self._set_mmap_access(True)
+        if changed:
+            self._moku._send_file_bytes('j', '', image)
+        self._set_mmap_access(False)
+
+        if changed:
+            # Release the memory map "file" to other resources
+            self._moku._fs_finalise('j', '', len(image))
+            self._filter_image = image
+        else:
+            log.debug("IIR coefficients unchanged, skipping upload")
+
+    def attach_moku(self, moku):
+        super(IIRFilterBox, self).attach_moku(moku)
+        # The coefficients in a newly attached device's memory are unknown
+        self._filter_image = None
+
+    def _restore_mmap(self):
+        # The device memory may have changed since the snapshot was taken
+        self._filter_image = None
+        self._upload_filters()
+
     @needs_commit
     def disable_output(self, ch):
         """
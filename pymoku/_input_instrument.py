@@ -32,12 +32,19 @@ class InputInstrument(_instrument.MokuInstrument):
         new streaming sessions.
     """
 
+    _snapshot_exclude = _instrument.MokuInstrument._snapshot_exclude | \
+        frozenset(['_dlskt', '_strparser', '_dldecode_time', '_dlserial',
+                   '_dlftype', 'ch1', 'ch2', 'nch', 'tag', 'logfile',
+                   '_no_data'])
+
     def __init__(self):
         super(InputInstrument, self).__init__()
         # Stream socket connection
         self._dlskt = None
         # Data parser for current session
         self._strparser = None
+        # Time spent parsing received stream data in the current session
+        self._dldecode_time = 0.0
         # Stream identifier number
         self._dlserial = 0
         # Current stream file type
@@ -467,8 +474,10 @@ class InputInstrument(_instrument.MokuInstrument):
 
         ch, start, coeff, raw = self._stream_get_samples_raw(timeout)
 
+        t0 = time.time()
         self._strparser.set_coeff(ch, coeff)
         self._strparser.parse(raw, ch, start_idx=start)
+        self._dldecode_time += time.time() - t0
 
     def _stream_get_processed_samples(self):
         """
@@ -537,18 +546,26 @@ class InputInstrument(_instrument.MokuInstrument):
         self._dlskt = ctx.socket(zmq.SUB)
         self._dlskt.connect("tcp://%s:27186" % self._moku._ip)
         self._dlskt.setsockopt_string(zmq.SUBSCRIBE, tag)
+        # Fixed-width formats (e.g. full buffer transfers) can skip the
+        # general bit-level parser
+        if dataparser.ArrayDataParser.supports(self.binstr, self.procstr):
+            parser = dataparser.ArrayDataParser
+        else:
+            parser = dataparser.LIDataParser
+
         # Zero offset from start time to first sample, valid for streams
         # but not so much for single frame transfers
-        self._strparser = dataparser.LIDataParser(self.ch1,
-                                                  self.ch2,
-                                                  self.binstr,
-                                                  self.procstr,
-                                                  self.fmtstr,
-                                                  self.hdrstr,
-                                                  self.timestep,
-                                                  int(time.time()),
-                                                  [0] * self.nch,
-                                                  0)
+        self._strparser = parser(self.ch1,
+                                 self.ch2,
+                                 self.binstr,
+                                 self.procstr,
+                                 self.fmtstr,
+                                 self.hdrstr,
+                                 self.timestep,
+                                 int(time.time()),
+                                 [0] * self.nch,
+                                 0)
+        self._dldecode_time = 0.0
 
     def _streamsub_destroy(self):
         if self._dlskt is not None:
@@ -1,5 +1,7 @@
+import json
 import logging
 import struct
+from contextlib import contextmanager
 from functools import wraps
 
 from pymoku import _get_autocommit
@@ -13,6 +15,11 @@ from pymoku import InvalidConfigurationException
 from pymoku import NoDataException
 from pymoku import MPNotMounted
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 REG_CTL = 0
 REG_STAT = 1
 REG_ID1 = 2
@@ -63,6 +70,12 @@ RELAY_DC = 1
 RELAY_LOWZ = 2
 RELAY_LOWG = 4
 
+# Registers that are read-only, or are managed by the commit and mmap
+# machinery, so are never written back by MokuInstrument.restore
+_SNAPSHOT_SKIP_REGS = (REG_CTL, REG_STAT, REG_ID1, REG_ID2, REG_MMAP_ACCESS,
+                       REG_STATE)
+_SNAPSHOT_VERSION = 1
+
 log = logging.getLogger(__name__)
 
 
@@ -118,12 +131,13 @@ def to_reg_signed(_offset, _len, allow_set=None, allow_range=None,
     """
     # TODO: This signed and the below unsigned share all but one line of
     # code, should consolidate
+    if allow_set and allow_range:
+        raise MokuException("Can't check against both ranges and sets")
+
+    mask = ((1 << _len) - 1) << _offset
+
     def __ss(obj, val, old):
         val = xform(obj, val)
-        mask = ((1 << _len) - 1) << _offset
-
-        if allow_set and allow_range:
-            raise MokuException("Can't check against both ranges and sets")
 
         if allow_set and val not in allow_set:
             return None
@@ -136,11 +150,12 @@ def to_reg_signed(_offset, _len, allow_set=None, allow_range=None,
             return (old & ~mask) | v
         except TypeError:
             r = []
+            m = mask
             for o in reversed(old):
-                r.insert(0, (o & ~mask) | v & 0xFFFFFFFF)
+                r.insert(0, (o & ~m) | v & 0xFFFFFFFF)
 
                 v = v >> 32
-                mask = mask >> 32
+                m = m >> 32
 
             return tuple(r)
 
@@ -162,12 +177,13 @@ def to_reg_unsigned(_offset, _len, allow_set=None, allow_range=None,
         attribute to the register value
     """
 
+    if allow_set and allow_range:
+        raise MokuException("Can't check against both ranges and sets")
+
+    mask = ((1 << _len) - 1) << _offset
+
     def __us(obj, val, old):
         val = xform(obj, val)
-        mask = ((1 << _len) - 1) << _offset
-
-        if allow_set and allow_range:
-            raise MokuException("Can't check against both ranges and sets")
 
         if allow_set and val not in allow_set:
             return None
@@ -180,11 +196,12 @@ def to_reg_unsigned(_offset, _len, allow_set=None, allow_range=None,
             return (old & ~mask) | v
         except TypeError:
             r = []
+            m = mask
             for o in reversed(old):
-                r.insert(0, (o & ~mask) | v & 0xFFFFFFFF)
+                r.insert(0, (o & ~m) | v & 0xFFFFFFFF)
 
                 v = v >> 32
-                mask = mask >> 32
+                m = m >> 32
 
             return tuple(r)
 
@@ -270,6 +287,124 @@ def from_reg_bool(_offset):
     return from_reg_unsigned(_offset, 1, xform=lambda obj, x: bool(x))
 
 
+class RegisterField(object):
+    """ Class-level descriptor for an attribute stored in a register (or a
+    compound register) of an instrument.
+
+    *reg* is relative to the *reg_base* attribute of the object the
+    descriptor lives on, and registers are read and written through that
+    object's *_instr*. This suits sub-blocks such as :any:`Trigger` that are
+    instantiated at several places in an instrument's register map, e.g.
+
+    class Block(object):
+        gain = RegisterField(1, to_reg_unsigned(0, 16),
+                             from_reg_unsigned(0, 16))
+
+    The transforms are built once, with the class, rather than on every
+    access.
+    """
+    def __init__(self, reg, set_xform, get_xform):
+        self.reg = reg
+        self.set_xform = set_xform
+        self.get_xform = get_xform
+        self.compound = isinstance(reg, (list, tuple))
+        self._regs = {}
+
+    def _read(self, instr, reg):
+        # Compound registers are combined MSW first, so the from_reg_*
+        # transforms don't have to handle sequences.
+        if self.compound:
+            v = 0
+            for r in reg:
+                c = instr._localregs[r]
+                if c is None:
+                    c = instr._remoteregs[r] or 0
+                v = (v << 32) | c
+        else:
+            v = instr._localregs[reg]
+            if v is None:
+                v = instr._remoteregs[reg] or 0
+
+        return self.get_xform(instr, v)
+
+    def _write(self, instr, reg, data):
+        if self.set_xform is None:
+            raise AttributeError("Register attribute is read-only")
+
+        if self.compound:
+            old = 0
+            for r in reg:
+                c = instr._localregs[r]
+                if c is None:
+                    c = instr._remoteregs[r] or 0
+                old = (old << 32) | c
+
+            new = self.set_xform(instr, data, old)
+            if new is None:
+                raise ValueOutOfRangeException("Reg %s Data %s" % (reg, data))
+
+            for r in reversed(reg):
+                instr._localregs[r] = new & 0xFFFFFFFF
+                new >>= 32
+        else:
+            old = instr._localregs[reg]
+            if old is None:
+                old = instr._remoteregs[reg] or 0
+
+            new = self.set_xform(instr, data, old)
+            if new is None:
+                raise ValueOutOfRangeException("Reg %d Data %d" % (reg, data))
+
+            instr._localregs[reg] = new
+
+    def _block_reg(self, base):
+        try:
+            return self._regs[base]
+        except KeyError:
+            if self.compound:
+                reg = tuple(base + r for r in self.reg)
+            else:
+                reg = base + self.reg
+            self._regs[base] = reg
+            return reg
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return self._read(obj._instr, self._block_reg(obj.reg_base))
+
+    def __set__(self, obj, value):
+        self._write(obj._instr, self._block_reg(obj.reg_base), value)
+
+
+class _RegisterAccessor(RegisterField):
+    # Descriptor for an instrument attribute listed in one of the
+    # instrument's register handler tables. These are installed on the
+    # instrument class by MokuInstrument._register_accessors.
+    def __init__(self, name, spec):
+        super(_RegisterAccessor, self).__init__(*spec)
+        self.name = name
+        self.spec = spec
+
+        # Cleared if instances of the class register different handlers
+        # under this name, in which case each instance's own table is used.
+        self.shared = True
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        if not self.shared:
+            reg, _, get_xform = obj._accessor_dict[self.name]
+            return obj._accessor_get(reg, get_xform)
+        return self._read(obj, self.reg)
+
+    def __set__(self, obj, value):
+        if not self.shared:
+            reg, set_xform, _ = obj._accessor_dict[self.name]
+            return obj._accessor_set(reg, set_xform, value)
+        self._write(obj, self.reg, value)
+
+
 _awaiting_commit = False
 
 
@@ -282,6 +417,10 @@ def needs_commit(func):
         if not _get_autocommit():
             # Not auto-committing
             return func(self, *args, **kwargs)
+        elif self._commit_deferred:
+            # Inside deferred_commit, which will commit once on exit
+            self._commit_pending = True
+            return func(self, *args, **kwargs)
         else:
             # Auto-committing
             global _awaiting_commit
@@ -314,6 +453,15 @@ class MokuInstrument(object):
     :any:`WaveformGenerator`)
     """
 
+    # Attributes describing the connection to, or running state of, the
+    # instrument rather than its configuration. These are never captured in
+    # a snapshot.
+    _snapshot_exclude = frozenset([
+        '_accessor_dict', '_moku', '_remoteregs', '_localregs', '_running',
+        '_stateid', '_commit_deferred', '_commit_pending', 'id', 'type',
+        'calibration',
+    ])
+
     def __init__(self):
         """ Must be called as the first line from any child
         implementations. """
@@ -324,6 +472,11 @@ class MokuInstrument(object):
         self._running = False
         self._stateid = 0
 
+        # Nesting depth of deferred_commit blocks, and whether any setter
+        # has been called within them
+        self._commit_deferred = 0
+        self._commit_pending = False
+
         self.id = 0
         self.type = "Dummy Instrument"
 
@@ -332,6 +485,22 @@ class MokuInstrument(object):
     def _register_accessors(self, accessor_dict):
         self._accessor_dict.update(accessor_dict)
 
+        # Generate class-level descriptors for the registers so access
+        # doesn't have to go through __getattr__ and the handler table.
+        cls = type(self)
+        for name, spec in accessor_dict.items():
+            acc = getattr(cls, name, None)
+
+            if acc is None or (isinstance(acc, _RegisterAccessor) and
+                               name not in cls.__dict__ and
+                               acc.spec is not spec):
+                setattr(cls, name, _RegisterAccessor(name, spec))
+            elif not isinstance(acc, _RegisterAccessor):
+                raise MokuException("Register %s would hide attribute of "
+                                    "%s" % (name, cls.__name__))
+            elif acc.spec is not spec:
+                acc.shared = False
+
     def _accessor_get(self, reg, get_xform):
         # Return local if present. Support a single register or a
         # tuple of registers
@@ -372,13 +541,6 @@ class MokuInstrument(object):
         else:
             raise AttributeError("No Attribute %s" % name)
 
-    def __setattr__(self, name, value):
-        if name != '_accessor_dict' and name in self._accessor_dict:
-            reg, set_xform, get_xform = self._accessor_dict[name]
-            return self._accessor_set(reg, set_xform, value)
-        else:
-            return super(MokuInstrument, self).__setattr__(name, value)
-
     @needs_commit
     def set_defaults(self):
         """ Can be extended in implementations to set initial state """
@@ -438,9 +600,199 @@ class MokuInstrument(object):
         # expose the update_state parameter to normal users
         return self._commit(update_state=True)
 
+    @contextmanager
+    def deferred_commit(self):
+        """
+        Context manager that merges the settings applied within it in to a
+        single commit.
+
+        With `autocommit` enabled (the default), each *set_* and *gen_*
+        function applies its settings to the Moku:Lab as soon as it's called.
+        Within this block they're instead accumulated and applied together
+        when the block exits, saving a network round trip per function and
+        meaning the instrument moves directly to the final configuration.
+        For example::
+
+            with i.deferred_commit():
+                i.set_frontend(1, fiftyr=True)
+                i.set_frontend(2, fiftyr=True)
+                i.set_timebase(-1e-3, 1e-3)
+                i.set_trigger('in1', 'rising', 0)
+
+        Blocks may be nested, only the outermost commits. The commit happens
+        even if the block raises an exception, as it would have for the
+        individual functions. Data returned by :any:`get_realtime_data`
+        reflects the new settings only once the block has exited.
+
+        Has no effect if `autocommit` is disabled, call :any:`commit` as
+        usual.
+        """
+        self._commit_deferred += 1
+        try:
+            yield self
+        finally:
+            self._commit_deferred -= 1
+
+            if not self._commit_deferred and self._commit_pending:
+                self._commit_pending = False
+                if _get_autocommit():
+                    self.commit()
+
     def check_uncommitted_state(self):
         return any(self._localregs)
 
+    def snapshot(self, filename=None):
+        """
+        Capture the current instrument configuration so it can be re-applied
+        later with :any:`restore`.
+
+        The snapshot holds the committed register state of the device, the
+        instrument settings kept locally by pymoku (e.g. trigger levels and
+        filter coefficients) and the scaling factors of the current state.
+        Restoring it is much quicker than repeating the original sequence of
+        *set_* calls, as no parameter validation or scaling calculations need
+        to be done.
+
+        Settings that haven't yet been committed aren't included.
+
+        :type filename: str
+        :param filename: If given, also save the snapshot to this file in JSON
+            format.
+
+        :rtype: dict
+        :return: JSON-serialisable snapshot of the instrument state.
+        """
+        if self._moku is None:
+            raise NotDeployedException()
+
+        attributes = {}
+        for name, value in vars(self).items():
+            if name in self._snapshot_exclude:
+                continue
+            if np is not None and isinstance(value, np.ndarray):
+                value = value.tolist()
+            try:
+                json.dumps(value)
+            except (TypeError, ValueError):
+                # Helper objects, sockets etc. hold no state of their own,
+                # anything they configure is in the registers.
+                continue
+            attributes[name] = value
+
+        scales = getattr(self, 'scales', None)
+
+        snap = {
+            'version': _SNAPSHOT_VERSION,
+            'instrument': self.id,
+            'registers': list(self._remoteregs),
+            'attributes': attributes,
+            'scales': scales.get(self._stateid) if scales is not None
+            else None,
+        }
+
+        if filename is not None:
+            with open(filename, 'w') as f:
+                json.dump(snap, f)
+
+        return snap
+
+    def restore(self, snapshot):
+        """
+        Re-apply a configuration captured by :any:`snapshot`.
+
+        All registers are written in a single commit, followed by any
+        memory-mapped data (e.g. filter coefficients or lookup tables) the
+        instrument needs. Snapshots may only be restored to the same
+        instrument type they were taken from and are only valid for the
+        Moku:Lab that took them, as they include its calibration.
+
+        Any uncommitted settings are discarded.
+
+        :type snapshot: dict or str
+        :param snapshot: Snapshot returned by :any:`snapshot`, or the name of
+            a file it was saved to.
+
+        :raises InvalidOperationException: if the snapshot was taken from a
+            different instrument.
+        """
+        if self._moku is None:
+            raise NotDeployedException()
+
+        if not isinstance(snapshot, dict):
+            with open(snapshot, 'r') as f:
+                snapshot = json.load(f)
+
+        self._check_snapshot(snapshot)
+
+        for name, value in snapshot['attributes'].items():
+            setattr(self, name, value)
+
+        self._localregs = [None if i in _SNAPSHOT_SKIP_REGS else r
+                           for i, r in enumerate(snapshot['registers'])]
+        self._on_restore()
+
+        # The snapshot already holds the dependent register values and the
+        # scales that go with them, so bypass the instrument-level commit
+        # that would recalculate them.
+        self._commit()
+
+        self._load_snapshot_scales(snapshot)
+
+        self._restore_mmap()
+
+    def _check_snapshot(self, snapshot):
+        if snapshot.get('version') != _SNAPSHOT_VERSION:
+            raise InvalidOperationException(
+                "Unknown snapshot version %s" % snapshot.get('version'))
+        if snapshot['instrument'] != self.id:
+            raise InvalidOperationException(
+                "Snapshot taken from instrument %d, can't restore to %d"
+                % (snapshot['instrument'], self.id))
+
+    def _sync_snapshot(self, snapshot):
+        """
+        Load local state from a snapshot of the configuration the Moku is
+        already running.
+
+        This is the counterpart of :any:`_sync_registers` for when the
+        register state of the device is already known, nothing is read from
+        or written to the Moku.
+        """
+        if self._moku is None:
+            raise NotDeployedException()
+        self._check_snapshot(snapshot)
+
+        for name, value in snapshot['attributes'].items():
+            setattr(self, name, value)
+
+        self._remoteregs = list(snapshot['registers'])
+        self._localregs = [None] * 128
+        self._stateid = self.state_id
+
+        self._load_snapshot_scales(snapshot)
+
+    def _load_snapshot_scales(self, snapshot):
+        # Associate the current state ID with the scales saved in the
+        # snapshot, for instruments that process frames
+        scales = getattr(self, 'scales', None)
+        if scales is not None:
+            if snapshot['scales'] is not None:
+                scales[self._stateid] = snapshot['scales']
+            else:
+                scales[self._stateid] = self._calculate_scales()
+
+    def _on_restore(self):
+        # Called by restore once the snapshot registers are loaded but before
+        # they are committed. Can be extended to adjust the register state,
+        # e.g. to restart a sweep.
+        pass
+
+    def _restore_mmap(self):
+        # Called by restore after the registers are committed. Instruments
+        # that load data through the memory map should extend this to upload
+        # it again from their local copy.
+        pass
+
     def _sync_registers(self):
         """
         Reload state from the Moku.
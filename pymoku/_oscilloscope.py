@@ -9,6 +9,7 @@ from pymoku import _utils
 from pymoku._trigger import Trigger
 
 from pymoku._oscilloscope_data import VoltsData
+from pymoku._frame_instrument_data import ScalesRegistry
 from pymoku._oscilloscope_data import _OSC_SCREEN_WIDTH
 from pymoku._instrument import ROLL
 from pymoku._instrument import SWEEP
@@ -97,7 +98,7 @@ class _CoreOscilloscope(_frame_instrument.FrameBasedInstrument):
         # NOTE: Register mapped properties will be overwritten in sync
         # registers call
         # on deploy_instrument(). No point setting them here.
-        self.scales = {}
+        self.scales = ScalesRegistry(derive=VoltsData._derive_scales)
         self._set_frame_class(VoltsData, instrument=self, scales=self.scales)
 
         # All instruments need a binstr, procstr and format string.
@@ -408,7 +409,6 @@ class _CoreOscilloscope(_frame_instrument.FrameBasedInstrument):
         self._set_pause(False)
 
         self.frame_length = _OSC_SCREEN_WIDTH
-        self._set_buffer_length(4)
         self.set_xmode('fullframe')
 
         self.set_frontend(1, fiftyr=True, atten=False, ac=False)
@@ -567,7 +567,6 @@ class _CoreOscilloscope(_frame_instrument.FrameBasedInstrument):
         super(_CoreOscilloscope, self).commit()
         # Associate new state ID with the scaling factors of the state
         self.scales[self._stateid] = scales
-        # TODO: Trim scales dictionary, getting rid of old ids
 
     # Bring in the docstring from the superclass for our docco.
     commit.__doc__ = MokuInstrument.commit.__doc__
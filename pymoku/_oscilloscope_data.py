@@ -54,17 +54,22 @@ class VoltsData(_frame_instrument.InstrumentData):
                 'time': self.time,
                 'waveform_id': self.waveformid}
 
+    @staticmethod
+    def _derive_scales(scales):
+        # Per-state values cached by the instrument's ScalesRegistry
+        t1 = scales['time_min']
+        ts = scales['time_step']
+        return {'time': [t1 + (x * ts) for x in range(_OSC_SCREEN_WIDTH)]}
+
     def process_complete(self):
         super(VoltsData, self).process_complete()
 
-        if self._stateid not in self._scales:
+        scales, derived = self._scales.lookup(self._stateid)
+        if scales is None:
             return
 
-        scales = self._scales[self._stateid]
         scale_ch1 = scales['scale_ch1']
         scale_ch2 = scales['scale_ch2']
-        t1 = scales['time_min']
-        ts = scales['time_step']
 
         try:
             smpls = int(len(self._raw1) / 4)
@@ -90,7 +95,7 @@ class VoltsData(_frame_instrument.InstrumentData):
             self._frameid = None
             self._complete = False
 
-        self.time = [t1 + (x * ts) for x in range(_OSC_SCREEN_WIDTH)]
+        self.time = list(derived['time'])
 
         return True
 
@@ -5,6 +5,7 @@ from pymoku._instrument import from_reg_unsigned
 from pymoku._instrument import to_reg_signed
 from pymoku._instrument import from_reg_signed
 from pymoku._instrument import InvalidConfigurationException
+from pymoku._instrument import RegisterField
 import math
 
 
@@ -32,170 +33,45 @@ class PID(object):
         self.d_i_en = True
         self.input_en = True
 
-    @property
-    def enable(self):
-        r = self.reg_base + PID._REG_EN
-        return self._instr._accessor_get(r, from_reg_bool(0))
-
-    @enable.setter
-    def enable(self, value):
-        r = self.reg_base + PID._REG_EN
-        return self._instr._accessor_set(r, to_reg_bool(0), value)
-
-    @property
-    def bypass(self):
-        r = self.reg_base + PID._REG_EN
-        return self._instr._accessor_get(r, from_reg_bool(1))
-
-    @bypass.setter
-    def bypass(self, value):
-        r = self.reg_base + PID._REG_EN
-        return self._instr._accessor_set(r, to_reg_bool(1), value)
-
-    @property
-    def int_en(self):
-        r = self.reg_base + PID._REG_EN
-        return self._instr._accessor_get(r, from_reg_bool(2))
-
-    @int_en.setter
-    def int_en(self, value):
-        r = self.reg_base + PID._REG_EN
-        return self._instr._accessor_set(r, to_reg_bool(2), value)
-
-    @property
-    def dc_pole(self):
-        r = self.reg_base + PID._REG_EN
-        return self._instr._accessor_get(r, from_reg_bool(3))
-
-    @dc_pole.setter
-    def dc_pole(self, value):
-        r = self.reg_base + PID._REG_EN
-        return self._instr._accessor_set(r, to_reg_bool(3), value)
-
-    @property
-    def p_en(self):
-        r = self.reg_base + PID._REG_EN
-        return self._instr._accessor_get(r, from_reg_bool(4))
-
-    @p_en.setter
-    def p_en(self, value):
-        r = self.reg_base + PID._REG_EN
-        return self._instr._accessor_set(r, to_reg_bool(4), value)
-
-    @property
-    def d_i_en(self):
-        r = self.reg_base + PID._REG_EN
-        return self._instr._accessor_get(r, from_reg_bool(5))
-
-    @d_i_en.setter
-    def d_i_en(self, value):
-        r = self.reg_base + PID._REG_EN
-        return self._instr._accessor_set(r, to_reg_bool(5), value)
-
-    @property
-    def input_en(self):
-        r = self.reg_base + PID._REG_EN
-        return self._instr._accessor_get(r, from_reg_bool(6))
-
-    @input_en.setter
-    def input_en(self, value):
-        r = self.reg_base + PID._REG_EN
-        return self._instr._accessor_set(r, to_reg_bool(6), value)
-
-    @property
-    def gain(self):
-        r = self.reg_base + PID._REG_GAIN
-        return self._instr._accessor_get(r, from_reg_unsigned(0, 32))
-
-    @gain.setter
-    def gain(self, value):
-        r = self.reg_base + PID._REG_GAIN
-        self._instr._accessor_set(r, to_reg_unsigned(0, 32), value)
-
-    @property
-    def i_gain(self):
-        r = self.reg_base + PID._REG_I_GAIN
-        return self._instr._accessor_get(
-            r, from_reg_unsigned(0, 25,
-                                 xform=lambda obj, x: x / (2.0**24 - 1)))
-
-    @i_gain.setter
-    def i_gain(self, value):
-        r = self.reg_base + PID._REG_I_GAIN
-        self._instr._accessor_set(
-            r, to_reg_unsigned(0, 25,
-                               xform=lambda obj, x: x * (2.0 ** 24 - 1)),
-            value)
-
-    @property
-    def i_fb(self):
-        r = self.reg_base + PID._REG_I_FB
-        return self._instr._accessor_get(
-            r, from_reg_signed(0, 25, xform=lambda obj, x: x / (2.0**24 - 1)))
-
-    @i_fb.setter
-    def i_fb(self, value):
-        r = self.reg_base + PID._REG_I_FB
-        self._instr._accessor_set(
-            r, to_reg_signed(0, 25,
-                             xform=lambda obj, x: x * (2.0**24 - 1)), value)
-
-    @property
-    def p_gain(self):
-        r = self.reg_base + PID._REG_P_GAIN
-        return self._instr._accessor_get(
-            r, from_reg_unsigned(0, 25, xform=lambda obj, x: x / (2.0**11)))
-
-    @p_gain.setter
-    def p_gain(self, value):
-        r = self.reg_base + PID._REG_P_GAIN
-        self._instr._accessor_set(
-            r, to_reg_unsigned(0, 25,
-                               xform=lambda obj, x: x * (2.0**11)), value)
-
-    @property
-    def d_gain(self):
-        r = self.reg_base + PID._REG_D_GAIN
-        return self._instr._accessor_get(r, from_reg_unsigned(0, 25))
-
-    @d_gain.setter
-    def d_gain(self, value):
-        r = self.reg_base + PID._REG_D_GAIN
-        return self._instr._accessor_set(r, to_reg_unsigned(0, 25), value)
-
-    @property
-    def d_fb(self):
-        r = self.reg_base + PID._REG_D_FB
-        return self._instr._accessor_get(
-            r, from_reg_unsigned(0, 25,
-                                 xform=lambda obj, x: x / (2.0**24 - 1)))
-
-    @d_fb.setter
-    def d_fb(self, value):
-        r = self.reg_base + PID._REG_D_FB
-        return self._instr._accessor_set(
-            r, to_reg_unsigned(0, 25,
-                               xform=lambda obj, x: x * (2.0**24 - 1)), value)
-
-    @property
-    def input_offset(self):
-        r = self.reg_base + PID._REG_IN_OFFSET
-        return self._instr._accessor_get(r, from_reg_signed(0, 16))
-
-    @input_offset.setter
-    def input_offset(self, value):
-        r = self.reg_base + PID._REG_IN_OFFSET
-        return self._instr._accessor_set(r, to_reg_unsigned(0, 16, value))
-
-    @property
-    def output_offset(self):
-        r = self.reg_base + PID._REG_OUT_OFFSET
-        return self._instr._accessor_get(r, from_reg_signed(0, 16))
-
-    @output_offset.setter
-    def output_offset(self, value):
-        r = self.reg_base + PID._REG_OUT_OFFSET
-        return self._instr._accessor_set(r, to_reg_unsigned(0, 16, value))
+    enable = RegisterField(_REG_EN, to_reg_bool(0), from_reg_bool(0))
+    bypass = RegisterField(_REG_EN, to_reg_bool(1), from_reg_bool(1))
+    int_en = RegisterField(_REG_EN, to_reg_bool(2), from_reg_bool(2))
+    dc_pole = RegisterField(_REG_EN, to_reg_bool(3), from_reg_bool(3))
+    p_en = RegisterField(_REG_EN, to_reg_bool(4), from_reg_bool(4))
+    d_i_en = RegisterField(_REG_EN, to_reg_bool(5), from_reg_bool(5))
+    input_en = RegisterField(_REG_EN, to_reg_bool(6), from_reg_bool(6))
+
+    gain = RegisterField(_REG_GAIN, to_reg_unsigned(0, 32),
+                         from_reg_unsigned(0, 32))
+
+    i_gain = RegisterField(
+        _REG_I_GAIN,
+        to_reg_unsigned(0, 25, xform=lambda obj, x: x * (2.0**24 - 1)),
+        from_reg_unsigned(0, 25, xform=lambda obj, x: x / (2.0**24 - 1)))
+
+    i_fb = RegisterField(
+        _REG_I_FB,
+        to_reg_signed(0, 25, xform=lambda obj, x: x * (2.0**24 - 1)),
+        from_reg_signed(0, 25, xform=lambda obj, x: x / (2.0**24 - 1)))
+
+    p_gain = RegisterField(
+        _REG_P_GAIN,
+        to_reg_unsigned(0, 25, xform=lambda obj, x: x * (2.0**11)),
+        from_reg_unsigned(0, 25, xform=lambda obj, x: x / (2.0**11)))
+
+    d_gain = RegisterField(_REG_D_GAIN, to_reg_unsigned(0, 25),
+                           from_reg_unsigned(0, 25))
+
+    d_fb = RegisterField(
+        _REG_D_FB,
+        to_reg_unsigned(0, 25, xform=lambda obj, x: x * (2.0**24 - 1)),
+        from_reg_unsigned(0, 25, xform=lambda obj, x: x / (2.0**24 - 1)))
+
+    input_offset = RegisterField(_REG_IN_OFFSET, to_reg_signed(0, 16),
+                                 from_reg_signed(0, 16))
+
+    output_offset = RegisterField(_REG_OUT_OFFSET, to_reg_signed(0, 16),
+                                  from_reg_signed(0, 16))
 
     def set_reg_by_gain(self, g, kp, ki, kd, si, sd):
         """ calculates the device registers ased on the gain values given.
@@ -0,0 +1,327 @@
+""" Packet encoding and decoding for the Moku:Lab control protocol.
+
+All fixed layouts are precompiled :any:`struct.Struct` objects. Fixed-size
+packets are packed in to a single preallocated buffer, variable-length ones
+are joined from their parts once. Replies are parsed by offset rather than by
+repeatedly slicing off the front of the remaining data, which copies the rest
+of the reply for every entry (quadratic in the size of e.g. the calibration
+property section).
+
+None of these functions do any I/O; the :any:`Moku <pymoku.Moku>` methods
+send and receive the packets and turn bad replies in to exceptions.
+"""
+import struct
+
+# Packet types
+PKT_PROPERTY = 0x46
+PKT_REGISTER = 0x47
+PKT_FILESERVER = 0x49
+
+# Property actions
+PROP_READ = 1
+PROP_WRITE = 2
+PROP_SECTION = 3
+
+# Register writes are flagged by the top bit of the register number
+REG_WRITE_FLAG = 0x80
+
+_U8 = struct.Struct('<B')
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+
+# Type, sequence number, number of entries
+_PROP_HDR = struct.Struct('<BBB')
+# Type, sequence number, status, number of entries
+_PROP_REPLY_HDR = struct.Struct('<BBBB')
+# Action, name length
+_PROP_ENTRY = struct.Struct('<BB')
+
+# Type, error, number of entries
+_REG_HDR = struct.Struct('<BBB')
+_REG_READ = struct.Struct('<BI')
+
+# Type, length of the data that follows, including the action byte
+_FS_HDR = struct.Struct('<BQB')
+_FS_REPLY_HDR = struct.Struct('<BQ')
+_FS_REPLY_STATUS = struct.Struct('<BB')
+_FS_LIST_ENTRY = struct.Struct('<QB')
+
+
+# Indexing bytes gives an int on Python 3 but a str on Python 2
+_BYTES_INDEX_INT = isinstance(b'\x00'[0], int)
+
+_NO_DATA = b'\x00'
+
+
+def _indexable(data):
+    # Byte buffer that indexes to int, without a copy where possible
+    if _BYTES_INDEX_INT and isinstance(data, (bytes, bytearray)):
+        return data
+    return bytearray(data)
+
+
+def _encode(s):
+    if isinstance(s, (bytes, bytearray)):
+        return bytes(s)
+    return s.encode('ascii')
+
+
+def pack_property_read(seq, properties):
+    """ Build a request to read each of the named *properties* """
+    parts = [_PROP_HDR.pack(PKT_PROPERTY, seq, len(properties))]
+    pack = _PROP_ENTRY.pack
+
+    for p in properties:
+        p = _encode(p)
+        parts += (pack(PROP_READ, len(p)), p, _NO_DATA)
+
+    return b''.join(parts)
+
+
+def pack_property_write(seq, properties):
+    """ Build a request to set each of the (name, value) *properties* """
+    parts = [_PROP_HDR.pack(PKT_PROPERTY, seq, len(properties))]
+    pack = _PROP_ENTRY.pack
+
+    for p, d in properties:
+        p, d = _encode(p), _encode(d)
+        parts += (pack(PROP_WRITE, len(p)), p, _U8.pack(len(d)), d)
+
+    return b''.join(parts)
+
+
+def pack_property_section(seq, section):
+    """ Build a request to read every property under *section* """
+    section = _encode(section)
+    return b''.join([_PROP_HDR.pack(PKT_PROPERTY, seq, 1),
+                     _PROP_ENTRY.pack(PROP_SECTION, len(section)),
+                     section, _NO_DATA])
+
+
+def unpack_property_request(pkt):
+    """ Parse a property request, the inverse of the *pack_property_*
+    functions (used for device emulation).
+
+    :return: (sequence number, [(action, name, value), ...])
+    """
+    hdr, seq, nr = _PROP_HDR.unpack_from(pkt, 0)
+    buf = _indexable(pkt)
+    off = _PROP_HDR.size
+    entries = []
+
+    for _ in range(nr):
+        action, plen = _PROP_ENTRY.unpack_from(pkt, off)
+        off += _PROP_ENTRY.size
+        p = buf[off:off + plen].decode('ascii')
+        off += plen
+        dlen = buf[off]
+        d = buf[off + 1:off + 1 + dlen].decode('ascii')
+        off += 1 + dlen
+        entries.append((action, p, d))
+
+    return seq, entries
+
+
+def unpack_property_reply(reply):
+    """ Parse a property reply.
+
+    :return: (header, sequence number, status, [(name, value), ...]). On
+        error, the list holds only the property that caused it; anything
+        after that isn't parsed.
+    """
+    hdr, seq, stat, nr = _PROP_REPLY_HDR.unpack_from(reply, 0)
+    buf = _indexable(reply)
+    off = _PROP_REPLY_HDR.size
+    props = []
+
+    for _ in range(nr):
+        plen = buf[off]
+        p = buf[off + 1:off + 1 + plen].decode('ascii')
+        off += 1 + plen
+        dlen = buf[off]
+        d = buf[off + 1:off + 1 + dlen].decode('ascii')
+        off += 1 + dlen
+        props.append((p, d))
+
+        if stat:
+            break
+
+    return hdr, seq, stat, props
+
+
+def pack_property_reply(seq, stat, properties):
+    """ Build a property reply, the inverse of :any:`unpack_property_reply`
+    (used for testing and device emulation). """
+    entries = [(_encode(p), _encode(d)) for p, d in properties]
+    size = _PROP_REPLY_HDR.size + sum(2 + len(p) + len(d)
+                                      for p, d in entries)
+    pkt = bytearray(size)
+    _PROP_REPLY_HDR.pack_into(pkt, 0, PKT_PROPERTY, seq, stat, len(entries))
+    off = _PROP_REPLY_HDR.size
+
+    for p, d in entries:
+        for s in (p, d):
+            pkt[off] = len(s)
+            pkt[off + 1:off + 1 + len(s)] = s
+            off += 1 + len(s)
+
+    return pkt
+
+
+def pack_reg_read(regs):
+    """ Build a request to read the register numbers *regs* """
+    pkt = bytearray(_REG_HDR.size + len(regs))
+    _REG_HDR.pack_into(pkt, 0, PKT_REGISTER, 0, len(regs))
+    pkt[_REG_HDR.size:] = bytearray(regs)
+    return pkt
+
+
+def pack_reg_write(regs):
+    """ Build a request to write the (register, value) pairs *regs* """
+    pkt = bytearray(_REG_HDR.size + len(regs) * _REG_READ.size)
+    _REG_HDR.pack_into(pkt, 0, PKT_REGISTER, 0, len(regs))
+    off = _REG_HDR.size
+
+    for r, d in regs:
+        _REG_READ.pack_into(pkt, off, r + REG_WRITE_FLAG, d)
+        off += _REG_READ.size
+
+    return pkt
+
+
+def unpack_reg_request(pkt):
+    """ Parse a register request (used for device emulation).
+
+    :return: ([registers to read], [(register, value) to write])
+    """
+    t, err, length = _REG_HDR.unpack_from(pkt, 0)
+    buf = _indexable(pkt)
+    reads, writes = [], []
+    off = _REG_HDR.size
+
+    # A request is either all reads or all writes
+    if length and buf[off] & REG_WRITE_FLAG:
+        for i in range(length):
+            r, d = _REG_READ.unpack_from(pkt, off + i * _REG_READ.size)
+            writes.append((r & ~REG_WRITE_FLAG, d))
+    else:
+        reads = list(buf[off:off + length])
+
+    return reads, writes
+
+
+def unpack_reg_reply(reply):
+    """ Parse a register reply.
+
+    :return: (header, error, [(register, value), ...])
+    """
+    t, err, length = _REG_HDR.unpack_from(reply, 0)
+    # Never read past the end of a short reply
+    length = min(length, (len(reply) - _REG_HDR.size) // _REG_READ.size)
+    regs = [_REG_READ.unpack_from(reply, _REG_HDR.size + i * _REG_READ.size)
+            for i in range(length)]
+    return t, err, regs
+
+
+def pack_reg_reply(regs, err=0):
+    """ Build a register reply, the inverse of :any:`unpack_reg_reply` """
+    pkt = bytearray(_REG_HDR.size + len(regs) * _REG_READ.size)
+    _REG_HDR.pack_into(pkt, 0, PKT_REGISTER, err, len(regs))
+    off = _REG_HDR.size
+
+    for r, d in regs:
+        _REG_READ.pack_into(pkt, off, r, d)
+        off += _REG_READ.size
+
+    return pkt
+
+
+def pack_fs_request(action, data):
+    """ Build a fileserver request for *action* carrying *data* """
+    pkt = bytearray(_FS_HDR.size + len(data))
+    _FS_HDR.pack_into(pkt, 0, PKT_FILESERVER, len(data) + 1, action)
+    pkt[_FS_HDR.size:] = data
+    return pkt
+
+
+def unpack_fs_reply(reply):
+    """ Parse the header of a fileserver reply.
+
+    :return: (header, declared length, actual length, action, status,
+        payload). The action and status are *None* if the reply is too short
+        to hold them; check the lengths first.
+    """
+    hdr, length = _FS_REPLY_HDR.unpack_from(reply, 0)
+    start = _FS_REPLY_HDR.size + _FS_REPLY_STATUS.size
+
+    if len(reply) < start:
+        act = status = None
+    else:
+        act, status = _FS_REPLY_STATUS.unpack_from(reply, _FS_REPLY_HDR.size)
+
+    return (hdr, length, len(reply) - _FS_REPLY_HDR.size, act, status,
+            reply[start:])
+
+
+def unpack_fs_request(pkt):
+    """ Parse a fileserver request (used for device emulation).
+
+    :return: (action, data)
+    """
+    hdr, length, action = _FS_HDR.unpack_from(pkt, 0)
+    return action, pkt[_FS_HDR.size:]
+
+
+def pack_fs_reply(action, status, payload=b''):
+    """ Build a fileserver reply, the inverse of :any:`unpack_fs_reply` """
+    return b''.join([
+        _FS_REPLY_HDR.pack(PKT_FILESERVER, len(payload) + 2),
+        _FS_REPLY_STATUS.pack(action, status),
+        bytes(payload)])
+
+
+def unpack_fs_list(data, calculate_crc=False, calculate_sha=False):
+    """ Parse the payload of a fileserver list reply.
+
+    :return: list of (filename, checksum, size) tuples. The checksum is the
+        SHA256 hex string, the 1-tuple of the CRC32, or empty, depending on
+        which was requested.
+    """
+    n = _U16.unpack_from(data, 0)[0]
+    buf = _indexable(data)
+    off = _U16.size
+    names = []
+
+    for _ in range(n):
+        if calculate_sha:
+            chk = buf[off:off + 64].decode('ascii')
+            off += 64
+        elif calculate_crc:
+            chk = _U32.unpack_from(data, off)
+            off += _U32.size
+        else:
+            chk = ''
+
+        bl, fl = _FS_LIST_ENTRY.unpack_from(data, off)
+        off += _FS_LIST_ENTRY.size
+        names.append((buf[off:off + fl].decode(), chk, bl))
+        off += fl
+
+    return names
+
+
+def pack_fs_list(names, calculate_crc=False, calculate_sha=False):
+    """ Build a fileserver list payload, the inverse of
+    :any:`unpack_fs_list` """
+    parts = [_U16.pack(len(names))]
+
+    for name, chk, bl in names:
+        name = name.encode('utf-8')
+        if calculate_sha:
+            parts.append(_encode(chk))
+        elif calculate_crc:
+            parts.append(_U32.pack(*chk))
+        parts.append(_FS_LIST_ENTRY.pack(bl, len(name)))
+        parts.append(name)
+
+    return b''.join(parts)
@@ -0,0 +1,280 @@
+""" Request/reply channels for the Moku:Lab control port.
+
+:any:`ReqChannel` is the classic single REQ socket, one request in flight at a
+time. :any:`MuxChannel` lets independent requests from different threads
+overlap on one DEALER socket, matching each reply to its request by a sequence
+ID carried in the message envelope.
+
+The device's REP socket echoes any envelope frames ahead of the empty
+delimiter, so the sequence ID works for every packet type, including the
+register and fileserver packets that have no sequence number of their own.
+
+:any:`RPCStats` records the count, size and latency of requests of each type
+for :any:`Moku.enable_rpc_stats <pymoku.Moku.enable_rpc_stats>`.
+"""
+import itertools
+import logging
+import struct
+import threading
+import time
+
+import zmq
+
+from ._histogram import Histogram
+
+log = logging.getLogger(__name__)
+
+_RID = struct.Struct('<I')
+
+# Names of the control packet types, keyed by the first byte of the request,
+# and where to find the sub-type (action) byte and its names, if any.
+_RPC_OPS = {
+    0x40: ('ownership', None, None),
+    0x41: ('ownership', None, None),
+    0x43: ('deploy', None, None),
+    0x46: ('property', 3, {1: 'read', 2: 'write', 3: 'section'}),
+    0x47: ('register', None, None),
+    0x48: ('reset', None, None),
+    0x49: ('fileserver', 9, {1: 'read', 2: 'write', 3: 'crc', 4: 'size',
+                             5: 'list', 6: 'free', 7: 'finalise',
+                             8: 'rename', 9: 'rename_status', 10: 'sha'}),
+    0x52: ('firmware', None, None),
+    0x53: ('stream', 6, {1: 'prep', 2: 'stop', 3: 'status', 4: 'start'}),
+    0x54: ('clock', None, None),
+    0x55: ('slot', None, None),
+}
+
+# How often the I/O thread checks whether it should exit, ms
+_MUX_POLL_INTERVAL = 100
+
+
+class ReqChannel(object):
+    """
+    A REQ socket shared between threads by a lock, so requests are strictly
+    serialised. Works with all firmware versions.
+    """
+    def __init__(self, skt):
+        self.socket = skt
+        self.lock = threading.RLock()
+
+    def request(self, pkt):
+        """ Send *pkt* and return the reply, raising :any:`zmq.error.Again`
+        on timeout. """
+        with self.lock:
+            self.socket.send(pkt)
+            return self.socket.recv()
+
+    def set_timeout(self, send_ms, recv_ms):
+        self.socket.setsockopt(zmq.SNDTIMEO, send_ms)
+        self.socket.setsockopt(zmq.RCVTIMEO, recv_ms)
+
+    def close(self):
+        with self.lock:
+            self.socket.close()
+
+
+class _Call(object):
+    __slots__ = ['event', 'reply']
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.reply = None
+
+
+class MuxChannel(object):
+    """
+    Multiplexes requests from any number of threads over one DEALER socket.
+
+    ZMQ sockets can't be used by several threads at once, so a private I/O
+    thread owns the DEALER. Callers hand their requests to it over a single
+    inproc PUSH socket, used under a lock only for as long as it takes to
+    queue the request, then wait on an event for the matching reply, so a
+    slow request (e.g. a large file chunk) doesn't hold a lock that other
+    threads' requests are queued behind.
+
+    Requests are still processed one at a time by the device; what overlaps
+    is the network round trip and the host-side work either side of it.
+
+    :type ctx: :any:`zmq.Context`
+    :param ctx: Context to create the inproc sockets in; must be the context
+        *skt* was created in.
+
+    :type skt: :any:`zmq.Socket`
+    :param skt: Connected DEALER socket. The channel takes ownership of it.
+    """
+    def __init__(self, ctx, skt):
+        self.socket = skt
+        self.timeout = 10000
+
+        self._addr = 'inproc://pymoku-rpc-%x' % id(self)
+        self._rids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+        self._wake = ctx.socket(zmq.PULL)
+        self._wake.bind(self._addr)
+
+        # Shared by all calling threads, the lock serialising its use
+        self._send_lock = threading.Lock()
+        self._sender = ctx.socket(zmq.PUSH)
+        self._sender.setsockopt(zmq.LINGER, 0)
+        self._sender.connect(self._addr)
+
+        self._running = True
+        self._thread = threading.Thread(target=self._io_loop,
+                                        name='pymoku-rpc')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def request(self, pkt):
+        """ Send *pkt* and return the reply, raising :any:`zmq.error.Again`
+        on timeout. Safe to call from any thread. """
+        call = _Call()
+
+        with self._lock:
+            rid = _RID.pack(next(self._rids) & 0xFFFFFFFF)
+            self._pending[rid] = call
+
+        with self._send_lock:
+            self._sender.send_multipart([rid, b'', pkt])
+
+        if not call.event.wait(self.timeout / 1000.0):
+            # A late reply will be discarded by the I/O thread
+            with self._lock:
+                self._pending.pop(rid, None)
+            raise zmq.error.Again()
+
+        return call.reply
+
+    def set_timeout(self, send_ms, recv_ms):
+        # Sends are queued locally, only the reply can time out
+        self.timeout = recv_ms
+
+    def _io_loop(self):
+        poller = zmq.Poller()
+        poller.register(self.socket, zmq.POLLIN)
+        poller.register(self._wake, zmq.POLLIN)
+
+        while self._running:
+            events = dict(poller.poll(_MUX_POLL_INTERVAL))
+
+            if self._wake in events:
+                self._drain(self._wake, self.socket.send_multipart)
+
+            if self.socket in events:
+                self._drain(self.socket, self._dispatch)
+
+    def _drain(self, skt, handler):
+        while True:
+            try:
+                frames = skt.recv_multipart(zmq.NOBLOCK)
+            except zmq.error.Again:
+                return
+            handler(frames)
+
+    def _dispatch(self, frames):
+        with self._lock:
+            call = self._pending.pop(frames[0], None)
+
+        if call is None:
+            log.debug("Discarding reply to abandoned request")
+            return
+
+        call.reply = frames[-1]
+        call.event.set()
+
+    def close(self):
+        self._running = False
+        self._thread.join()
+
+        with self._send_lock:
+            self._sender.close()
+
+        self._wake.close()
+        self.socket.close()
+
+
+def rpc_op(pkt):
+    """ Descriptive name of the request *pkt*, e.g. ``'property.read'`` """
+    pkt = bytearray(pkt[:10])
+
+    if not pkt:
+        return 'unknown'
+
+    name, offset, actions = _RPC_OPS.get(pkt[0], (None, None, None))
+
+    if name is None:
+        return 'unknown.0x%02x' % pkt[0]
+
+    if name == 'register':
+        # Writes are flagged by the top bit of the register number
+        if len(pkt) > 3:
+            return 'register.write' if pkt[3] & 0x80 else 'register.read'
+        return name
+
+    if offset is not None and offset < len(pkt):
+        return '%s.%s' % (name, actions.get(pkt[offset], pkt[offset]))
+
+    return name
+
+
+class _OpStats(object):
+    __slots__ = ['count', 'errors', 'bytes_out', 'bytes_in', 'latency']
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.latency = Histogram()
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'bytes_out': self.bytes_out,
+            'bytes_in': self.bytes_in,
+            'latency': self.latency.as_dict(),
+        }
+
+
+class RPCStats(object):
+    """
+    Counters and latency histograms of the requests made on a Moku:Lab's
+    control channel, per type of request. Read these through
+    :any:`Moku.rpc_stats <pymoku.Moku.rpc_stats>` rather than directly.
+
+    Latency is measured from just before the request is sent to just after
+    the reply is received, so it covers the network round trip and the
+    device's processing but none of the packet building or parsing either
+    side.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._ops = {}
+            self.started = time.time()
+
+    def add(self, op, bytes_out, bytes_in, latency, error=False):
+        with self._lock:
+            s = self._ops.get(op)
+            if s is None:
+                s = self._ops[op] = _OpStats()
+
+            s.count += 1
+            s.bytes_out += bytes_out
+            s.bytes_in += bytes_in
+            if error:
+                s.errors += 1
+            else:
+                s.latency.add(latency)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'elapsed': time.time() - self.started,
+                'ops': dict((op, s.as_dict()) for op, s in self._ops.items()),
+            }
@@ -18,6 +18,12 @@ from pymoku import _frame_instrument
 from pymoku import _utils
 
 from ._specan_data import SpectrumData
+from ._frame_instrument_data import ScalesRegistry
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 log = logging.getLogger(__name__)
 
@@ -207,13 +213,17 @@ class SpectrumAnalyzer(_frame_instrument.FrameBasedInstrument):
         Name of this instrument.
 
     """
+    _snapshot_exclude = \
+        _frame_instrument.FrameBasedInstrument._snapshot_exclude | \
+        frozenset(['_freq_key', '_freq_tables'])
+
     def __init__(self):
         """ Create a new Spectrum Analyzer instrument, ready to be attached
             to a Moku."""
         super(SpectrumAnalyzer, self).__init__()
         self._register_accessors(_sa_reg_handlers)
 
-        self.scales = {}
+        self.scales = ScalesRegistry(derive=SpectrumData._derive_scales)
         self._set_frame_class(
             SpectrumData, instrument=self, scales=self.scales)
 
@@ -221,6 +231,11 @@ class SpectrumAnalyzer(_frame_instrument.FrameBasedInstrument):
         self.type = "spectrumanalyzer"
         self.calibration = None
 
+        # Frequency bins and corrections for the last span seen by
+        # _calculate_scales, keyed on the settings they depend on
+        self._freq_key = None
+        self._freq_tables = None
+
         self.tr1_incr = 0
         self.tr2_incr = 0
         self.sweep1 = False
@@ -573,6 +588,72 @@ class SpectrumAnalyzer(_frame_instrument.FrameBasedInstrument):
 
         return correction
 
+    def _calculate_freq_tables(self):
+        # Frequency bins and the frequency dependent corrections for them
+        # depend only on the span, so are only recalculated when the span
+        # changes. Notably not the window or RBW, which only change gain.
+        key = (self.demod, self._total_decimation, self.render_dds,
+               self.offset)
+
+        if key != self._freq_key:
+            if np is not None:
+                self._freq_tables = self._calculate_freq_tables_array()
+            else:
+                self._freq_tables = self._calculate_freq_tables_list()
+            self._freq_key = key
+
+        return self._freq_tables
+
+    def _calculate_freq_tables_list(self):
+        # Find approximate frequency bin values
+        dev_start_freq = self._calculate_start_freq()
+        dev_freq_step = self._calculate_freq_step()
+        freqs = [(dev_start_freq + dev_freq_step * i)
+                 for i in range(_SA_SCREEN_WIDTH)]
+
+        # Compute the frequency dependent correction arrays
+        # The CIC correction is only for CIC1 which is decimation=4 only,
+        # and 10th order
+        if self._total_decimation >= 4:
+            cic_corrs = [self._calculate_cic_freq_resp(i * dev_freq_step,
+                                                       4,
+                                                       10)
+                         for i in range(len(freqs))]
+        else:
+            cic_corrs = [1.0] * len(freqs)
+
+        fcorrs = [(1 / self._calculate_adc_freq_resp(f, True) / cic_corr)
+                  for f, cic_corr in zip(freqs, cic_corrs)]
+
+        return freqs, fcorrs
+
+    def _calculate_freq_tables_array(self):
+        # Array version of _calculate_freq_tables_list
+        dev_start_freq = self._calculate_start_freq()
+        dev_freq_step = self._calculate_freq_step()
+        idx = np.arange(_SA_SCREEN_WIDTH)
+        freqs = dev_start_freq + dev_freq_step * idx
+
+        if self._total_decimation >= 4:
+            dec, order = 4, 10
+            f = idx * dev_freq_step / _SA_ADC_SMPS
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cic_corrs = np.abs(np.sin(np.pi * f * dec) /
+                                   (np.sin(np.pi * f) * dec)) ** order
+            cic_corrs[f == 0.0] = 1.0
+        else:
+            cic_corrs = np.ones(_SA_SCREEN_WIDTH)
+
+        # Linear interpolation in to the ADC response table
+        table = _SA_ADC_FREQ_RESP_20
+        frac_idx = np.clip(freqs / (_SA_ADC_SMPS / 2.0), 0.0, 1.0)
+        adc_corrs = np.interp(frac_idx * (len(table) - 1),
+                              np.arange(len(table)), table)
+
+        fcorrs = 1 / adc_corrs / cic_corrs
+
+        return freqs.tolist(), fcorrs.tolist()
+
     def _calculate_scales(self):
         """
         Returns per-channel correction and scaling parameters required for
@@ -596,25 +677,7 @@ class SpectrumAnalyzer(_frame_instrument.FrameBasedInstrument):
         g2 *= _SA_INT_VOLTS_SCALE * filt_gain * window_gain \
             * self.rbw_ratio * (2**10)
 
-        # Find approximate frequency bin values
-        dev_start_freq = self._calculate_start_freq()
-        dev_freq_step = self._calculate_freq_step()
-        freqs = [(dev_start_freq + dev_freq_step * i)
-                 for i in range(_SA_SCREEN_WIDTH)]
-
-        # Compute the frequency dependent correction arrays
-        # The CIC correction is only for CIC1 which is decimation=4 only,
-        # and 10th order
-        if self._total_decimation >= 4:
-            cic_corrs = [self._calculate_cic_freq_resp(i * dev_freq_step,
-                                                       4,
-                                                       10)
-                         for i in range(len(freqs))]
-        else:
-            cic_corrs = [1.0] * len(freqs)
-
-        fcorrs = [(1 / self._calculate_adc_freq_resp(f, True) / cic_corr)
-                  for f, cic_corr in zip(freqs, cic_corrs)]
+        freqs, fcorrs = self._calculate_freq_tables()
 
         return {'g1': g1,
                 'g2': g2,
@@ -736,8 +799,6 @@ class SpectrumAnalyzer(_frame_instrument.FrameBasedInstrument):
         # state
         self.scales[self._stateid] = self._calculate_scales()
 
-        # TODO: Trim scales dictionary, getting rid of old ids
-
     # Bring in the docstring from the superclass for our docco.
     commit.__doc__ = MokuInstrument.commit.__doc__
 
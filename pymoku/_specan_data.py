@@ -6,6 +6,11 @@ from pymoku import _frame_instrument
 
 from bisect import bisect_right
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 _SA_SCREEN_WIDTH = 1024
 _SA_BUFLEN = _instrument.CHN_BUFLEN
 
@@ -70,33 +75,84 @@ class SpectrumData(_frame_instrument.InstrumentData):
     def _vrms_to_dbm(self, v):
         return 10.0 * math.log(v * v / 50.0, 10) + 30.0
 
+    @staticmethod
+    def _derive_scales(scales):
+        # Per-state values cached by the instrument's ScalesRegistry
+        fs = scales['fs']
+        f1, f2 = scales['fspan']
+
+        # Find the starting index for the valid frame data
+        # SpectrumAnalyzer generally gives more than we ask for due to
+        # integer decimations
+        start_index = bisect_right(fs, f1)
+
+        # Combine the frequency dependent corrections with the channel gains
+        derived = {'start_index': start_index,
+                   'frequency': fs[start_index:-1],
+                   'corr1': [c * scales['g1'] for c in scales['fcorrs']],
+                   'corr2': [c * scales['g2'] for c in scales['fcorrs']]}
+
+        if np is not None:
+            # Array forms of the above, trimmed to the valid part of the
+            # frame. In dBm mode, 20log10(a * c) - 10log10(50) + 30 is split
+            # so only 20log10(a) is left to compute for each frame.
+            for ch in ['corr1', 'corr2']:
+                corr = np.array(derived[ch][start_index:-1], dtype=float)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    offset = 20.0 * np.log10(np.abs(corr)) \
+                        - 10.0 * math.log10(50.0) + 30.0
+                derived['n' + ch] = corr
+                derived['n' + ch + '_dbm'] = offset
+
+        return derived
+
+    def _process_channel(self, raw, corr, corr_dbm, start_index, dbmscale):
+        # Array version of the per-channel decode in process_complete.
+        # Returns the raw bits array, the processed channel data and whether
+        # there's any non-zero data in the channel.
+        dat = np.frombuffer(raw, dtype='<i4', count=_SA_SCREEN_WIDTH)
+
+        # SpectrumAnalyzer data is backwards, trim the invalid part of the
+        # frame then clip to 1 for the sake of display on a log axis.
+        dat = dat[::-1][start_index:start_index + len(corr)]
+        invalid = dat == -0x80000000
+        bits = np.maximum(dat, 1).astype(float)
+
+        if dbmscale:
+            ch = 20.0 * np.log10(bits) + corr_dbm
+        else:
+            ch = bits * corr
+
+        data = ch.tolist()
+        if invalid.any():
+            for i in np.flatnonzero(invalid):
+                data[i] = None
+
+        return bits, data, bool(np.any(ch[~invalid]))
+
     def process_complete(self):
         super(SpectrumData, self).process_complete()
 
-        if self._stateid not in self._scales:
-            return
-
         # Get scaling/correction factors based on current instrument
         # configuration
-        scales = self._scales[self._stateid]
-        scale1 = scales['g1']
-        scale2 = scales['g2']
-        fs = scales['fs']
-        f1, f2 = scales['fspan']
-        fcorrs = scales['fcorrs']
+        scales, derived = self._scales.lookup(self._stateid)
+        if scales is None:
+            return
+
+        start_index = derived['start_index']
+        corr1 = derived['corr1']
+        corr2 = derived['corr2']
         dbmscale = scales['dbmscale']
 
+        if np is not None:
+            return self._process_complete_array(derived, dbmscale)
+
         try:
             self.dbm = dbmscale
 
-            # Find the starting index for the valid frame data
-            # SpectrumAnalyzer generally gives more than we ask for due to
-            # integer decimations
-            start_index = bisect_right(fs, f1)
-
             # Set the frequency range of valid data in the current frame
             # (same for both channels)
-            self.frequency = fs[start_index:-1]
+            self.frequency = list(derived['frequency'])
 
             ##################################
             # Process Ch1 Data
@@ -112,9 +168,9 @@ class SpectrumData(_frame_instrument.InstrumentData):
                               for x in reversed(dat[:_SA_SCREEN_WIDTH])]
 
             # Apply frequency dependent corrections
-            self.ch1 = [self._vrms_to_dbm(a * c * scale1) if dbmscale
-                        else a * c * scale1 if a is not None else None
-                        for a, c in zip(self._ch1_bits, fcorrs)]
+            self.ch1 = [self._vrms_to_dbm(a * c) if dbmscale
+                        else a * c if a is not None else None
+                        for a, c in zip(self._ch1_bits, corr1)]
 
             # Trim invalid part of frame
             self.ch1 = self.ch1[start_index:-1]
@@ -129,9 +185,9 @@ class SpectrumData(_frame_instrument.InstrumentData):
             self._ch2_bits = [max(float(x), 1) if x is not None else None
                               for x in reversed(dat[:_SA_SCREEN_WIDTH])]
 
-            self.ch2 = [self._vrms_to_dbm(a * c * scale2) if dbmscale
-                        else a * c * scale2 if a is not None else None
-                        for a, c in zip(self._ch2_bits, fcorrs)]
+            self.ch2 = [self._vrms_to_dbm(a * c) if dbmscale
+                        else a * c if a is not None else None
+                        for a, c in zip(self._ch2_bits, corr2)]
             self.ch2 = self.ch2[start_index:-1]
 
         except (IndexError, TypeError, struct.error):
@@ -143,6 +199,27 @@ class SpectrumData(_frame_instrument.InstrumentData):
         # A valid frame is there's at least one valid sample in each channel
         return any(self.ch1) and any(self.ch2)
 
+    def _process_complete_array(self, derived, dbmscale):
+        start_index = derived['start_index']
+
+        try:
+            self.dbm = dbmscale
+            self.frequency = list(derived['frequency'])
+
+            self._ch1_bits, self.ch1, valid1 = self._process_channel(
+                self._raw1, derived['ncorr1'], derived['ncorr1_dbm'],
+                start_index, dbmscale)
+            self._ch2_bits, self.ch2, valid2 = self._process_channel(
+                self._raw2, derived['ncorr2'], derived['ncorr2_dbm'],
+                start_index, dbmscale)
+        except ValueError:
+            # Short frame, force a reinitialisation on next packet
+            self._frameid = None
+            self._complete = False
+            return False
+
+        return valid1 and valid2
+
     def process_buffer(self):
         # Compute the x-axis of the buffer
         if self._stateid not in self._scales:
@@ -0,0 +1,69 @@
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+# Allow environment variable override of the cache location
+STATEPATH = os.path.expanduser(
+    os.environ.get('PYMOKU_STATE_PATH', None) or
+    os.path.join('~', '.pymoku', 'state'))
+
+
+class StateCache(object):
+    """
+    Local store of the last known state of each instrument on each Moku:Lab.
+
+    Entries are :any:`snapshot <pymoku._instrument.MokuInstrument.snapshot>`
+    dictionaries saved as JSON, one file per device serial and instrument ID.
+    Only the most recent state is kept; an entry is only valid while the
+    device's state ID (and instrument build) still match the registers it
+    holds, which the caller must check before using it.
+
+    Used by :any:`deploy_or_connect <pymoku.Moku.deploy_or_connect>` so that
+    reconnecting to a running instrument doesn't have to read back and
+    re-interpret the full register set.
+    """
+    def __init__(self, path=None):
+        self.path = path or STATEPATH
+
+    def _filename(self, serial, instrid):
+        return os.path.join(self.path, '%s-%d.json' % (serial, instrid))
+
+    def load(self, serial, instrid):
+        """ Return the cached snapshot for the instrument *instrid* on the
+        Moku with serial number *serial*, or *None* if there isn't one. """
+        try:
+            with open(self._filename(serial, instrid), 'r') as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def save(self, serial, snapshot):
+        """ Replace the cached state of the snapshot's instrument on the Moku
+        with serial number *serial*. """
+        fname = self._filename(serial, snapshot['instrument'])
+        tmpname = fname + '.tmp'
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        # Write then rename so a concurrent reader never sees a partial file
+        with open(tmpname, 'w') as f:
+            json.dump(snapshot, f)
+
+        try:
+            os.replace(tmpname, fname)
+        except AttributeError:
+            # Python 2 has no atomic replace, rename fails on Windows if the
+            # destination exists.
+            if os.path.exists(fname):
+                os.remove(fname)
+            os.rename(tmpname, fname)
+
+    def invalidate(self, serial, instrid):
+        """ Remove any cached state of the instrument on the Moku. """
+        try:
+            os.remove(self._filename(serial, instrid))
+        except (IOError, OSError):
+            pass
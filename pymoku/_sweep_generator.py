@@ -2,6 +2,7 @@ from pymoku._instrument import to_reg_unsigned
 from pymoku._instrument import from_reg_unsigned
 from pymoku._instrument import to_reg_bool
 from pymoku._instrument import from_reg_bool
+from pymoku._instrument import RegisterField
 
 
 class SweepGenerator(object):
@@ -24,108 +25,34 @@ class SweepGenerator(object):
         self._instr = instr
         self.reg_base = reg_base
 
-    @property
-    def waveform(self):
-        r = self.reg_base + SweepGenerator._REG_CONFIG
-        return self._instr._accessor_get(r, from_reg_unsigned(0, 2))
+    waveform = RegisterField(
+        _REG_CONFIG,
+        to_reg_unsigned(0, 2, allow_set=[WAVE_TYPE_SINGLE, WAVE_TYPE_UPDOWN,
+                                         WAVE_TYPE_SAWTOOTH,
+                                         WAVE_TYPE_TRIANGLE]),
+        from_reg_unsigned(0, 2))
 
-    @waveform.setter
-    def waveform(self, value):
-        r = self.reg_base + SweepGenerator._REG_CONFIG
-        self._instr._accessor_set(
-            r, to_reg_unsigned(0, 2,
-                               allow_set=[SweepGenerator.WAVE_TYPE_SINGLE,
-                                          SweepGenerator.WAVE_TYPE_UPDOWN,
-                                          SweepGenerator.WAVE_TYPE_SAWTOOTH,
-                                          SweepGenerator.WAVE_TYPE_TRIANGLE]),
-            value)
+    direction = RegisterField(_REG_CONFIG,
+                              to_reg_unsigned(5, 1, allow_set=[0, 1]),
+                              from_reg_unsigned(5, 1))
 
-    @property
-    def direction(self):
-        r = self.reg_base + SweepGenerator._REG_CONFIG
-        return self._instr._accessor_get(r, from_reg_unsigned(5, 1))
+    logsweep = RegisterField(_REG_CONFIG,
+                             to_reg_unsigned(6, 1, allow_set=[0, 1]),
+                             from_reg_unsigned(6, 1))
 
-    @direction.setter
-    def direction(self, value):
-        r = self.reg_base + SweepGenerator._REG_CONFIG
-        self._instr._accessor_set(
-            r, to_reg_unsigned(5, 1, allow_set=[0, 1]), value)
+    start = RegisterField((_REG_START_MSB, _REG_START_LSB),
+                          to_reg_unsigned(0, 64), from_reg_unsigned(0, 64))
 
-    @property
-    def logsweep(self):
-        r = self.reg_base + SweepGenerator._REG_CONFIG
-        return self._instr._accessor_get(r, from_reg_unsigned(6, 1))
+    stop = RegisterField((_REG_STOP_MSB, _REG_STOP_LSB),
+                         to_reg_unsigned(0, 64), from_reg_unsigned(0, 64))
 
-    @logsweep.setter
-    def logsweep(self, value):
-        r = self.reg_base + SweepGenerator._REG_CONFIG
-        self._instr._accessor_set(
-            r, to_reg_unsigned(6, 1, allow_set=[0, 1]), value)
+    step = RegisterField((_REG_STEP_MSB, _REG_STEP_LSB),
+                         to_reg_unsigned(0, 64), from_reg_unsigned(0, 64))
 
-    @property
-    def start(self):
-        r1 = self.reg_base + SweepGenerator._REG_START_LSB
-        r2 = self.reg_base + SweepGenerator._REG_START_MSB
-        return self._instr._accessor_get((r2, r1), from_reg_unsigned(0, 64))
+    duration = RegisterField((_REG_DURATION_MSB, _REG_DURATION_LSB),
+                             to_reg_unsigned(0, 64), from_reg_unsigned(0, 64))
 
-    @start.setter
-    def start(self, value):
-        r1 = self.reg_base + SweepGenerator._REG_START_LSB
-        r2 = self.reg_base + SweepGenerator._REG_START_MSB
-        self._instr._accessor_set((r2, r1), to_reg_unsigned(0, 64), value)
+    wait_for_trig = RegisterField(_REG_CONFIG, to_reg_bool(2),
+                                  from_reg_bool(2))
 
-    @property
-    def stop(self):
-        r1 = self.reg_base + SweepGenerator._REG_STOP_LSB
-        r2 = self.reg_base + SweepGenerator._REG_STOP_MSB
-        return self._instr._accessor_get((r2, r1), from_reg_unsigned(0, 64))
-
-    @stop.setter
-    def stop(self, value):
-        r1 = self.reg_base + SweepGenerator._REG_STOP_LSB
-        r2 = self.reg_base + SweepGenerator._REG_STOP_MSB
-        self._instr._accessor_set((r2, r1), to_reg_unsigned(0, 64), value)
-
-    @property
-    def step(self):
-        r1 = self.reg_base + SweepGenerator._REG_STEP_LSB
-        r2 = self.reg_base + SweepGenerator._REG_STEP_MSB
-        return self._instr._accessor_get((r2, r1), from_reg_unsigned(0, 64))
-
-    @step.setter
-    def step(self, value):
-        r1 = self.reg_base + SweepGenerator._REG_STEP_LSB
-        r2 = self.reg_base + SweepGenerator._REG_STEP_MSB
-        self._instr._accessor_set((r2, r1), to_reg_unsigned(0, 64), value)
-
-    @property
-    def duration(self):
-        r1 = self.reg_base + SweepGenerator._REG_DURATION_LSB
-        r2 = self.reg_base + SweepGenerator._REG_DURATION_MSB
-        return self._instr._accessor_get((r2, r1), from_reg_unsigned(0, 64))
-
-    @duration.setter
-    def duration(self, value):
-        r1 = self.reg_base + SweepGenerator._REG_DURATION_LSB
-        r2 = self.reg_base + SweepGenerator._REG_DURATION_MSB
-        self._instr._accessor_set((r2, r1), to_reg_unsigned(0, 64), value)
-
-    @property
-    def wait_for_trig(self):
-        r = self.reg_base + SweepGenerator._REG_CONFIG
-        return self._instr._accessor_get(r, from_reg_bool(2))
-
-    @wait_for_trig.setter
-    def wait_for_trig(self, value):
-        r = self.reg_base + SweepGenerator._REG_CONFIG
-        self._instr._accessor_set(r, to_reg_bool(2), value)
-
-    @property
-    def hold_last(self):
-        r = self.reg_base + SweepGenerator._REG_CONFIG
-        return self._instr._accessor_get(r, from_reg_bool(3))
-
-    @hold_last.setter
-    def hold_last(self, value):
-        r = self.reg_base + SweepGenerator._REG_CONFIG
-        self._instr._accessor_set(r, to_reg_bool(3), value)
+    hold_last = RegisterField(_REG_CONFIG, to_reg_bool(3), from_reg_bool(3))
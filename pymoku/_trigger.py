@@ -4,6 +4,7 @@ from pymoku._instrument import to_reg_signed
 from pymoku._instrument import from_reg_signed
 from pymoku._instrument import to_reg_bool
 from pymoku._instrument import from_reg_bool
+from pymoku._instrument import RegisterField
 
 
 class Trigger(object):
@@ -28,99 +29,36 @@ class Trigger(object):
         self._instr = instr
         self.reg_base = reg_base
 
-    @property
-    def trigtype(self):
-        r = self.reg_base + Trigger._REG_CONFIG
-        return self._instr._accessor_get(r, from_reg_unsigned(0, 4))
+    trigtype = RegisterField(
+        _REG_CONFIG,
+        to_reg_unsigned(0, 4, allow_set=[TYPE_EDGE, TYPE_PULSE]),
+        from_reg_unsigned(0, 4))
 
-    @trigtype.setter
-    def trigtype(self, value):
-        r = self.reg_base + Trigger._REG_CONFIG
-        self._instr._accessor_set(
-            r, to_reg_unsigned(0, 4, allow_set=[Trigger.TYPE_EDGE,
-                                                Trigger.TYPE_PULSE]), value)
+    edge = RegisterField(
+        _REG_CONFIG,
+        to_reg_unsigned(4, 2, allow_set=[EDGE_RISING, EDGE_FALLING,
+                                         EDGE_BOTH]),
+        from_reg_unsigned(4, 2))
 
-    @property
-    def edge(self):
-        r = self.reg_base + Trigger._REG_CONFIG
-        return self._instr._accessor_get(r, from_reg_unsigned(4, 2))
+    pulsetype = RegisterField(
+        _REG_CONFIG,
+        to_reg_unsigned(7, 2, allow_set=[PULSE_MIN, PULSE_MAX]),
+        from_reg_unsigned(7, 2))
 
-    @edge.setter
-    def edge(self, value):
-        r = self.reg_base + Trigger._REG_CONFIG
-        self._instr._accessor_set(
-            r, to_reg_unsigned(4, 2, allow_set=[Trigger.EDGE_RISING,
-                                                Trigger.EDGE_FALLING,
-                                                Trigger.EDGE_BOTH]), value)
+    hysteresis = RegisterField(_REG_HYSTERESIS, to_reg_unsigned(0, 16),
+                               from_reg_unsigned(0, 16))
 
-    @property
-    def pulsetype(self):
-        r = self.reg_base + Trigger._REG_CONFIG
-        return self._instr._accessor_get(r, from_reg_unsigned(7, 2))
+    holdoff = RegisterField(_REG_HOLDOFF, to_reg_unsigned(0, 32),
+                            from_reg_unsigned(0, 32))
 
-    @pulsetype.setter
-    def pulsetype(self, value):
-        r = self.reg_base + Trigger._REG_CONFIG
-        self._instr._accessor_set(
-            r, to_reg_unsigned(7, 2, allow_set=[Trigger.PULSE_MIN,
-                                                Trigger.PULSE_MAX]), value)
+    ntrigger = RegisterField(_REG_NTRIGGER, to_reg_unsigned(0, 16),
+                             from_reg_unsigned(0, 16))
 
-    @property
-    def hysteresis(self):
-        r = self.reg_base + Trigger._REG_HYSTERESIS
-        return self._instr._accessor_get(r, from_reg_unsigned(0, 16))
+    ntrigger_mode = RegisterField(_REG_NTRIGGER, to_reg_bool(31),
+                                  from_reg_bool(31))
 
-    @hysteresis.setter
-    def hysteresis(self, value):
-        r = self.reg_base + Trigger._REG_HYSTERESIS
-        self._instr._accessor_set(r, to_reg_unsigned(0, 16), value)
+    level = RegisterField(_REG_LEVEL, to_reg_signed(0, 32),
+                          from_reg_signed(0, 32))
 
-    @property
-    def holdoff(self):
-        r = self.reg_base + Trigger._REG_HOLDOFF
-        return self._instr._accessor_get(r, from_reg_unsigned(0, 32))
-
-    @holdoff.setter
-    def holdoff(self, value):
-        r = self.reg_base + Trigger._REG_HOLDOFF
-        self._instr._accessor_set(r, to_reg_unsigned(0, 32), value)
-
-    @property
-    def ntrigger(self):
-        r = self.reg_base + Trigger._REG_NTRIGGER
-        return self._instr._accessor_get(r, from_reg_unsigned(0, 16))
-
-    @ntrigger.setter
-    def ntrigger(self, value):
-        r = self.reg_base + Trigger._REG_NTRIGGER
-        self._instr._accessor_set(r, to_reg_unsigned(0, 16), value)
-
-    @property
-    def ntrigger_mode(self):
-        r = self.reg_base + Trigger._REG_NTRIGGER
-        return self._instr._accessor_get(r, from_reg_bool(31))
-
-    @ntrigger_mode.setter
-    def ntrigger_mode(self, value):
-        r = self.reg_base + Trigger._REG_NTRIGGER
-        self._instr._accessor_set(r, to_reg_bool(31), value)
-
-    @property
-    def level(self):
-        r = self.reg_base + Trigger._REG_LEVEL
-        return self._instr._accessor_get(r, from_reg_signed(0, 32))
-
-    @level.setter
-    def level(self, value):
-        r = self.reg_base + Trigger._REG_LEVEL
-        self._instr._accessor_set(r, to_reg_signed(0, 32), value)
-
-    @property
-    def duration(self):
-        r = self.reg_base + Trigger._REG_DURATION
-        return self._instr._accessor_get(r, from_reg_unsigned(0, 32))
-
-    @duration.setter
-    def duration(self, value):
-        r = self.reg_base + Trigger._REG_DURATION
-        self._instr._accessor_set(r, to_reg_unsigned(0, 32), value)
+    duration = RegisterField(_REG_DURATION, to_reg_unsigned(0, 32),
+                             from_reg_unsigned(0, 32))
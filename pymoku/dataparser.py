@@ -11,6 +11,11 @@ import struct
 
 log = logging.getLogger(__name__)
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 try:
     import pymoku.li_capnp as schema
 except ImportError:
@@ -924,3 +929,96 @@ except ImportError:
     log.debug("liquidreader module unable to be imported. "
               "Falling back to default data parser.")
     LIDataParser = SlowDataParser
+
+
+class ArrayDataParser(SlowDataParser):
+    """ Parser for streams of fixed-width, byte-aligned integer records.
+
+    Formats such as the "<s32" used to transfer full channel buffers don't
+    need the general bit-level parser. This decodes them with NumPy and
+    applies the (arithmetic-only) processing string to whole packets at once.
+    The processed samples are presented as lists, as for the other parsers.
+
+    Use :any:`supports` to check a format can be handled before creating
+    one of these. Requires NumPy.
+    """
+    _dtypes = {('s', 8): '<i1', ('s', 16): '<i2', ('s', 32): '<i4',
+               ('s', 64): '<i8', ('u', 8): '<u1', ('u', 16): '<u2',
+               ('u', 32): '<u4', ('u', 64): '<u8'}
+
+    @staticmethod
+    def supports(binstr, procstr):
+        """ Returns whether the given binary record description and
+        processing strings can be handled by this parser. """
+        if np is None or not len(binstr):
+            return False
+
+        try:
+            binfmt = SlowDataParser._parse_binstr(binstr)
+            procfmts = [SlowDataParser._parse_procstr(p, 1.0)
+                        for p in procstr]
+        except InvalidFormatException:
+            return False
+
+        if len(binfmt) != 1:
+            return False
+
+        typ, bitlen, lit = binfmt[0]
+        if (typ, bitlen) not in ArrayDataParser._dtypes or lit is not None:
+            return False
+
+        return all(len(p) == 1 and all(op in '*/+-' and lit is not None
+                                       for op, lit in p[0])
+                   for p in procfmts)
+
+    def __init__(self, ch1, ch2, binstr, procstr, fmtstr, hdrstr, deltat,
+                 starttime, calcoeffs, startoffset):
+        super(ArrayDataParser, self).__init__(ch1, ch2, binstr, procstr,
+                                              fmtstr, hdrstr, deltat,
+                                              starttime, calcoeffs,
+                                              startoffset)
+        typ, bitlen, _ = self.binfmt[0]
+        self.dtype = np.dtype(self._dtypes[(typ, bitlen)])
+
+        # Trailing partial record from the last packet on each channel
+        self._partial = [b'' for _ in range(self.nch)]
+
+    def _chidx(self, ch):
+        return 0 if ch == 0 or self.nch == 1 else 1
+
+    def set_coeff(self, ch, coeff):
+        chidx = self._chidx(ch)
+        self.procfmt[chidx] = SlowDataParser._parse_procstr(
+            self.procstr[chidx], coeff)
+
+    def parse(self, data, ch, start_idx=None):
+        """ Parse a chunk of data.
+
+        :param data: bytestring of new data
+        :param ch: Channel to which the data belongs"""
+        chidx = self._chidx(ch)
+
+        if start_idx is not None:
+            if self._byteidx[chidx] != start_idx:
+                raise DataIntegrityException("Data loss detected on "
+                                             "stream interface")
+            self._byteidx[chidx] += len(data)
+
+        buf = self._partial[chidx] + data if self._partial[chidx] else data
+        whole = len(buf) - len(buf) % self.dtype.itemsize
+        self._partial[chidx] = bytes(buf[whole:])
+
+        vals = np.frombuffer(buf, dtype=self.dtype,
+                             count=whole // self.dtype.itemsize)
+
+        for op, lit in self.procfmt[chidx][0]:
+            if op == '*':
+                vals = vals * lit
+            elif op == '/':
+                vals = vals / lit
+            elif op == '+':
+                vals = vals + lit
+            elif op == '-':
+                vals = vals - lit
+
+        self.processed[chidx].extend(vals.tolist())
@@ -13,6 +13,7 @@ from . import _pid_controller
 from . import _iirfilterbox
 from . import _firfilter
 from . import _laser_lock_box
+from . import _frame_recorder
 ''' Preferred import point. Aggregates the separate instruments and helper
     classes to flatten the import heirarchy
     (e.g. pymoku.instruments.Oscilloscope rather
@@ -20,10 +21,14 @@ from . import _laser_lock_box
 '''
 
 InstrumentData = _frame_instrument.InstrumentData
+SegmentData = _frame_instrument.SegmentData
 VoltsData = _oscilloscope.VoltsData
 SpectrumData = _specan.SpectrumData
 FRAData = _frequency_response_analyzer.FRAData
 
+FrameRecorder = _frame_recorder.FrameRecorder
+FrameReplayer = _frame_recorder.FrameReplayer
+
 MokuInstrument = _instrument.MokuInstrument
 
 Oscilloscope = _oscilloscope.Oscilloscope
@@ -0,0 +1,241 @@
+""" On-site performance checks for ``moku bench``.
+
+Each check exercises one path between this host and a Moku:Lab and returns
+a dict of results, so they can be printed as a table or saved as JSON to
+compare between hosts, networks or pymoku versions:
+
+- *control*: round trip time of register reads and writes and property
+  reads.
+- *fileserver*: upload and download throughput of a scratch file.
+- *frames*: the rate frames arrive from an Oscilloscope and how long they
+  take to decode, compared to the time between frames.
+- *stream*: the sample rate sustained by a Datalogger network stream
+  running at the maximum rate pymoku allows.
+
+The frames and stream checks deploy instruments, replacing whatever the
+Moku:Lab was running.
+"""
+import os
+import tempfile
+import time
+
+from timeit import default_timer as timer
+
+from pymoku import _instrument
+from pymoku.instruments import Oscilloscope, Datalogger
+
+CHECKS = ['control', 'fileserver', 'frames', 'stream']
+
+_SCRATCH = 'pymoku_bench.bin'
+
+
+def _summary(samples):
+    # Latency distribution in seconds
+    s = sorted(samples)
+    n = len(s)
+    return {
+        'count': n,
+        'mean': sum(s) / n,
+        'min': s[0],
+        'median': s[n // 2],
+        'p99': s[min(n - 1, int(n * 0.99))],
+        'max': s[-1],
+    }
+
+
+def _timed(fn, count):
+    samples = []
+    for _ in range(count):
+        t0 = timer()
+        fn()
+        samples.append(timer() - t0)
+    return _summary(samples)
+
+
+def bench_control(moku, count=200):
+    """ Times *count* of each of: single register reads, single register
+    writes (of the value already there, so the instrument is unaffected) and
+    single property reads. """
+    reg = _instrument.REG_PAUSE
+    val = moku._read_regs([reg])[0][1]
+
+    return {
+        'register_read': _timed(lambda: moku._read_regs([reg]), count),
+        'register_write': _timed(lambda: moku._write_regs([(reg, val)]),
+                                 count),
+        'property_read': _timed(
+            lambda: moku._get_properties(['device.serial']), count),
+    }
+
+
+def bench_fileserver(moku, size=16 * 2 ** 20, mp='i'):
+    """ Uploads then downloads a *size* byte scratch file on mount point
+    *mp*, deleting it afterwards. Rates are in bytes per second. """
+    data = os.urandom(size)
+    fd, local = tempfile.mkstemp()
+    os.close(fd)
+
+    try:
+        t0 = timer()
+        moku._send_file_bytes(mp, _SCRATCH, data)
+        moku._fs_finalise(mp, _SCRATCH, size)
+        upload = timer() - t0
+
+        t0 = timer()
+        moku._receive_file(mp, _SCRATCH, size, local)
+        download = timer() - t0
+
+        if os.path.getsize(local) != size:
+            raise IOError("Downloaded file is the wrong size")
+    finally:
+        os.remove(local)
+        moku._delete_file(mp, _SCRATCH)
+
+    return {
+        'size': size,
+        'upload': size / upload,
+        'download': size / download,
+    }
+
+
+def bench_frames(moku, duration=5.0):
+    """ Receives Oscilloscope frames for *duration* seconds. *headroom* is
+    the time between frames divided by the mean decode time; below one,
+    decoding can't keep up. """
+    i = moku.deploy_instrument(Oscilloscope)
+
+    # Let the frame subscription settle before counting
+    i.get_realtime_data(timeout=10)
+    i.reset_stats()
+
+    end = time.time() + duration
+    while time.time() < end:
+        i.get_realtime_data(timeout=10)
+
+    stats = i.stats()
+    rate = stats['completed'] / stats['elapsed']
+    decode = stats['decode_time']['mean']
+
+    return {
+        'rate': rate,
+        'delivered': stats['delivered'] / stats['elapsed'],
+        'decode_mean': decode,
+        'headroom': 1.0 / (rate * decode) if rate and decode else None,
+        'dropped': stats['dropped'],
+    }
+
+
+def bench_stream(moku, duration=5):
+    """ Streams both Datalogger channels over the network for *duration*
+    seconds at the maximum rate pymoku allows. Rates are in samples per
+    second per channel. """
+    i = moku.deploy_instrument(Datalogger)
+
+    i.ch1 = i.ch2 = True
+    i.nch = 2
+    target = i._max_stream_rate(False, 'net')
+    i.set_samplerate(target)
+    target = i.get_samplerate()
+
+    i.start_stream_data(duration=int(duration), ch1=True, ch2=True)
+    samples = lead = 0
+    first = last = None
+
+    try:
+        while True:
+            ch1, _ = i.get_stream_data(n=0, timeout=duration + 10)
+
+            if ch1:
+                last = timer()
+                if first is None:
+                    first, lead = last, len(ch1)
+                samples += len(ch1)
+            elif i._no_data:
+                break
+
+        decode = i._dldecode_time
+    finally:
+        i.stop_stream_data()
+
+    # Time from the arrival of the first data, so the samples in that first
+    # chunk aren't counted
+    elapsed = last - first if first is not None else 0.0
+    rate = (samples - lead) / elapsed if elapsed else 0.0
+
+    return {
+        'target': target,
+        'rate': rate,
+        'ratio': rate / target,
+        'samples': samples,
+        'decode_time': decode,
+        'headroom': elapsed / decode if decode else None,
+    }
+
+
+def run(moku, checks=CHECKS, count=200, size=16 * 2 ** 20, duration=5):
+    """ Runs the named *checks*, returning a dict of their results along
+    with the identity of the Moku:Lab. """
+    results = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'serial': moku.get_serial(),
+        'name': moku.get_name(),
+        'ip': moku.get_ip(),
+        'firmware': moku.get_firmware_build(),
+    }
+
+    for check in checks:
+        if check == 'control':
+            results[check] = bench_control(moku, count)
+        elif check == 'fileserver':
+            results[check] = bench_fileserver(moku, size)
+        elif check == 'frames':
+            results[check] = bench_frames(moku, duration)
+        elif check == 'stream':
+            results[check] = bench_stream(moku, duration)
+        else:
+            raise ValueError("Unknown check %s" % check)
+
+    return results
+
+
+def format_table(results):
+    """ Returns the results from :any:`run` as a printable table. """
+    lines = ["Moku:Lab %s (%s) at %s, firmware %s" % (
+        results['name'], results['serial'], results['ip'],
+        results['firmware'])]
+
+    def row(name, value, unit=''):
+        lines.append("  %-28s %14s %s" % (name, value, unit))
+
+    if 'control' in results:
+        lines.append("Control round trip")
+        for op, s in sorted(results['control'].items()):
+            row(op, "%.2f / %.2f" % (s['median'] * 1e3, s['p99'] * 1e3),
+                "ms (median / p99)")
+
+    if 'fileserver' in results:
+        fs = results['fileserver']
+        lines.append("Fileserver (%.1f MiB)" % (fs['size'] / 2.0 ** 20))
+        row('upload', "%.2f" % (fs['upload'] / 2.0 ** 20), "MiB/s")
+        row('download', "%.2f" % (fs['download'] / 2.0 ** 20), "MiB/s")
+
+    if 'frames' in results:
+        fr = results['frames']
+        lines.append("Frames")
+        row('received', "%.1f" % fr['rate'], "frames/s")
+        row('delivered', "%.1f" % fr['delivered'], "frames/s")
+        row('decode', "%.2f" % (fr['decode_mean'] * 1e3), "ms mean")
+        if fr['headroom'] is not None:
+            row('headroom', "%.1f" % fr['headroom'], "x")
+        row('dropped', sum(fr['dropped'].values()))
+
+    if 'stream' in results:
+        st = results['stream']
+        lines.append("Network stream")
+        row('target', "%.0f" % st['target'], "smp/s")
+        row('sustained', "%.0f" % st['rate'], "smp/s (%.0f%%)"
+            % (100 * st['ratio']))
+        if st['headroom'] is not None:
+            row('headroom', "%.1f" % st['headroom'], "x")
+
+    return '\n'.join(lines)
@@ -0,0 +1,706 @@
+#!/usr/bin/env python
+""" Local emulation of the Moku:Lab network interfaces.
+
+Serves the control protocol (registers, properties, the fileserver,
+instrument deployment and stream control) on the usual control port, and
+publishes synthetic frames and network stream data on the frame and stream
+ports, so that pymoku can be exercised and benchmarked end to end without
+hardware:
+
+    with emulated_moku() as (emu, m):
+        i = m.deploy_instrument(Oscilloscope)
+        frame = i.get_realtime_data()
+
+The emulator has no FPGA behind it. Registers simply hold what was written,
+frames are fixed waveforms and stream records are generated from the binary
+record description given by the instrument, so data values are only
+representative in their size and rate.
+
+The Moku:Lab's private key isn't available, so the control port is
+unencrypted and pymoku must connect with *force=True*.
+"""
+import hashlib
+import logging
+import math
+import struct
+import threading
+import time
+import zlib
+
+from argparse import ArgumentParser
+from contextlib import contextmanager
+
+import zmq
+
+from pymoku import Moku, _protocol
+from pymoku import _ERR_OK, _ERR_NOTFOUND, _ERR_NOMP, _ERR_UNKNOWN
+from pymoku._instrument import REG_ID1, REG_STATE
+from pymoku._input_instrument import _STREAM_STATE_NONE, \
+    _STREAM_STATE_RUNNING, _STREAM_STATE_WAITING, _STREAM_STATE_BUSY, \
+    _STREAM_STATE_STOPPED
+from pymoku.dataparser import LIDataParser
+from pymoku.version import compat_fw
+
+log = logging.getLogger(__name__)
+
+CONTROL_PORT = 27184
+FRAME_PORT = 27185
+STREAM_PORT = 27186
+
+# Frame packet header: state ID, trigger state, channel, instrument ID and
+# waveform ID, then a fixed block of instrument metadata.
+_FRAME_HDR = struct.Struct('<BBBBI')
+_FRAME_META = b'\x00' * 32
+
+# Stream control packet header: type, length, sequence number and action
+_STREAM_HDR = struct.Struct('<BIBB')
+_STREAM_PREP = struct.Struct('<IIdBd')
+_STREAM_NET = 31
+
+# Records generated per stream block, and per channel for a buffer transfer
+_STREAM_BLOCK = 1024
+_BUFFER_RECORDS = 16384
+
+# Time between stream start and the first data, allowing the subscriber to
+# connect as the real device's start up latency does.
+_STREAM_START_DELAY = 0.1
+
+# Publisher loop period, seconds
+_TICK = 0.005
+
+# Bitstreams, external (SD), internal, packs, firmware and the instrument
+# memory map (LUTs, filter coefficients)
+_FS_MOUNTS = ['b', 'e', 'f', 'i', 'j', 'p']
+_FS_SIZE = 8 * 1024 ** 3
+
+_LED_COLOURS = {'red': '0xFF0000', 'green': '0x00FF00', 'blue': '0x0000FF',
+                'white': '0xFFFFFF'}
+
+
+def _default_properties(serial, name):
+    props = {
+        'device.serial': serial,
+        'device.hw_version': '2.0',
+        'system.name': name,
+        'system.micro': str(compat_fw[0]),
+        # Not 'normal', so pymoku doesn't try to upload instrument bitstreams
+        'system.bootmode': 'emulator',
+        'system.instrument': '0',
+        'ipad.name': '',
+    }
+
+    for n in range(1, 5):
+        props['leds.ufo%d' % n] = 'blue'
+
+    for colour, value in _LED_COLOURS.items():
+        props['colourtable.' + colour] = value
+
+    for ch in (1, 2):
+        for imp in ('1M', '50'):
+            for att in ('H', 'L'):
+                for cpl in ('D', 'A'):
+                    key = '%s-%s-%s-%d' % (imp, att, cpl, ch)
+                    props['calibration.AG-' + key] = \
+                        '3750.0' if att == 'H' else '375.0'
+                    props['calibration.AO-' + key] = '0.0'
+                    props['calibration.AGT-' + key] = '0.0'
+                    props['calibration.AOT-' + key] = '0.0'
+
+        props['calibration.DG-%d' % ch] = '30000.0'
+        props['calibration.DO-%d' % ch] = '0.0'
+        props['calibration.DGT-%d' % ch] = '0.0'
+        props['calibration.DOT-%d' % ch] = '0.0'
+
+    return props
+
+
+def _field_value(typ, bits, literal, n):
+    # Synthetic value of the n'th record's field: a sine for signed fields,
+    # a counter for unsigned.
+    if literal is not None:
+        return literal
+    if typ == 's':
+        return int(math.sin(2 * math.pi * n / 64.0) * (2 ** (bits - 2)))
+    if typ == 'f':
+        fmt = ('<f', '<I') if bits == 32 else ('<d', '<Q')
+        return struct.unpack(fmt[1], struct.pack(fmt[0], float(n)))[0]
+    return n
+
+
+def _pack_records(binstr, n):
+    """ Pack *n* synthetic records described by *binstr*, little-endian bit
+    order as parsed by :any:`LIDataParser`. *n* must make a whole number of
+    bytes. """
+    fmt = LIDataParser._parse_binstr(binstr)
+    val, off = 0, 0
+
+    for i in range(n):
+        for typ, bits, literal in fmt:
+            v = _field_value(typ, bits, literal, i) & ((1 << bits) - 1)
+            val |= v << off
+            off += bits
+
+    return bytes(bytearray((val >> (8 * b)) & 0xFF for b in range(off // 8)))
+
+
+class _StreamSession(object):
+    # State of one streaming session, shared by the control and publisher
+    # threads under the emulator lock.
+    def __init__(self, tag, ch1, ch2, duration, timestep, binstr, fname,
+                 net, max_rate):
+        self.tag = tag
+        self.nch = int(ch1) + int(ch2)
+        self.fname = fname
+        self.net = net
+        self.state = _STREAM_STATE_WAITING
+        self.duration = duration
+        self.started = None
+
+        rate = 1.0 / timestep if timestep > 0 else max_rate
+        self.rate = min(rate, max_rate) if max_rate else rate
+
+        # Records must be sent in whole bytes
+        recbits = LIDataParser.record_length(binstr)
+        self.quantum = 8 // min(recbits & -recbits, 8)
+        self.recbytes = recbits / 8.0
+
+        if duration:
+            total = int(duration * self.rate)
+        else:
+            # A zero duration network session is a full buffer transfer
+            total = _BUFFER_RECORDS
+        self.total = total - total % self.quantum
+
+        block = _pack_records(binstr, _STREAM_BLOCK)
+        self._block = block + block
+        self.sent = 0
+        self.byteidx = [0] * self.nch
+        self.finished = False
+
+    def chunk(self, n):
+        start = int((self.sent % _STREAM_BLOCK) * self.recbytes)
+        return self._block[start:start + int(n * self.recbytes)]
+
+    def samples(self):
+        return self.sent * self.nch
+
+    def times(self, now):
+        if self.started is None:
+            return 0, int(self.duration)
+        elapsed = now - self.started
+        return -int(elapsed), int(self.duration - elapsed)
+
+
+class MokuEmulator(object):
+    """
+    Emulates a Moku:Lab's network interfaces on a local address.
+
+    :type ip: str
+    :param ip: Address to serve on. Use another loopback address (e.g.
+        127.0.0.2) to run more than one emulator on a host.
+
+    :type serial: str
+    :param serial: Device serial number reported.
+
+    :type name: str
+    :param name: Device name reported.
+
+    :type frame_rate: float
+    :param frame_rate: Rate, in frames per second, that frames are published
+        while an instrument is deployed.
+
+    :type frame_points: int
+    :param frame_points: Samples per channel in each frame.
+
+    :type max_stream_rate: float
+    :param max_stream_rate: Upper limit on the records per second generated
+        by each stream channel, or *None* to generate at the rate requested.
+    """
+    def __init__(self, ip='127.0.0.1', serial='000000', name='Emulator',
+                 frame_rate=10.0, frame_points=1024, max_stream_rate=None):
+        self.ip = ip
+        self.frame_rate = frame_rate
+        self.frame_points = frame_points
+        self.max_stream_rate = max_stream_rate
+
+        self.properties = _default_properties(serial, name)
+        self.registers = [0] * 128
+        self.files = dict((mp, {}) for mp in _FS_MOUNTS)
+        self.instrument = 0
+        self.frames = 0
+
+        self._owner = b''
+        self._session = None
+        self._renamed = 0
+        self._waveformid = 0
+        self._lock = threading.RLock()
+        self._running = False
+        self._threads = []
+        self._sockets = []
+
+        self._handlers = {
+            0x40: self._ownership,
+            0x41: self._ownership,
+            0x43: self._deploy,
+            0x46: self._properties,
+            0x47: self._registers,
+            0x48: self._ack,
+            0x49: self._fileserver,
+            0x52: self._ack,
+            0x53: self._stream,
+            0x54: self._clock,
+            0x55: self._slots,
+        }
+
+        self._fs_handlers = {
+            1: self._fs_read,
+            2: self._fs_write,
+            3: self._fs_crc,
+            4: self._fs_size,
+            5: self._fs_list,
+            6: self._fs_free,
+            7: self._fs_finalise,
+            8: self._fs_rename,
+            9: self._fs_rename_status,
+            10: self._fs_sha,
+        }
+
+    def start(self):
+        """ Bind the emulator's ports and start serving. Raises
+        :any:`zmq.ZMQError` if the ports are in use. """
+        # A private context, so that terminating it on stop waits until the
+        # ports have actually been released
+        self._ctx = zmq.Context()
+
+        try:
+            self._ctl = self._bind(zmq.REP, CONTROL_PORT)
+            self._frame_pub = self._bind(zmq.PUB, FRAME_PORT)
+            self._stream_pub = self._bind(zmq.PUB, STREAM_PORT)
+        except zmq.ZMQError:
+            self._close_sockets()
+            raise
+
+        self._running = True
+        for target in (self._control_loop, self._publish_loop):
+            t = threading.Thread(target=target, name='moku-emulator')
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+        log.info("Moku:Lab emulator serving on %s", self.ip)
+
+    def stop(self):
+        """ Stop serving and release the ports. """
+        self._running = False
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        self._close_sockets()
+
+    def _bind(self, kind, port):
+        skt = self._ctx.socket(kind)
+        skt.setsockopt(zmq.LINGER, 0)
+        self._sockets.append(skt)
+        skt.bind('tcp://%s:%d' % (self.ip, port))
+        return skt
+
+    def _close_sockets(self):
+        for skt in self._sockets:
+            skt.close()
+        self._sockets = []
+
+        self._ctx.term()
+        self._ctx = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    # Control port
+
+    def _control_loop(self):
+        while self._running:
+            if not self._ctl.poll(100):
+                continue
+
+            pkt = self._ctl.recv()
+            try:
+                with self._lock:
+                    reply = self._handle(pkt)
+            except Exception:
+                log.exception("Failed to handle request")
+                reply = pkt[:1] + b'\xff'
+
+            self._ctl.send(reply)
+
+    def _handle(self, pkt):
+        handler = self._handlers.get(bytearray(pkt[:1])[0])
+        if handler is None:
+            log.warning("Unknown request type %r", pkt[:1])
+            return pkt[:1] + b'\xff'
+        return handler(pkt)
+
+    def _ack(self, pkt):
+        return pkt[:1] + b'\x00'
+
+    def _ownership(self, pkt):
+        t, plen, flags = struct.unpack_from('<BBB', pkt)
+        name = pkt[3:3 + plen - 1]
+
+        if t == 0x40:
+            if flags:
+                self._owner = name
+            elif self._owner == name:
+                self._owner = b''
+
+        own = 0
+        if self._owner:
+            own = 2 if self._owner == name else 1
+
+        reply = struct.pack('<BBB', t, len(self._owner) + 1, own)
+        if t == 0x41:
+            reply += struct.pack('<I', 0)
+        return reply + self._owner
+
+    def _deploy(self, pkt):
+        instr = bytearray(pkt[1:2])[0]
+
+        self.registers = [0] * 128
+        self.registers[REG_ID1] = instr
+        self.instrument = instr
+        self.properties['system.instrument'] = '%d.0' % instr
+        self._session = None
+
+        return struct.pack('<BBBH', 0x43, 0, 0, 1)
+
+    def _properties(self, pkt):
+        seq, entries = _protocol.unpack_property_request(pkt)
+        props = []
+
+        for action, name, value in entries:
+            if action == _protocol.PROP_READ:
+                if name not in self.properties:
+                    return _protocol.pack_property_reply(seq, 1, [(name, '')])
+                props.append((name, self.properties[name]))
+            elif action == _protocol.PROP_WRITE:
+                self.properties[name] = value
+                props.append((name, value))
+            elif action == _protocol.PROP_SECTION:
+                prefix = name + '.'
+                props.extend(sorted((k, v) for k, v in self.properties.items()
+                                    if k.startswith(prefix)))
+
+        return _protocol.pack_property_reply(seq, 0, props)
+
+    def _registers(self, pkt):
+        reads, writes = _protocol.unpack_reg_request(pkt)
+
+        for reg, val in writes:
+            self.registers[reg] = val
+
+        return _protocol.pack_reg_reply([(r, self.registers[r])
+                                         for r in reads])
+
+    def _clock(self, pkt):
+        return struct.pack('<BBB', 0x54, 0, 0)
+
+    def _slots(self, pkt):
+        return struct.pack('<BQQ', 0x55, 0, 0)
+
+    # Fileserver
+
+    def _fileserver(self, pkt):
+        action, data = _protocol.unpack_fs_request(pkt)
+        handler = self._fs_handlers.get(action)
+
+        if handler is None:
+            return _protocol.pack_fs_reply(action, _ERR_UNKNOWN)
+
+        try:
+            payload = handler(bytes(data))
+        except _FSError as e:
+            return _protocol.pack_fs_reply(action, e.status)
+
+        return _protocol.pack_fs_reply(action, _ERR_OK, payload)
+
+    def _fs_path(self, data, off=0):
+        # Length-prefixed "mp:name", returns the mount's files, the name and
+        # the offset of the data after it.
+        n = bytearray(data[off:off + 1])[0]
+        mp, name = data[off + 1:off + 1 + n].decode('ascii').split(':', 1)
+
+        if mp not in self.files:
+            raise _FSError(_ERR_NOMP)
+
+        return self.files[mp], name, off + 1 + n
+
+    def _fs_file(self, data):
+        files, name, off = self._fs_path(data)
+        if name not in files:
+            raise _FSError(_ERR_NOTFOUND)
+        return files[name], off
+
+    def _fs_read(self, data):
+        f, off = self._fs_file(data)
+        offset, length = struct.unpack_from('<QQ', data, off)
+        return struct.pack('<Q', offset) + bytes(f[offset:offset + length])
+
+    def _fs_write(self, data):
+        files, name, off = self._fs_path(data)
+        offset, length = struct.unpack_from('<QQ', data, off)
+        chunk = data[off + 16:off + 16 + length]
+
+        f = files.setdefault(name, bytearray())
+        if len(f) < offset:
+            f.extend(b'\x00' * (offset - len(f)))
+        f[offset:offset + len(chunk)] = chunk
+        return b''
+
+    def _fs_crc(self, data):
+        f, _ = self._fs_file(data)
+        return struct.pack('<I', zlib.crc32(bytes(f)) & 0xFFFFFFFF)
+
+    def _fs_size(self, data):
+        f, _ = self._fs_file(data)
+        return struct.pack('<Q', len(f))
+
+    def _fs_list(self, data):
+        mp, flags = data[:-1].decode('ascii'), bytearray(data[-1:])[0]
+        if mp not in self.files:
+            raise _FSError(_ERR_NOMP)
+
+        crc, sha = bool(flags & 1), bool(flags & 2)
+        names = []
+        for name, f in sorted(self.files[mp].items()):
+            if sha:
+                chk = hashlib.sha256(f).hexdigest()
+            elif crc:
+                chk = (zlib.crc32(bytes(f)) & 0xFFFFFFFF,)
+            else:
+                chk = ''
+            names.append((name, chk, len(f)))
+
+        return _protocol.pack_fs_list(names, crc, sha)
+
+    def _fs_free(self, data):
+        mp = data.decode('ascii')
+        if mp not in self.files:
+            raise _FSError(_ERR_NOMP)
+
+        used = sum(len(f) for f in self.files[mp].values())
+        return struct.pack('<QQ', _FS_SIZE, _FS_SIZE - used)
+
+    def _fs_finalise(self, data):
+        files, name, off = self._fs_path(data)
+        size = struct.unpack_from('<Q', data, off)[0]
+
+        # Finalising to zero length deletes the file
+        if not size:
+            files.pop(name, None)
+            return b''
+
+        f = files.setdefault(name, bytearray())
+        del f[size:]
+        return b''
+
+    def _fs_rename(self, data):
+        src, sname, off = self._fs_path(data)
+        dst, dname, off = self._fs_path(data, off)
+        move = bytearray(data[off:off + 1])[0] & 1
+
+        if sname not in src:
+            raise _FSError(_ERR_NOTFOUND)
+
+        dst[dname] = src.pop(sname) if move else bytearray(src[sname])
+        self._renamed = len(dst[dname])
+        return b''
+
+    def _fs_rename_status(self, data):
+        return struct.pack('<QB', self._renamed, 100)
+
+    def _fs_sha(self, data):
+        f, _ = self._fs_file(data)
+        return hashlib.sha256(f).hexdigest().encode('ascii')
+
+    # Stream control
+
+    def _stream(self, pkt):
+        hdr, length, seq, action = _STREAM_HDR.unpack_from(pkt)
+        s = self._session
+        now = time.time()
+
+        if action == 1:
+            stat = self._stream_prep(pkt[_STREAM_HDR.size:])
+        elif action == 4:
+            if s is not None and s.state == _STREAM_STATE_WAITING:
+                s.state = _STREAM_STATE_RUNNING
+                s.started = now
+            stat = s.state if s is not None else _STREAM_STATE_NONE
+        elif action == 2:
+            stat = s.state if s is not None else _STREAM_STATE_NONE
+            self._session = None
+            return self._stream_reply(
+                seq, stat, struct.pack('<Q', s.samples() if s else 0))
+        elif action == 3:
+            if s is None:
+                return self._stream_reply(
+                    seq, _STREAM_STATE_NONE, struct.pack('<QiiBH', 0, 0, 0,
+                                                         0, 0))
+            fname = s.fname.encode('ascii')
+            trems, treme = s.times(now)
+            return self._stream_reply(
+                seq, s.state, struct.pack('<QiiBH', s.samples(), trems,
+                                          treme, 0, len(fname)) + fname)
+        else:
+            stat = _STREAM_STATE_NONE
+
+        return self._stream_reply(seq, stat)
+
+    def _stream_reply(self, seq, stat, data=b''):
+        return struct.pack('<BIBBB', 0x53, len(data) + 3, seq, 0, stat) + data
+
+    def _stream_prep(self, body):
+        if self._session is not None and \
+                self._session.state in (_STREAM_STATE_WAITING,
+                                        _STREAM_STATE_RUNNING):
+            return _STREAM_STATE_BUSY
+
+        tag = body[:4].decode('ascii')
+        start, end, offset, flags, timestep = \
+            _STREAM_PREP.unpack_from(body, 5)
+
+        strings = []
+        off = 5 + _STREAM_PREP.size
+        for _ in range(5):
+            n = struct.unpack_from('<H', body, off)[0]
+            strings.append(body[off + 2:off + 2 + n].decode('ascii'))
+            off += 2 + n
+        fname, binstr = strings[:2]
+
+        self._session = _StreamSession(
+            tag, bool(flags & 1), bool(flags & 2), end - start, timestep,
+            binstr, fname, (flags >> 2) == _STREAM_NET, self.max_stream_rate)
+
+        return _STREAM_STATE_WAITING
+
+    # Frame and stream publishing
+
+    def _frame_data(self):
+        n = self.frame_points
+        return [struct.pack('<%di' % n, *[
+            int(2 ** 20 * math.sin(2 * math.pi * (x / float(n)) + phase))
+            for x in range(n)]) for phase in (0, math.pi / 2)]
+
+    def _publish_loop(self):
+        data = self._frame_data()
+        next_frame = time.time()
+
+        while self._running:
+            now = time.time()
+
+            with self._lock:
+                instr = self.instrument
+                stateid = self.registers[REG_STATE] & 0xFF
+                session = self._session
+
+            if instr and self.frame_rate and now >= next_frame:
+                self._publish_frame(instr, stateid, data)
+                next_frame = max(next_frame + 1.0 / self.frame_rate, now)
+
+            if session is not None:
+                with self._lock:
+                    self._publish_stream(session, now)
+
+            time.sleep(_TICK)
+
+    def _publish_frame(self, instr, stateid, data):
+        self._waveformid += 1
+        for ch in (0, 1):
+            hdr = _FRAME_HDR.pack(stateid, stateid, ch, instr,
+                                  self._waveformid)
+            self._frame_pub.send(hdr + _FRAME_META + data[ch])
+        self.frames += 1
+
+    def _publish_stream(self, s, now):
+        if s.state != _STREAM_STATE_RUNNING or \
+                now < s.started + _STREAM_START_DELAY:
+            return
+
+        if s.duration:
+            due = min(s.total, int((now - s.started) * s.rate))
+        else:
+            due = s.total
+
+        n = due - s.sent
+        n -= n % s.quantum
+
+        while n > 0:
+            k = min(n, _STREAM_BLOCK)
+            chunk = s.chunk(k)
+
+            for ch in range(s.nch):
+                if s.net:
+                    hdr = '%s|%d|%d|%r' % (s.tag, ch, s.byteidx[ch], 1.0)
+                    self._stream_pub.send_multipart([hdr.encode('ascii'),
+                                                     chunk])
+                s.byteidx[ch] += len(chunk)
+
+            s.sent += k
+            n -= k
+
+        if s.sent >= s.total and not s.finished:
+            if s.net:
+                hdr = '%s|-1|0|0' % s.tag
+                self._stream_pub.send_multipart([hdr.encode('ascii'), b''])
+            s.finished = True
+            s.state = _STREAM_STATE_STOPPED
+
+
+class _FSError(Exception):
+    def __init__(self, status):
+        super(_FSError, self).__init__(status)
+        self.status = status
+
+
+@contextmanager
+def emulated_moku(**kwargs):
+    """ Starts a :any:`MokuEmulator` with the given keyword arguments and
+    yields it along with a :any:`Moku` connected to it, closing both on exit.
+    Raises :any:`zmq.ZMQError` if the Moku:Lab ports are in use. """
+    with MokuEmulator(**kwargs) as emu:
+        m = Moku('127.0.0.1', force=True)
+        try:
+            yield emu, m
+        finally:
+            m.close()
+
+
+def main():
+    parser = ArgumentParser(description="Emulate a Moku:Lab's network "
+                            "interfaces for testing and benchmarking.")
+    parser.add_argument('--ip', default='127.0.0.1',
+                        help="Address to serve on")
+    parser.add_argument('--serial', default='000000')
+    parser.add_argument('--name', default='Emulator')
+    parser.add_argument('--frame-rate', type=float, default=10.0,
+                        help="Frames per second")
+    parser.add_argument('--max-stream-rate', type=float, default=None,
+                        help="Maximum stream records per second per channel")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    with MokuEmulator(args.ip, args.serial, args.name, args.frame_rate,
+                      max_stream_rate=args.max_stream_rate):
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
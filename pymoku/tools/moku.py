@@ -11,6 +11,7 @@ import threading
 import logging
 import zmq
 import re
+import json
 
 import pymoku
 from pymoku import MOKUDATAFILE
@@ -19,9 +20,12 @@ from pymoku import version
 from pymoku import Moku
 from pymoku import PYMOKU_VERSION
 from pymoku.instruments import id_table
+from pymoku.instruments import Datalogger, Phasemeter
 
 from pymoku.tools.compat import patch_is_compatible
 from pymoku.tools.compat import firmware_is_compatible
+from pymoku.tools import bench as _bench
+from pymoku.tools import stream as _stream
 
 MOKUDATAURL = 'http://updates.liquidinstruments.com/static/' + MOKUDATAFILE
 
@@ -374,6 +378,137 @@ parser_firmware.add_argument(
 parser_firmware.set_defaults(func=firmware)
 
 
+# Measure control, file transfer, frame and stream performance
+def bench(args):
+    unknown = set(args.checks) - set(_bench.CHECKS)
+    if unknown:
+        parser_bench.error("Unknown check(s): %s" % ', '.join(unknown))
+
+    moku = None
+    try:
+        moku = connect(args)
+        results = _bench.run(moku, args.checks or _bench.CHECKS,
+                             count=args.count,
+                             size=int(args.size * 2 ** 20),
+                             duration=args.duration)
+    finally:
+        if moku:
+            moku.close()
+
+    print(_bench.format_table(results))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+parser_bench = subparsers.add_parser(
+    'bench', help="Measure the performance of the connection to the Moku. "
+    "Replaces the running instrument.")
+parser_bench.add_argument(
+    'checks', nargs='*',
+    help="Checks to run, from %s (default all)" % ', '.join(_bench.CHECKS))
+parser_bench.add_argument(
+    '--count', type=int, default=200,
+    help="Number of each control request to time")
+parser_bench.add_argument(
+    '--size', type=float, default=16,
+    help="Size of the file transferred, MiB")
+parser_bench.add_argument(
+    '--duration', type=int, default=5,
+    help="Duration of the frame and stream checks, seconds")
+parser_bench.add_argument(
+    '--json', default=None, help="Also save the results to this JSON file")
+parser_bench.set_defaults(func=bench)
+
+
+# Stream Datalogger or Phasemeter data to local files
+def stream(args):
+    moku = None
+    writer = None
+    try:
+        moku = connect(args)
+        if args.instrument == 'datalogger':
+            cls, rate = Datalogger, float(args.rate or 1000)
+        else:
+            cls, rate = Phasemeter, args.rate or 'fast'
+
+        # As deploy_or_connect, but an instrument that's already running
+        # keeps its sample rate unless one is given
+        i = moku.discover_instrument()
+        deployed = not isinstance(i, cls)
+        if deployed:
+            i = moku.deploy_instrument(cls)
+        else:
+            moku.take_ownership()
+
+        if args.rate or deployed:
+            i.set_samplerate(rate)
+
+        ch1, ch2 = 1 in args.channels, 2 in args.channels
+        i.stop_stream_data()
+        i.start_stream_data(duration=args.duration, ch1=ch1, ch2=ch2)
+
+        if 1.0 / i.timestep > i._max_stream_rate(False, 'net'):
+            logging.warning("Sample rate exceeds the maximum network stream "
+                            "rate of %.0f smp/s, expect dropped data"
+                            % i._max_stream_rate(False, 'net'))
+
+        writer = _stream.StreamWriter(
+            args.output, _stream.StreamFormat(i), args.format,
+            rotate_size=args.rotate_size * 2 ** 20 if args.rotate_size
+            else None,
+            rotate_time=args.rotate_time)
+
+        stats = _stream.capture(i, writer, interval=args.interval)
+        i.stop_stream_data()
+    finally:
+        if writer:
+            writer.close()
+        if moku:
+            moku.close()
+
+    print("%d records per channel in %.1fs to %d file(s): %s"
+          % (min(stats['records']), stats['elapsed'], len(writer.files),
+             ', '.join(writer.files)))
+    print("%d gaps, %d chunks dropped locally%s"
+          % (stats['gaps'], stats['dropped'],
+             ', device overflowed' if stats['device_overflow'] else ''))
+
+
+parser_stream = subparsers.add_parser(
+    'stream', help="Stream Datalogger or Phasemeter data to local files. "
+    "Deploys the instrument if it's not already running.")
+parser_stream.add_argument(
+    'instrument', choices=['datalogger', 'phasemeter'])
+parser_stream.add_argument(
+    'output', help="Path and base name of the files to write")
+parser_stream.add_argument(
+    '--rate', default=None,
+    help="Sample rate: smp/s for the Datalogger (default 1000), or one of "
+    "veryslow, slow, medium, fast, veryfast, ultrafast for the Phasemeter "
+    "(default fast). If not given, an instrument that's already running "
+    "keeps its rate.")
+parser_stream.add_argument(
+    '--channels', type=int, nargs='+', choices=[1, 2], default=[1, 2],
+    help="Channels to stream (default both)")
+parser_stream.add_argument(
+    '--duration', type=int, default=60, help="Duration, seconds")
+parser_stream.add_argument(
+    '--format', choices=_stream.FORMATS, default='li',
+    help="File format (default li)")
+parser_stream.add_argument(
+    '--rotate-size', type=float, default=None,
+    help="Start a new file after this much data, MiB")
+parser_stream.add_argument(
+    '--rotate-time', type=float, default=None,
+    help="Start a new file after this long, seconds")
+parser_stream.add_argument(
+    '--interval', type=float, default=1.0,
+    help="Time between progress reports, seconds")
+parser_stream.set_defaults(func=stream)
+
+
 def main():
     logging.info("PyMoku %s" % PYMOKU_VERSION)
     args = parser.parse_args()
@@ -0,0 +1,353 @@
+""" Headless capture of network streams to local files, for ``moku stream``.
+
+The receive loop only takes raw chunks off the stream socket and queues
+them; a background :any:`StreamWriter` thread writes them out, so a slow
+disk or (for NumPy output) the record parsing doesn't hold up the socket.
+If the writer falls behind far enough to fill the queue, chunks are dropped
+and counted rather than blocking the receiver.
+
+Files are written as LI binary files, the raw records as received plus the
+header needed to decode them (see :any:`LIDataFileReader` and
+``moku_convert``), or as NPY arrays of processed samples. Either can be
+rotated to a new file after a given size or duration.
+"""
+import logging
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from pymoku import FrameTimeout, NoDataException
+from pymoku import dataparser
+from pymoku.dataparser import LIDataFileWriterV1, ArrayDataParser
+from pymoku._input_instrument import _STREAM_STATE_OVERFLOW
+
+log = logging.getLogger(__name__)
+
+# Chunks queued between the receiver and writer before they're dropped
+_QUEUE_CHUNKS = 4096
+
+FORMATS = ['li', 'npy']
+
+
+class _LIFile(object):
+    # Raw records with an LI v1 header
+    def __init__(self, fname, fmt, coeffs):
+        self._w = LIDataFileWriterV1(fname, fmt.instr, 0, fmt.chs, fmt.binstr,
+                                     fmt.procstr, fmt.fmtstr, fmt.hdrstr,
+                                     coeffs, fmt.timestep, int(time.time()))
+
+    def write(self, ch, data):
+        self._w.add_data(data, ch)
+
+    def close(self):
+        self._w.finalize()
+
+
+class _NpyFile(object):
+    # Processed samples, written as one array of a column per field per
+    # channel when the file is closed
+    def __init__(self, fname, fmt, coeffs):
+        self.fname = fname
+
+        if ArrayDataParser.supports(fmt.binstr, fmt.procstr):
+            cls = ArrayDataParser
+        else:
+            cls = dataparser.LIDataParser
+
+        self._parser = cls(fmt.ch1, fmt.ch2, fmt.binstr, fmt.procstr,
+                           fmt.fmtstr, fmt.hdrstr, fmt.timestep,
+                           int(time.time()), coeffs, 0)
+
+    def write(self, ch, data):
+        self._parser.parse(data, ch)
+
+    def close(self):
+        chans = self._parser.processed
+        n = min(len(c) for c in chans)
+        np.save(self.fname, np.column_stack(
+            [np.asarray(c[:n], dtype=float) for c in chans]))
+
+
+_FILE_TYPES = {'li': _LIFile, 'npy': _NpyFile}
+
+
+class StreamFormat(object):
+    """
+    What a :any:`StreamWriter` needs to know about the stream, captured from
+    the instrument at the start of the session.
+
+    :type instrument: :any:`StreamBasedInstrument`
+    :param instrument: Instrument whose stream session has been started.
+    """
+    def __init__(self, instrument):
+        self.instr = instrument.id
+        self.ch1, self.ch2 = instrument.ch1, instrument.ch2
+        self.chs = int(self.ch1) | int(self.ch2) << 1
+        self.nch = int(self.ch1) + int(self.ch2)
+        self.binstr = instrument.binstr
+        self.fmtstr = instrument.fmtstr
+        self.hdrstr = instrument.hdrstr
+        self.timestep = instrument.timestep
+
+        # Processing strings for the enabled channels only, matching the
+        # channel indices used on the stream
+        self.procstr = [p for p, en in zip(instrument.procstr,
+                                           [self.ch1, self.ch2]) if en]
+
+        recbits = dataparser.LIDataParser.record_length(self.binstr)
+        self.recbytes = recbits // 8 if recbits % 8 == 0 else None
+
+
+class StreamWriter(object):
+    """
+    Writes raw stream chunks to a series of local files from a background
+    thread.
+
+    Files are named *prefix*\\_0000.\\ *fmt*, *prefix*\\_0001.\\ *fmt* and so
+    on. Each file holds whole records only, with the same number of records
+    (give or take a chunk) for each channel.
+
+    :type prefix: str
+    :param prefix: Path and base name of the files to write.
+
+    :type stream_format: :any:`StreamFormat`
+    :param stream_format: Description of the stream.
+
+    :type fmt: str
+    :param fmt: File type, one of 'li' or 'npy'. NPY requires NumPy.
+
+    :type rotate_size: int
+    :param rotate_size: Start a new file once this many bytes of stream data
+        have been written to the current one, or *None*.
+
+    :type rotate_time: float
+    :param rotate_time: Start a new file after this many seconds, or *None*.
+    """
+    def __init__(self, prefix, stream_format, fmt='li', rotate_size=None,
+                 rotate_time=None):
+        if fmt not in _FILE_TYPES:
+            raise ValueError("Unknown file format %s" % fmt)
+        if fmt == 'npy' and np is None:
+            raise ValueError("NPY output requires NumPy")
+
+        self.prefix = prefix
+        self.format = stream_format
+        self.fmt = fmt
+        self.rotate_size = rotate_size
+        self.rotate_time = rotate_time
+
+        #: Names of the files written so far, including the current one
+        self.files = []
+
+        self._lock = threading.Lock()
+        self.chunks = 0
+        self.bytes = 0
+        self.records = [0] * stream_format.nch
+        # Discontinuities in the data, from chunks lost on the network or
+        # dropped (also counted separately) because the queue was full
+        self.gaps = 0
+        self.dropped = 0
+
+        self._queue = queue.Queue(_QUEUE_CHUNKS)
+        self._coeffs = [None] * stream_format.nch
+        self._expect = [0] * stream_format.nch
+        self._carry = [b''] * stream_format.nch
+        self._pending = []
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened = None
+        self._error = None
+
+        self._thread = threading.Thread(target=self._run,
+                                        name='pymoku-stream-writer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def put(self, ch, start, coeff, data):
+        """ Queue a chunk as received from the stream. Never blocks; if the
+        queue is full the chunk is dropped and counted. """
+        try:
+            self._queue.put_nowait((ch, start, coeff, data))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def close(self):
+        """ Write out everything queued and close the current file. Raises
+        any error that stopped the writer. """
+        self._queue.put(None)
+        self._thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+    def stats(self):
+        """ Returns a dict of the writer's counters. """
+        with self._lock:
+            return {
+                'chunks': self.chunks,
+                'bytes': self.bytes,
+                'records': list(self.records),
+                'gaps': self.gaps,
+                'dropped': self.dropped,
+                'queued': self._queue.qsize(),
+                'files': len(self.files),
+            }
+
+    def _run(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                self._write(*item)
+        except Exception as e:
+            log.exception("Stream writer failed")
+            self._error = e
+
+            # Keep draining so the receiver doesn't count everything after
+            # this as dropped
+            while self._queue.get() is not None:
+                pass
+        finally:
+            self._close_file()
+
+    def _write(self, ch, start, coeff, data):
+        fmt = self.format
+
+        # Realign to a record boundary after lost data, so that every file
+        # holds whole records
+        if start != self._expect[ch]:
+            with self._lock:
+                self.gaps += 1
+            self._carry[ch] = b''
+            if fmt.recbytes:
+                skip = -start % fmt.recbytes
+                data, start = data[skip:], start + skip
+        self._expect[ch] = start + len(data)
+
+        buf = self._carry[ch] + data if self._carry[ch] else data
+        whole = len(buf) - len(buf) % fmt.recbytes if fmt.recbytes \
+            else len(buf)
+        self._carry[ch] = buf[whole:]
+        buf = buf[:whole]
+
+        with self._lock:
+            self.chunks += 1
+            self.bytes += len(data)
+            if fmt.recbytes:
+                self.records[ch] += whole // fmt.recbytes
+
+        if self._coeffs[ch] is None:
+            self._coeffs[ch] = coeff
+
+        if self._file is None:
+            # The file header needs every channel's calibration coefficient,
+            # which arrive with the first chunk on each channel
+            if None in self._coeffs:
+                self._pending.append((ch, buf))
+                return
+            self._open_file()
+
+        self._file.write(ch, buf)
+        self._file_bytes += len(buf)
+
+        # Only rotate after the last channel's chunk, so the channels in
+        # each file cover the same time
+        if ch == fmt.nch - 1 and self._rotate_due():
+            self._close_file()
+            self._open_file()
+
+    def _rotate_due(self):
+        if self.rotate_size and self._file_bytes >= self.rotate_size:
+            return True
+        if self.rotate_time and \
+                time.time() - self._file_opened >= self.rotate_time:
+            return True
+        return False
+
+    def _open_file(self):
+        fname = '%s_%04d.%s' % (self.prefix, len(self.files), self.fmt)
+        self._file = _FILE_TYPES[self.fmt](fname, self.format,
+                                           list(self._coeffs))
+        self._file_bytes = 0
+        self._file_opened = time.time()
+
+        with self._lock:
+            self.files.append(fname)
+
+        pending, self._pending = self._pending, []
+        for ch, buf in pending:
+            self._file.write(ch, buf)
+            self._file_bytes += len(buf)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _report(stats, elapsed, last, interval):
+    rate = (stats['bytes'] - last['bytes']) / interval
+    smps = (min(stats['records']) - min(last['records'])) / interval \
+        if stats['records'] else 0
+    print("%7.1fs %8.2f MiB/s %10.0f smp/s  files %d  gaps %d  dropped %d  "
+          "queued %d" % (elapsed, rate / 2.0 ** 20, smps, stats['files'],
+                         stats['gaps'], stats['dropped'], stats['queued']))
+
+
+def capture(instrument, writer, interval=1.0, timeout=10):
+    """
+    Receives the running network stream session of *instrument*, passing
+    each chunk to *writer* until the session ends or is interrupted
+    (Ctrl-C), and prints a progress line every *interval* seconds.
+
+    Also checks the device's session state at each report and at the end,
+    as the device stops the session if its own buffers overflow.
+
+    :return: dict of *writer*'s counters, with the elapsed time and whether
+        the device overflowed.
+    """
+    t0 = last_report = time.time()
+    last = writer.stats()
+    device_overflow = False
+
+    while True:
+        try:
+            ch, start, coeff, data = \
+                instrument._stream_get_samples_raw(timeout)
+        except NoDataException:
+            break
+        except FrameTimeout:
+            log.warning("No stream data for %d seconds", timeout)
+            break
+        except KeyboardInterrupt:
+            break
+
+        writer.put(ch, start, coeff, data)
+
+        now = time.time()
+        if now - last_report >= interval:
+            stats = writer.stats()
+            _report(stats, now - t0, last, now - last_report)
+            last, last_report = stats, now
+
+            device_overflow |= _overflowed(instrument)
+
+    stats = writer.stats()
+    stats['elapsed'] = time.time() - t0
+    stats['device_overflow'] = device_overflow or _overflowed(instrument)
+    return stats
+
+
+def _overflowed(instrument):
+    return instrument._stream_status()[0] == _STREAM_STATE_OVERFLOW
@@ -29,6 +29,7 @@ setup(
         'console_scripts': [
             'moku=pymoku.tools.moku:main',
             'moku_convert=pymoku.tools.moku_convert:main',
+            'moku_emulator=pymoku.tools.emulator:main',
         ]
     },
 
@@ -1,7 +1,10 @@
 import pytest
 import pymoku
+import zmq
 from functools import partial
 
+from pymoku.tools.emulator import emulated_moku as _emulated_moku
+
 try:
     from unittest.mock import patch
 except ImportError:
@@ -153,3 +156,28 @@ def moku(*kwargs):
             m.configure_mock(**{k + '.side_effect': partial(v, m)})
 
     return m
+
+
+@pytest.fixture
+def emulated_moku():
+    '''
+    Factory taking MokuEmulator arguments (e.g. frame_rate, max_stream_rate)
+    and returning (emulator, moku), a local emulator and a Moku connected to
+    it. Both are closed at the end of the test, which is skipped if the
+    Moku:Lab ports are in use.
+    '''
+    contexts = []
+
+    def connect(frame_rate=0, **kwargs):
+        ctx = _emulated_moku(frame_rate=frame_rate, **kwargs)
+        try:
+            emu, m = ctx.__enter__()
+        except zmq.ZMQError:
+            pytest.skip("Moku:Lab ports in use")
+        contexts.append(ctx)
+        return emu, m
+
+    yield connect
+
+    for ctx in reversed(contexts):
+        ctx.__exit__(None, None, None)
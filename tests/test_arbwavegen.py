@@ -1,12 +1,23 @@
+import array
+import math
+import struct
 import pytest
 
 from pymoku.instruments import ArbitraryWaveGen
 from pymoku import _arbwavegen
+from pymoku import ValueOutOfRangeException
 
 try:
-    from unittest.mock import ANY
+    from unittest.mock import ANY, patch
 except ImportError:
-    from mock import ANY
+    from mock import ANY, patch
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+needs_numpy = pytest.mark.skipif(np is None, reason="requires NumPy")
 
 
 @pytest.fixture
@@ -33,6 +44,137 @@ def test_write_lut(dut, moku):
     moku._write_regs.assert_called_with(ANY)
 
 
+@pytest.mark.parametrize('mode', [0, 1, 2, 3])
+def test_lut_image(mode):
+    np = pytest.importorskip('numpy')
+    steps, stepsize = _arbwavegen._ARB_LUT_STEPS[mode]
+    data = [math.sin(x / 10.0) for x in range(stepsize - 7)] + [1.0, -1.0]
+
+    expected = bytearray()
+    for step in range(steps):
+        for d in data:
+            expected += struct.pack('<hh', int(math.ceil(32767 * d)), 0)
+        expected += b'\0' * (stepsize * 4 - len(data) * 4)
+
+    assert _arbwavegen._lut_image_list(data, mode) == expected
+    assert bytearray(_arbwavegen._lut_image_array(np.array(data), mode)) \
+        == expected
+
+
+def _array_types():
+    if np is None:
+        return []
+    return [np.array([0.5, -0.25, 1.0]),
+            np.array([0.5, -0.25, 1.0], dtype=np.float32)]
+
+
+@pytest.mark.parametrize('data', [
+    [0.5, -0.25, 1.0],
+    array.array('d', [0.5, -0.25, 1.0]),
+] + [pytest.param(d, marks=needs_numpy) for d in _array_types()])
+def test_write_lut_types(dut, moku, data):
+    dut.write_lut(2, data)
+
+    image = moku._send_file_bytes.call_args[0][2]
+    assert moku._send_file_bytes.call_args[1]['offset'] == 8192 * 8 * 4
+    assert bytearray(image)[:12] == struct.pack('<6h', 16384, 0, -8191, 0,
+                                                32767, 0)
+
+
+def test_write_lut_range(dut, moku):
+    with pytest.raises(ValueOutOfRangeException):
+        dut.write_lut(1, [0.0, 1.5])
+    with pytest.raises(ValueOutOfRangeException):
+        dut.write_lut(1, [0.0, float('nan')])
+
+
+@needs_numpy
+def test_write_lut_range_array(dut, moku):
+    with pytest.raises(ValueOutOfRangeException):
+        dut.write_lut(1, np.array([0.0, 1.5]))
+
+
+def _uploaded(moku, image):
+    # Apply the uploads made to channel 1 to a copy of its previous image
+    image = bytearray(image)
+    for c in moku._send_file_bytes.call_args_list:
+        data, offset = bytearray(c[0][2]), c[1]['offset']
+        image[offset:offset + len(data)] = data
+    return image
+
+
+def test_write_lut_incremental(dut, moku):
+    np = pytest.importorskip('numpy')
+    data = np.sin(np.arange(8192) / 100.0)
+    dut.write_lut(1, data)
+    first = bytearray(moku._send_file_bytes.call_args[0][2])
+    assert len(first) == _arbwavegen._ARB_LUT_IMAGE_SIZE
+
+    # Only the changed points are sent, in each of the 8 steps
+    moku.reset_mock()
+    data[100:200] *= 0.5
+    dut.write_lut(1, data)
+    assert moku._send_file_bytes.call_count == 8
+    assert all(len(c[0][2]) == 400
+               for c in moku._send_file_bytes.call_args_list)
+    assert _uploaded(moku, first) == _arbwavegen._lut_image_list(data, 0)
+
+    # Nothing is sent if the LUT hasn't changed
+    moku.reset_mock()
+    dut.write_lut(1, data)
+    moku._send_file_bytes.assert_not_called()
+
+    # Redeploying loses the device memory
+    moku.deploy_instrument(dut)
+    moku.reset_mock()
+    dut.write_lut(1, data)
+    assert moku._send_file_bytes.call_count == 1
+
+
+def test_write_lut_pure_python(dut, moku):
+    data = [math.sin(x / 100.0) for x in range(8192)]
+
+    with patch('pymoku._arbwavegen.np', None):
+        dut.write_lut(1, data)
+        first = bytearray(moku._send_file_bytes.call_args[0][2])
+        assert first == _arbwavegen._lut_image_list(data, 0)
+
+        # Only the changed points are sent, in each of the 8 steps
+        moku.reset_mock()
+        data[100:200] = [d * 0.5 for d in data[100:200]]
+        dut.write_lut(1, data)
+        assert moku._send_file_bytes.call_count == 8
+        assert _uploaded(moku, first) == _arbwavegen._lut_image_list(data, 0)
+
+        moku.reset_mock()
+        dut.write_lut(1, data)
+        moku._send_file_bytes.assert_not_called()
+
+
+@pytest.mark.parametrize('changes', [[], [0], [5, 6, 7, 4000], [8191],
+                                     list(range(0, 8192, 300))])
+def test_lut_dirty_ranges(changes):
+    np = pytest.importorskip('numpy')
+    old = [0.1] * 8192
+    new = list(old)
+    for c in changes:
+        new[c] = -0.1
+
+    for image in [_arbwavegen._lut_image_list,
+                  lambda d, m: _arbwavegen._lut_image_array(np.array(d), m)]:
+        a, b = image(old, 0), image(new, 0)
+        if isinstance(a, np.ndarray):
+            ranges = _arbwavegen._lut_dirty_ranges_array(a, b)
+            a, b = bytearray(a), bytearray(b)
+        else:
+            ranges = _arbwavegen._lut_dirty_ranges_list(a, b)
+
+        assert bool(ranges) == bool(changes)
+        for start, end in ranges:
+            a[start:end] = b[start:end]
+        assert a == b
+
+
 def test_gen_waveform(dut, moku):
     '''
     TODO Default test
@@ -0,0 +1,36 @@
+import json
+import pytest
+
+from pymoku.tools import bench
+
+
+@pytest.fixture
+def m(emulated_moku):
+    return emulated_moku(frame_rate=50)[1]
+
+
+def test_bench(m):
+    results = bench.run(m, count=10, size=2 ** 20, duration=1)
+
+    for op in ['register_read', 'register_write', 'property_read']:
+        assert results['control'][op]['count'] == 10
+    assert results['fileserver']['upload'] > 0
+    assert results['frames']['rate'] > 0
+    assert results['stream']['samples'] > 0
+    assert results['stream']['target'] == pytest.approx(
+        m._instrument._max_stream_rate(False, 'net'), rel=0.01)
+
+    # Scratch file is removed
+    assert m._fs_list('i') == []
+
+    table = bench.format_table(results)
+    assert 'Network stream' in table
+    json.dumps(results)
+
+
+def test_bench_subset(m):
+    results = bench.run(m, ['control'], count=5)
+    assert 'control' in results and 'stream' not in results
+
+    with pytest.raises(ValueError):
+        bench.run(m, ['nope'])
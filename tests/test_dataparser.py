@@ -0,0 +1,42 @@
+import pytest
+import struct
+
+from pymoku.dataparser import ArrayDataParser
+from pymoku.dataparser import SlowDataParser
+from pymoku.dataparser import DataIntegrityException
+
+
+def _parser(cls, procstr=['*0.5', '*C']):
+    return cls(True, True, '<s32', procstr, '', '', 1.0, 0, [2.0, 3.0], 0)
+
+
+def test_array_parser_supports():
+    pytest.importorskip('numpy')
+    assert ArrayDataParser.supports('<s32', ['*0.5', ''])
+    assert ArrayDataParser.supports('<u16', ['*C/2+1', '-3'])
+    assert not ArrayDataParser.supports('<s32', ['&0xFF', ''])
+    assert not ArrayDataParser.supports('<s15:p1,0', ['', ''])
+    assert not ArrayDataParser.supports('<p32,0xAAAAAAAA:s32', ['', ''])
+
+
+def test_array_parser_matches_slow():
+    pytest.importorskip('numpy')
+    fast, slow = _parser(ArrayDataParser), _parser(SlowDataParser)
+
+    data = struct.pack('<6i', 1, -2, 3, -0x80000000, 0x7FFFFFFF, 6)
+    for p in [fast, slow]:
+        # Split mid-record to exercise the partial record handling
+        p.parse(data[:10], 0, start_idx=0)
+        p.parse(data[10:], 0, start_idx=10)
+        p.parse(data, 1, start_idx=0)
+
+    assert fast.processed[0] == pytest.approx(slow.processed[0])
+    assert fast.processed[1] == pytest.approx(slow.processed[1])
+
+
+def test_array_parser_data_loss():
+    pytest.importorskip('numpy')
+    p = _parser(ArrayDataParser)
+    p.parse(b'\x00' * 8, 0, start_idx=0)
+    with pytest.raises(DataIntegrityException):
+        p.parse(b'\x00' * 8, 0, start_idx=16)
@@ -0,0 +1,89 @@
+import pytest
+
+import pymoku
+from pymoku import _arbwavegen
+from pymoku.instruments import Oscilloscope, Datalogger, ArbitraryWaveGen
+
+
+@pytest.fixture
+def emulator_moku(emulated_moku):
+    return emulated_moku(serial='000123', name='Emu', frame_rate=50,
+                         max_stream_rate=10e3)
+
+
+@pytest.fixture
+def emulator(emulator_moku):
+    return emulator_moku[0]
+
+
+@pytest.fixture
+def m(emulator_moku):
+    return emulator_moku[1]
+
+
+def test_properties(m):
+    assert m.get_serial() == '000123'
+    assert m.get_name() == 'Emu'
+
+    m.set_name('Renamed')
+    assert m.get_name() == 'Renamed'
+    m.set_name('Emu')
+
+    with pytest.raises(pymoku.InvalidOperationException):
+        m._get_properties(['system.missing'])
+
+
+def test_registers(m, emulator):
+    m._write_regs([(1, 0xDEADBEEF), (100, 5)])
+    assert m._read_regs([1, 100]) == [(1, 0xDEADBEEF), (100, 5)]
+    assert emulator.registers[100] == 5
+
+
+def test_fileserver(m, tmp_path):
+    data = bytes(bytearray(range(256))) * 1000
+    m._send_file_bytes('e', 'test.bin', data)
+    m._fs_finalise('e', 'test.bin', len(data))
+
+    assert m._fs_size('e', 'test.bin') == len(data)
+    assert [n for n, _, _ in m._fs_list('e')] == ['test.bin']
+
+    local = str(tmp_path / 'test.bin')
+    m._receive_file('e', 'test.bin', 0, local)
+    with open(local, 'rb') as f:
+        assert f.read() == data
+
+    m._delete_file('e', 'test.bin')
+    assert m._fs_list('e') == []
+
+
+def test_memory_map(m, emulator):
+    data = [x / 100.0 for x in range(100)]
+    i = m.deploy_instrument(ArbitraryWaveGen)
+    i.write_lut(1, data)
+
+    image = emulator.files['j']['']
+    assert image == _arbwavegen._lut_image_list(data, 0)
+
+    # An unchanged LUT isn't uploaded again
+    del emulator.files['j']['']
+    i.write_lut(1, data)
+    assert emulator.files['j'] == {}
+
+
+def test_frames(m, emulator):
+    i = m.deploy_instrument(Oscilloscope)
+    assert emulator.instrument == Oscilloscope().id
+
+    frame = i.get_realtime_data(timeout=5)
+    assert len(frame.ch1) == len(frame.ch2)
+
+
+def test_stream(m):
+    i = m.deploy_instrument(Datalogger)
+    i.set_samplerate(1e3)
+
+    i.start_stream_data(duration=1)
+    ch1, ch2 = i.get_stream_data(n=-1, timeout=5)
+    i.stop_stream_data()
+
+    assert len(ch1) == len(ch2) == 1000
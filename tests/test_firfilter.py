@@ -0,0 +1,96 @@
+import math
+import struct
+import pytest
+
+from pymoku.instruments import FIRFilter
+from pymoku import _firfilter
+from pymoku import ValueOutOfRangeException
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+needs_numpy = pytest.mark.skipif(np is None, reason="requires NumPy")
+
+
+@pytest.fixture
+def dut(moku):
+    with patch('pymoku._frame_instrument.FrameBasedInstrument._set_running'):
+        i = FIRFilter()
+        moku.deploy_instrument(i)
+        moku.reset_mock()
+        return i
+
+
+def _reference_image(coeffs):
+    n = max(1, int(math.ceil(len(coeffs) / 29.0)))
+    blocks = [coeffs[x:x + n] for x in range(0, len(coeffs), n)]
+    blocks += [[]] * (29 - len(blocks))
+
+    image = bytearray()
+    for b in blocks:
+        b.reverse()
+        image += struct.pack('<I', len(b))
+        image += struct.pack('<' + 'i' * len(b),
+                             *[int(round((2.0**24 - 1) * c)) for c in b])
+        image += b'\x00' * 4 * (511 - len(b))
+    return image
+
+
+@pytest.mark.parametrize('length', [0, 1, 3, 29, 30, 58, 500, 14819])
+def test_coeff_image(length):
+    coeffs = [math.sin(x / 7.0) for x in range(length)]
+    expected = _reference_image(list(coeffs))
+
+    assert _firfilter._coeff_image_list(coeffs) == expected
+
+
+@needs_numpy
+@pytest.mark.parametrize('length', [0, 1, 3, 29, 30, 58, 500, 14819])
+def test_coeff_image_array(length):
+    coeffs = [math.sin(x / 7.0) for x in range(length)]
+    expected = _reference_image(list(coeffs))
+
+    assert bytearray(_firfilter._coeff_image_array(np.array(coeffs))) == \
+        expected
+
+
+@pytest.mark.parametrize('use_numpy', [
+    pytest.param(True, marks=needs_numpy), False])
+def test_set_filter_incremental(dut, moku, use_numpy):
+    with patch('pymoku._firfilter.np', np if use_numpy else None):
+        _check_set_filter_incremental(dut, moku)
+
+
+def _check_set_filter_incremental(dut, moku):
+    coeffs = [-0.5 + x / 289.0 for x in range(290)]
+    dut.set_filter(2, 4, coeffs)
+    assert moku._send_file_bytes.call_count == 1
+    assert moku._send_file_bytes.call_args[1]['offset'] == 2**17
+
+    # 10 taps per block, so changing taps 25 to 34 touches blocks 2 and 3
+    moku.reset_mock()
+    coeffs[25:35] = [0.0] * 10
+    dut.set_filter(2, 4, coeffs)
+    args = moku._send_file_bytes.call_args
+    assert moku._send_file_bytes.call_count == 1
+    assert args[1]['offset'] == 2**17 + 2 * 2048
+    assert bytearray(args[0][2]) == \
+        _reference_image(list(coeffs))[2 * 2048:4 * 2048]
+
+    # Unchanged coefficients aren't sent, but the registers still commit
+    moku.reset_mock()
+    dut.set_filter(2, 4, coeffs)
+    moku._send_file_bytes.assert_not_called()
+    assert moku._write_regs.called
+
+
+def test_set_filter_range(dut):
+    with pytest.raises(ValueOutOfRangeException):
+        dut.set_filter(1, 4, [0.5, -1.5])
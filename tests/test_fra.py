@@ -1,6 +1,10 @@
 import pytest
+import struct
 
 from pymoku.instruments import FrequencyResponseAnalyzer
+from pymoku.instruments import FRAData
+from pymoku import _frequency_response_analyzer
+from pymoku import _frequency_response_analyzer_data
 
 try:
     from unittest.mock import patch, ANY
@@ -147,3 +151,81 @@ def test_attributes(dut, moku, attr, value):
     setattr(dut, attr, value)
     dut.commit()
     moku._write_regs.assert_called_with(ANY)
+
+
+def _frame(dut):
+    fr = FRAData(instrument=dut, scales=dut.scales)
+    dut._data_syncd = True
+    n = len(dut.scales[dut._stateid]['gain_correction'])
+    # Interleaved I/Q with the last point invalid and one zero point
+    iq = [1000 * (k % 7 - 3) for k in range(2 * n)]
+    iq[0] = iq[1] = 0
+    iq[-2] = iq[-1] = -0x80000000
+    for chan in [0, 1]:
+        fr.add_packet(struct.pack('<BBBBI', dut._stateid, dut._stateid, chan,
+                                  9, 1) + b'\x00' * 32 +
+                      struct.pack('<%di' % len(iq), *iq))
+    return fr
+
+
+def test_frame_decode_array_matches_python(dut, moku):
+    np = pytest.importorskip('numpy')
+
+    fr = _frame(dut)
+    with patch.object(_frequency_response_analyzer_data, 'np', None):
+        ref = _frame(dut)
+
+    for ch, ref_ch in [(fr.ch1, ref.ch1), (fr.ch2, ref.ch2)]:
+        assert ch.magnitude == pytest.approx(ref_ch.magnitude)
+        assert ch.magnitude_dB == pytest.approx(ref_ch.magnitude_dB)
+        assert ch.phase == pytest.approx(ref_ch.phase)
+        assert ch.magnitude[-1] is None and ch.magnitude_dB[0] is None
+
+    h = fr.ch1.transfer
+    assert len(h) == len(fr.ch1.magnitude)
+    assert 20 * np.log10(abs(h[5])) == pytest.approx(fr.ch1.magnitude_dB[5])
+    assert np.angle(h[5]) / (2 * np.pi) == pytest.approx(fr.ch1.phase[5])
+
+
+def test_frame_decode_array_truncated(dut, moku):
+    pytest.importorskip('numpy')
+    fr = FRAData(instrument=dut, scales=dut.scales)
+    dut._data_syncd = True
+
+    # A channel whose data isn't a whole number of samples is rejected
+    for chan in [0, 1]:
+        fr.add_packet(struct.pack('<BBBBI', dut._stateid, dut._stateid, chan,
+                                  9, 1) + b'\x00' * 32 + b'\x00' * 6)
+    assert not fr._complete
+    assert fr._rejected == 1
+    assert not hasattr(fr, 'complete')
+
+
+@pytest.mark.parametrize('log', [True, False])
+def test_sweep_scales_array_matches_python(dut, moku, log):
+    pytest.importorskip('numpy')
+    dut.set_sweep(f_start=10, f_end=1e6, sweep_points=256, sweep_log=log,
+                  averaging_time=1e-3, averaging_cycles=10)
+
+    fs = dut._calculate_freq_axis()
+    gs = dut._calculate_gain_correction(fs)
+    with patch.object(_frequency_response_analyzer, 'np', None):
+        ref_fs = dut._calculate_freq_axis()
+        ref_gs = dut._calculate_gain_correction(ref_fs)
+
+    assert fs == pytest.approx(ref_fs)
+    assert gs == pytest.approx(ref_gs)
+
+
+def test_sweep_scales_cached(dut, moku):
+    with patch.object(dut, '_calculate_gain_correction',
+                      wraps=dut._calculate_gain_correction) as calc:
+        dut.set_output(1, 0.5)
+        dut.set_output(1, 0.2)
+        assert calc.call_count == 0
+
+        dut.set_sweep(averaging_time=2e-3)
+        assert calc.call_count == 1
+
+    scales = dut.scales[dut._stateid]
+    assert len(scales['gain_correction']) == dut.sweep_length
@@ -1,7 +1,9 @@
 import pytest
+import struct
 
 from pymoku.instruments import IIRFilterBox
 from pymoku import _iirfilterbox
+from pymoku import ValueOutOfRangeException
 
 try:
     from unittest.mock import patch, ANY
@@ -50,6 +52,64 @@ def test_set_filter(dut, moku):
     moku._write_regs.assert_called_with(ANY)
 
 
+def test_set_filters(dut, moku):
+    dut.set_filters({1: ('high', filt_coeff), 2: ('low', filt_coeff)})
+
+    # One upload for both channels: the mmap access toggles and the final
+    # commit of the channel settings
+    assert moku._send_file_bytes.call_count == 1
+    assert moku._write_regs.call_count == 3
+    assert dut.output_en1 and dut.output_en2
+    assert dut.filter_ch1 == dut.filter_ch2
+
+    image = moku._send_file_bytes.call_args[0][2]
+    moku.reset_mock()
+    dut.set_filter(1, 'high', filt_coeff)
+    dut.set_filter(2, 'low', filt_coeff)
+    moku._send_file_bytes.assert_not_called()
+    assert moku._write_regs.call_count == 6
+
+    moku.reset_mock()
+    dut.set_filter(2, 'low', [[2.0]] + filt_coeff[1:])
+    assert moku._send_file_bytes.call_args[0][2] != image
+
+
+def test_set_filter_rate_only(dut, moku):
+    dut.set_filter(1, 'high', filt_coeff)
+    moku.reset_mock()
+
+    # Changing only the sample rate sends no coefficients but still toggles
+    # the access bit, which resets the decimation blocks
+    with patch.object(dut, '_set_mmap_access',
+                      wraps=dut._set_mmap_access) as access:
+        dut.set_filter(1, 'low', filt_coeff)
+
+    moku._send_file_bytes.assert_not_called()
+    moku._fs_finalise.assert_not_called()
+    assert [c[0][0] for c in access.call_args_list] == [True, False]
+
+
+def test_convert_filter():
+    table = _iirfilterbox._convert_filter(
+        [[3.0]] + [[2.0, 1.0, 0.5, 0.25, -1.5, 0.75]] * 4)
+    assert table == [[1.0, 2.0, 1.0, 0.5, -1.5, 0.75]] * 3 + \
+        [[3.0, 2.0, 1.0, 0.5, -1.5, 0.75]]
+
+    image = _iirfilterbox._filter_image(table, [[0.0] * 6] * 4)
+    assert struct.unpack('<48q', image)[:4] == (2**24, 2**24, 2**24, 3 * 2**24)
+    assert struct.unpack('<48q', image)[4:8] == (2**46,) * 4
+
+
+def test_set_filters_invalid(dut, moku):
+    bad = [[1.0]] + filt_coeff[1:4] + [[1.0, 0.13, 0.122, 0.130, -4.5, 0.2]]
+    with pytest.raises(ValueOutOfRangeException):
+        dut.set_filters({1: ('high', filt_coeff), 2: ('high', bad)})
+
+    # Nothing is changed if either channel is invalid
+    moku._send_file_bytes.assert_not_called()
+    moku._write_regs.assert_not_called()
+
+
 def test_disable_output(dut, moku):
     '''
     TODO Default test
@@ -0,0 +1,124 @@
+import pytest
+import random
+
+from pymoku import instruments
+from pymoku import ValueOutOfRangeException
+from pymoku import InvalidOperationException
+from pymoku._instrument import _RegisterAccessor
+from pymoku._instrument import _SNAPSHOT_SKIP_REGS
+from pymoku._sweep_generator import SweepGenerator
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+_classes = [c for c in set(instruments.id_table.values()) if c is not None]
+
+
+@pytest.fixture(params=_classes, ids=lambda c: c.__name__)
+def dut(request, moku):
+    with patch('pymoku._frame_instrument.FrameBasedInstrument._set_running'):
+        i = request.param()
+        moku.deploy_instrument(i)
+        return i
+
+
+def test_register_descriptors_match_table(dut):
+    # Every register in the handler table is backed by a class-level
+    # descriptor that reads and writes the same as the table entry
+    rnd = random.Random(1)
+    dut._remoteregs = [rnd.getrandbits(32) for _ in range(128)]
+
+    for name, (reg, set_xform, get_xform) in dut._accessor_dict.items():
+        assert isinstance(getattr(type(dut), name), _RegisterAccessor)
+        if get_xform is None or get_xform.__name__ == '__us':
+            continue
+
+        value = getattr(dut, name)
+        assert value == dut._accessor_get(reg, get_xform)
+
+        if set_xform is None:
+            continue
+
+        dut._localregs = [None] * 128
+        try:
+            setattr(dut, name, value)
+        except Exception:
+            # Not every random register value is a valid setting
+            continue
+
+        expected = dut._localregs
+        dut._localregs = [None] * 128
+        dut._accessor_set(reg, set_xform, value)
+        assert dut._localregs == expected
+
+
+def test_register_field_compound(moku):
+    i = instruments.WaveformGenerator()
+    moku.deploy_instrument(i)
+    sweep = i._sweep1
+
+    sweep.start = 0x123456789A
+    msb = sweep.reg_base + SweepGenerator._REG_START_MSB
+    lsb = sweep.reg_base + SweepGenerator._REG_START_LSB
+    assert i._localregs[msb] == 0x12
+    assert i._localregs[lsb] == 0x3456789A
+    assert sweep.start == 0x123456789A
+
+    with pytest.raises(ValueOutOfRangeException):
+        sweep.waveform = 7
+
+
+def test_snapshot_restore(dut, moku, tmpdir):
+    filename = str(tmpdir.join('snapshot.json'))
+    snap = dut.snapshot(filename)
+
+    with patch('pymoku._frame_instrument.FrameBasedInstrument._set_running'):
+        new = type(dut)()
+        moku.deploy_instrument(new)
+
+    new._remoteregs = [0] * 128
+    moku.reset_mock()
+    new.restore(filename)
+
+    # All registers go out in the first write, only the memory map access
+    # commits may follow
+    regs = dict(moku._write_regs.call_args_list[0][0][0])
+    for i, r in enumerate(snap['registers']):
+        if r is not None and i not in _SNAPSHOT_SKIP_REGS:
+            assert regs[i] == r
+
+    for name, value in snap['attributes'].items():
+        assert getattr(new, name) == value
+
+    if snap['scales'] is not None:
+        assert new.scales[new._stateid] == snap['scales']
+
+
+def test_restore_wrong_instrument(moku):
+    i = instruments.WaveformGenerator()
+    moku.deploy_instrument(i)
+    snap = i.snapshot()
+
+    with patch('pymoku._frame_instrument.FrameBasedInstrument._set_running'):
+        osc = instruments.Oscilloscope()
+        moku.deploy_instrument(osc)
+
+    with pytest.raises(InvalidOperationException):
+        osc.restore(snap)
+
+
+def test_restore_uploads_filters(moku):
+    with patch('pymoku._frame_instrument.FrameBasedInstrument._set_running'):
+        i = instruments.FIRFilter()
+        moku.deploy_instrument(i)
+
+    i.set_filter(1, 3, [0.1, 0.2, 0.3])
+    uploaded = bytearray(moku._send_file_bytes.call_args[0][2])
+    snap = i.snapshot()
+
+    moku.reset_mock()
+    i.restore(snap)
+
+    assert bytearray(moku._send_file_bytes.call_args[0][2]) == uploaded
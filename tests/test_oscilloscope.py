@@ -1,7 +1,14 @@
 import pytest
+import struct
+import threading
+import time
 
 from pymoku.instruments import Oscilloscope
+from pymoku.instruments import FrameReplayer
 from pymoku import _oscilloscope
+from pymoku import _frame_instrument
+from pymoku import FrameTimeout, InvalidOperationException
+from pymoku._oscilloscope_data import VoltsData
 
 try:
     from unittest.mock import patch, ANY
@@ -96,3 +103,140 @@ def test_attributes(dut, moku, attr, value):
     setattr(dut, attr, value)
     dut.commit()
     moku._write_regs.assert_called_with(ANY)
+
+
+def _frame(dut, waveformid, stateid, value=1):
+    fr = VoltsData(instrument=dut, scales=dut.scales)
+    for chan in [0, 1]:
+        fr.add_packet(struct.pack('<BBBBI', stateid, stateid, chan, 1,
+                                  waveformid) + b'\x00' * 32 +
+                      struct.pack('<i', value) * 1024)
+    return fr
+
+
+def test_segment_capture(dut, moku):
+    pytest.importorskip('numpy')
+    dut._data_syncd = True
+    cap = _frame_instrument._SegmentCapture(2, 1024, dut._stateid)
+
+    cap.add(_frame(dut, 1, dut._stateid), 1.0)
+    # Repeated waveform and stale state are both dropped
+    cap.add(_frame(dut, 1, dut._stateid), 2.0)
+    cap.add(_frame(dut, 2, (dut._stateid - 1) % 256), 3.0)
+    assert not cap.done.is_set()
+
+    cap.add(_frame(dut, 3, dut._stateid, value=2), 4.0)
+    assert cap.done.is_set()
+
+    data = cap.data
+    assert data.ch1.shape == (2, 1024)
+    assert list(data.waveformids) == [1, 3]
+    assert list(data.timestamps) == [1.0, 4.0]
+    scale = dut.scales[dut._stateid]['scale_ch1']
+    assert data.ch1[1, 0] == pytest.approx(2 * scale)
+
+
+def test_capture_segments_timeout(dut, moku):
+    pytest.importorskip('numpy')
+    with pytest.raises(FrameTimeout):
+        dut.capture_segments(10, timeout=0.01)
+    assert dut._segments is None
+
+
+def test_capture_segments_no_numpy(dut, moku):
+    with patch('pymoku._frame_instrument.np', None):
+        with pytest.raises(InvalidOperationException):
+            dut.capture_segments(10, timeout=0.01)
+    assert dut._segments is None
+
+
+def test_frame_record_replay(dut, moku, tmpdir):
+    fname = str(tmpdir.join('frames.fr'))
+    dut.start_frame_recording(fname)
+    for wid in [1, 2]:
+        for chan in [0, 1]:
+            dut._recorder.add_packet(
+                struct.pack('<BBBBI', dut._stateid, dut._stateid, chan, 1,
+                            wid) + b'\x00' * 32 +
+                struct.pack('<i', wid) * 1024, 100.0 + wid)
+    assert dut.stop_frame_recording() == 4
+
+    with FrameReplayer(fname, Oscilloscope()) as r:
+        frames = list(r)
+
+    assert [f.waveformid for f in frames] == [1, 2]
+    assert frames[1].ch1 == _frame(dut, 2, dut._stateid, value=2).ch1
+
+
+def test_get_realtime_data_waits_for_state(dut, moku):
+    dut._running = True
+    dut._data_syncd = True
+    stale = _frame(dut, 1, (dut._stateid - 1) % 256)
+    fresh = _frame(dut, 2, dut._stateid)
+
+    dut._publish_frame(stale)
+    t = threading.Timer(0.05, dut._publish_frame, [fresh])
+    t.start()
+
+    assert dut.get_realtime_data(timeout=5) is fresh
+    assert dut._skipped_frames == 1
+
+    # Each frame is only returned once
+    with pytest.raises(FrameTimeout):
+        dut.get_realtime_data(timeout=0.01)
+    dut._running = False
+
+
+def test_frame_stats(dut, moku):
+    dut._running = True
+    dut._data_syncd = True
+    dut.reset_stats()
+
+    # Overwritten before anyone looked, then skipped for stale state
+    dut._publish_frame(_frame(dut, 1, dut._stateid))
+    dut._publish_frame(_frame(dut, 2, (dut._stateid - 1) % 256))
+    fresh = _frame(dut, 3, dut._stateid)
+    fresh._rxtime = time.time()
+    t = threading.Timer(0.05, dut._publish_frame, [fresh])
+    t.start()
+
+    assert dut.get_realtime_data(timeout=5) is fresh
+    dut._running = False
+
+    stats = dut.stats()
+    assert stats['delivered'] == 1
+    assert stats['dropped']['superseded'] == 1
+    assert stats['dropped']['stale'] == 1
+    assert stats['latency']['count'] == 1
+    assert sum(n for _, n in stats['latency']['buckets']) == 1
+
+
+def test_frame_incomplete_counted(dut, moku):
+    fr = VoltsData(instrument=dut, scales=dut.scales)
+    fr.add_packet(struct.pack('<BBBBI', 1, 1, 0, 1, 1) + b'\x00' * 32)
+    fr.add_packet(struct.pack('<BBBBI', 1, 1, 0, 1, 2) + b'\x00' * 32)
+    assert fr._incomplete == 1
+    assert not fr._complete
+
+
+def test_deferred_commit(dut, moku):
+    state = dut._stateid
+
+    with dut.deferred_commit():
+        dut.set_frontend(1, fiftyr=True)
+        dut.set_frontend(2, fiftyr=False)
+        with dut.deferred_commit():
+            dut.set_timebase(-1e-3, 1e-3)
+        dut.set_trigger('in1', 'rising', 0)
+        moku._write_regs.assert_not_called()
+
+    assert moku._write_regs.call_count == 1
+    assert dut._stateid == (state + 1) % 256
+    assert dut._stateid in dut.scales
+    assert not dut.check_uncommitted_state()
+
+
+def test_deferred_commit_nothing_set(dut, moku):
+    with dut.deferred_commit():
+        pass
+    moku._write_regs.assert_not_called()
@@ -0,0 +1,164 @@
+import pytest
+import struct
+
+import pymoku
+from pymoku import _protocol
+from pymoku._rpc import ReqChannel
+
+try:
+    from unittest.mock import MagicMock
+except ImportError:
+    from mock import MagicMock
+
+
+@pytest.fixture
+def conn():
+    # A Moku object talking to a fake REQ socket
+    m = pymoku.Moku.__new__(pymoku.Moku)
+    m._conn = MagicMock()
+    m._rpc = ReqChannel(m._conn)
+    m._seq = 0
+    return m
+
+
+def _old_property_request(seq, properties):
+    pkt = bytearray([0x46, seq, len(properties)])
+    for p in properties:
+        pkt += bytearray([1, len(p)])
+        pkt += p.encode('ascii')
+        pkt += bytearray([0])
+    return pkt
+
+
+@pytest.mark.parametrize('props', [
+    [],
+    [('system.name', 'Moku')],
+    [('calibration.AG-1', '1.5'), ('calibration.AG-2', ''),
+     ('device.serial', '000123')],
+])
+def test_property_reply_roundtrip(props):
+    pkt = _protocol.pack_property_reply(7, 0, props)
+    assert _protocol.unpack_property_reply(bytes(pkt)) == (0x46, 7, 0, props)
+
+
+def test_property_requests():
+    props = ['system.name', 'device.serial']
+    assert _protocol.pack_property_read(3, props) == \
+        _old_property_request(3, props)
+
+    assert _protocol.pack_property_write(4, [('a', 'bc')]) == \
+        bytearray([0x46, 4, 1, 2, 1]) + b'a' + bytearray([2]) + b'bc'
+
+    assert _protocol.pack_property_section(5, 'calibration') == \
+        bytearray([0x46, 5, 1, 3, 11]) + b'calibration' + bytearray([0])
+
+
+def test_reg_roundtrip():
+    regs = [(0, 0), (1, 0xFFFFFFFF), (127, 12345)]
+    assert _protocol.pack_reg_read([0, 1, 127]) == \
+        bytearray([0x47, 0, 3, 0, 1, 127])
+    assert _protocol.pack_reg_write(regs) == bytearray([0x47, 0, 3]) + \
+        b''.join(struct.pack('<BI', r + 0x80, d) for r, d in regs)
+
+    reply = bytes(_protocol.pack_reg_reply(regs))
+    assert _protocol.unpack_reg_reply(reply) == (0x47, 0, regs)
+
+    # Truncated replies don't raise, they return fewer registers
+    assert _protocol.unpack_reg_reply(reply[:-1])[2] == regs[:2]
+
+
+@pytest.mark.parametrize('crc,sha,chk', [
+    (False, False, ''),
+    (True, False, (0xDEADBEEF,)),
+    (False, True, 'ab' * 32),
+])
+def test_fs_list_roundtrip(crc, sha, chk):
+    names = [(u'a.bin', chk, 10), (u'b\u00e9.li', chk, 2 ** 40)]
+    data = _protocol.pack_fs_list(names, crc, sha)
+    assert _protocol.unpack_fs_list(data, crc, sha) == names
+
+
+def test_fs_request():
+    assert _protocol.pack_fs_request(5, b'e:\x00') == \
+        struct.pack('<BQB', 0x49, 4, 5) + b'e:\x00'
+
+
+def test_get_properties(conn):
+    props = [('system.name', 'Moku'), ('device.serial', '000123')]
+    conn._conn.recv.return_value = \
+        bytes(_protocol.pack_property_reply(1, 0, props))
+
+    assert conn._get_properties([p for p, _ in props]) == props
+    assert conn._conn.send.call_args[0][0] == \
+        _old_property_request(1, [p for p, _ in props])
+
+
+def test_get_properties_error(conn):
+    conn._conn.recv.return_value = \
+        bytes(_protocol.pack_property_reply(1, 2, [('system.bad', '')]))
+
+    with pytest.raises(pymoku.InvalidOperationException) as e:
+        conn._get_properties(['system.bad'])
+    assert 'system.bad' in str(e.value)
+
+    # Only the first property of an error reply is parsed, even if the count
+    # claims more
+    reply = bytearray(_protocol.pack_property_reply(1, 2, [('system.bad',
+                                                            '')]))
+    reply[3] = 3
+    conn._conn.recv.return_value = bytes(reply)
+    with pytest.raises(pymoku.InvalidOperationException):
+        conn._get_properties(['system.bad'])
+
+    conn._conn.recv.return_value = b'\x47\x01\x00\x00'
+    with pytest.raises(pymoku.NetworkError):
+        conn._get_property_section('calibration')
+
+
+def test_read_write_regs(conn):
+    conn._conn.recv.return_value = \
+        bytes(_protocol.pack_reg_reply([(1, 2), (3, 4)]))
+    assert conn._read_regs([1, 3]) == [(1, 2), (3, 4)]
+
+    with pytest.raises(pymoku.NetworkError):
+        conn._read_regs([1, 3, 5])
+
+    conn._conn.recv.return_value = bytes(_protocol.pack_reg_reply([]))
+    conn._write_regs([(1, 2)])
+
+
+def test_fs_list(conn):
+    names = [(u'a.bin', '', 10), (u'b.li', '', 20)]
+    data = b'\x05\x00' + _protocol.pack_fs_list(names)
+    conn._conn.recv.return_value = struct.pack('<BQ', 0x49, len(data)) + data
+    assert conn._fs_list('e') == names
+
+
+@pytest.mark.parametrize('reply', [
+    struct.pack('<BQ', 0x49, 2) + b'\x05',
+    struct.pack('<BQ', 0x49, 1) + b'\x05',
+    struct.pack('<BQ', 0x49, 0),
+])
+def test_fs_short_reply(conn, reply):
+    conn._conn.recv.return_value = reply
+    with pytest.raises(pymoku.NetworkError):
+        conn._fs_list('e')
+
+
+def test_request_parsing():
+    # The emulator's view of the requests Moku builds
+    assert _protocol.unpack_property_request(
+        bytes(_protocol.pack_property_write(4, [('a', 'bc')]))) == \
+        (4, [(_protocol.PROP_WRITE, 'a', 'bc')])
+
+    assert _protocol.unpack_reg_request(
+        bytes(_protocol.pack_reg_read([1, 127]))) == ([1, 127], [])
+    assert _protocol.unpack_reg_request(
+        bytes(_protocol.pack_reg_write([(1, 2), (127, 3)]))) == \
+        ([], [(1, 2), (127, 3)])
+
+    assert _protocol.unpack_fs_request(
+        bytes(_protocol.pack_fs_request(5, b'e\x00'))) == (5, b'e\x00')
+
+    reply = _protocol.pack_fs_reply(4, 0, b'\x01\x02')
+    assert _protocol.unpack_fs_reply(reply)[3:] == (4, 0, b'\x01\x02')
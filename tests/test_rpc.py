@@ -0,0 +1,229 @@
+import pytest
+import threading
+import time
+import zmq
+
+import pymoku
+from pymoku import _protocol
+from pymoku._rpc import ReqChannel, MuxChannel, rpc_op
+
+try:
+    from unittest.mock import MagicMock
+except ImportError:
+    from mock import MagicMock
+
+
+@pytest.fixture
+def ctx():
+    return zmq.Context.instance()
+
+
+def _server(ctx, kind, handler):
+    # Minimal device: a REP or ROUTER socket on a random local port serving
+    # requests with handler(frames) -> frames until sent b'stop'
+    skt = ctx.socket(kind)
+    port = skt.bind_to_random_port('tcp://127.0.0.1')
+
+    def serve():
+        while True:
+            frames = skt.recv_multipart()
+            if frames[-1] == b'stop':
+                skt.send_multipart(frames)
+                break
+            for reply in handler(frames):
+                skt.send_multipart(reply)
+        skt.close()
+
+    t = threading.Thread(target=serve)
+    t.daemon = True
+    t.start()
+    return 'tcp://127.0.0.1:%d' % port
+
+
+def _client(ctx, kind, addr):
+    skt = ctx.socket(kind)
+    skt.setsockopt(zmq.LINGER, 0)
+    skt.connect(addr)
+    return skt
+
+
+def _echo(frames):
+    return [frames[:-1] + [b're:' + frames[-1]]]
+
+
+def test_req_channel(ctx):
+    addr = _server(ctx, zmq.REP, _echo)
+    chan = ReqChannel(_client(ctx, zmq.REQ, addr))
+    chan.set_timeout(1000, 1000)
+
+    assert chan.request(b'abc') == b're:abc'
+    chan.request(b'stop')
+    chan.close()
+
+
+def test_mux_channel_rep(ctx):
+    # A plain REP device echoes the envelope, so replies find their way back
+    # to the right thread
+    addr = _server(ctx, zmq.REP, _echo)
+    chan = MuxChannel(ctx, _client(ctx, zmq.DEALER, addr))
+    results = {}
+
+    def worker(n):
+        results[n] = [chan.request(b'%d-%d' % (n, i)) for i in range(20)]
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for n in range(4):
+        assert results[n] == [b're:%d-%d' % (n, i) for i in range(20)]
+
+    chan.request(b'stop')
+    chan.close()
+
+
+def test_mux_channel_short_lived_threads(ctx):
+    # Threads that exit don't leave sockets behind
+    addr = _server(ctx, zmq.REP, _echo)
+    chan = MuxChannel(ctx, _client(ctx, zmq.DEALER, addr))
+    results = []
+
+    for n in range(50):
+        t = threading.Thread(
+            target=lambda n=n: results.append(chan.request(b'%d' % n)))
+        t.start()
+        t.join()
+
+    assert results == [b're:%d' % n for n in range(50)]
+
+    chan.request(b'stop')
+    chan.close()
+    assert chan._sender.closed
+
+
+def test_mux_channel_out_of_order(ctx):
+    # Replies are matched by sequence ID, not arrival order
+    held = []
+
+    def swap(frames):
+        held.append(frames)
+        if len(held) < 2:
+            return []
+        replies = [_echo(f)[0] for f in reversed(held)]
+        del held[:]
+        return replies
+
+    addr = _server(ctx, zmq.ROUTER, swap)
+    chan = MuxChannel(ctx, _client(ctx, zmq.DEALER, addr))
+    results = {}
+
+    def worker(n):
+        results[n] = chan.request(b'%d' % n)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(2)]
+    for t in threads:
+        t.start()
+        time.sleep(0.05)
+    for t in threads:
+        t.join()
+
+    assert results == {0: b're:0', 1: b're:1'}
+
+    chan.request(b'stop')
+    chan.close()
+
+
+def test_mux_channel_timeout(ctx):
+    addr = _server(ctx, zmq.ROUTER, lambda frames: [])
+    chan = MuxChannel(ctx, _client(ctx, zmq.DEALER, addr))
+    chan.set_timeout(100, 100)
+
+    with pytest.raises(zmq.error.Again):
+        chan.request(b'abc')
+    assert not chan._pending
+
+    chan.set_timeout(1000, 1000)
+    chan.request(b'stop')
+    chan.close()
+
+
+@pytest.fixture
+def conn():
+    # A Moku object talking to a fake REQ socket
+    m = pymoku.Moku.__new__(pymoku.Moku)
+    m._conn = MagicMock()
+    m._rpc = ReqChannel(m._conn)
+    m._rpc_stats = None
+    m._rpc_stats_hook = None
+    m._seq = 0
+    m._ip = '192.168.0.1'
+    m.serial = '000123'
+    return m
+
+
+@pytest.mark.parametrize('pkt,op', [
+    (_protocol.pack_property_read(1, ['a']), 'property.read'),
+    (_protocol.pack_property_section(1, 'a'), 'property.section'),
+    (_protocol.pack_reg_read([1]), 'register.read'),
+    (_protocol.pack_reg_write([(1, 2)]), 'register.write'),
+    (_protocol.pack_fs_request(5, b'e'), 'fileserver.list'),
+    (bytearray([0x53, 2, 0, 0, 0, 0, 3]), 'stream.status'),
+    (bytearray([0x43, 1, 0]), 'deploy'),
+    (bytearray([0x99]), 'unknown.0x99'),
+    (b'', 'unknown'),
+])
+def test_rpc_op(pkt, op):
+    assert rpc_op(pkt) == op
+
+
+def test_rpc_stats(conn):
+    assert conn.rpc_stats() is None
+
+    conn._conn.recv.return_value = bytes(_protocol.pack_reg_reply([(1, 2)]))
+    conn._read_regs([1])
+    assert conn.rpc_stats() is None
+
+    calls = []
+    conn.enable_rpc_stats(hook=lambda *args: calls.append(args))
+    conn._read_regs([1])
+    conn._read_regs([1])
+
+    stats = conn.rpc_stats()
+    assert stats['serial'] == '000123'
+    reads = stats['ops']['register.read']
+    assert reads['count'] == 2
+    assert reads['bytes_out'] == 2 * 4
+    assert reads['bytes_in'] == 2 * 8
+    assert reads['latency']['count'] == 2
+    assert [c[:3] + c[4:] for c in calls] == \
+        [('register.read', 4, 8, False)] * 2
+
+    conn._conn.recv.side_effect = zmq.error.Again()
+    with pytest.raises(zmq.error.Again):
+        conn._read_regs([1])
+    assert conn.rpc_stats()['ops']['register.read']['errors'] == 1
+    assert calls[-1][:3] + calls[-1][4:] == ('register.read', 4, 0, True)
+
+    # Disabling restores the uninstrumented path
+    conn.disable_rpc_stats()
+    assert '_transact' not in vars(conn)
+    conn._conn.recv.side_effect = None
+    conn._read_regs([1])
+    assert conn.rpc_stats()['ops']['register.read']['count'] == 3
+
+    conn.reset_rpc_stats()
+    assert conn.rpc_stats()['ops'] == {}
+
+
+def test_rpc_stats_hook_error(conn):
+    def hook(*args):
+        raise RuntimeError("broken hook")
+
+    conn.enable_rpc_stats(hook=hook)
+    conn._conn.recv.return_value = bytes(_protocol.pack_reg_reply([(1, 2)]))
+
+    # The request still succeeds and is recorded
+    assert conn._read_regs([1]) == [(1, 2)]
+    assert conn.rpc_stats()['ops']['register.read']['count'] == 1
@@ -1,7 +1,12 @@
 import pytest
+import bisect
+import struct
 
 from pymoku.instruments import SpectrumAnalyzer
+from pymoku.instruments import SpectrumData
 from pymoku import _specan
+from pymoku import _specan_data
+from pymoku._frame_instrument_data import ScalesRegistry
 
 try:
     from unittest.mock import patch, ANY
@@ -106,3 +111,77 @@ def test_attributes(dut, moku, attr, value):
     setattr(dut, attr, value)
     dut.commit()
     moku._write_regs.assert_called_with(ANY)
+
+
+def _frame(dut, value=1000):
+    fr = SpectrumData(instrument=dut, scales=dut.scales)
+    dut._data_syncd = True
+    for chan in [0, 1]:
+        fr.add_packet(struct.pack('<BBBBI', dut._stateid, dut._stateid, chan,
+                                  2, 1) + b'\x00' * 32 +
+                      struct.pack('<i', value) * 1024)
+    return fr
+
+
+def test_frame_decode(dut, moku):
+    scales = dut.scales[dut._stateid]
+    start = bisect.bisect_right(scales['fs'], scales['fspan'][0])
+
+    fr = _frame(dut)
+    assert fr._complete
+    assert fr.frequency == scales['fs'][start:-1]
+    assert len(fr.ch1) == len(fr.frequency)
+    assert fr.ch1[0] == pytest.approx(fr._vrms_to_dbm(
+        1000 * scales['fcorrs'][start] * scales['g1']))
+
+
+@pytest.mark.parametrize('dbm', [True, False])
+def test_frame_decode_array_matches_python(dut, moku, dbm):
+    pytest.importorskip('numpy')
+    dut.set_dbmscale(dbm)
+    dut.commit()
+
+    fr = _frame(dut, value=12345)
+    with patch.object(_specan_data, 'np', None):
+        ref = _frame(dut, value=12345)
+
+    assert fr.frequency == ref.frequency
+    assert fr.ch1 == pytest.approx(ref.ch1)
+    assert fr.ch2 == pytest.approx(ref.ch2)
+
+
+@pytest.mark.parametrize('span', [(0, 250e6), (1e6, 2e6)])
+def test_freq_tables_array_matches_python(dut, moku, span):
+    pytest.importorskip('numpy')
+    dut.set_span(*span)
+
+    fs, fcorrs = dut._calculate_freq_tables_array()
+    ref_fs, ref_fcorrs = dut._calculate_freq_tables_list()
+
+    assert fs == pytest.approx(ref_fs)
+    assert fcorrs == pytest.approx(ref_fcorrs)
+
+
+def test_freq_tables_cached(dut, moku):
+    with patch.object(dut, '_calculate_freq_tables_list') as calc, \
+            patch.object(dut, '_calculate_freq_tables_array') as calc_array:
+        calc.return_value = calc_array.return_value = ([], [])
+
+        dut.set_dbmscale(False)
+        dut.set_window('hanning')
+        assert calc.call_count + calc_array.call_count == 0
+
+        dut.set_span(1e6, 2e6)
+        assert calc.call_count + calc_array.call_count == 1
+
+
+def test_scales_registry_bounded(dut, moku):
+    reg = ScalesRegistry(derive=lambda s: {'double': s['x'] * 2}, maxlen=4)
+    for i in range(6):
+        reg[i] = {'x': i}
+
+    assert len(reg) == 4
+    assert 0 not in reg and 1 not in reg
+    assert reg[5] == {'x': 5}
+    assert reg.derived(5) == {'double': 10}
+    assert reg.lookup(0) == (None, None)
@@ -0,0 +1,82 @@
+import pytest
+import random
+import pymoku
+
+from functools import partial
+from pymoku import instruments
+from pymoku._instrument import REG_STATE
+from pymoku._state_cache import StateCache
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+@pytest.fixture
+def device(moku, tmpdir):
+    # Random but fixed register state of a running Oscilloscope
+    rnd = random.Random(2)
+    regs = [rnd.getrandbits(32) for _ in range(128)]
+    regs[REG_STATE] = 0x00050005
+
+    moku._state_cache = StateCache(str(tmpdir))
+    moku._get_property_single.side_effect = lambda p: \
+        '1.000' if p == 'system.instrument' else '0'
+    moku._read_regs.side_effect = lambda rs: [(r, regs[r]) for r in rs]
+    moku.serial = '123456'
+
+    for name in ['discover_instrument', '_enable_state_cache',
+                 '_load_cached_state', '_save_cached_state']:
+        getattr(moku, name).side_effect = \
+            partial(getattr(pymoku.Moku, name), moku)
+
+    return regs
+
+
+def _discover(moku):
+    with patch('pymoku._frame_instrument.FrameBasedInstrument._set_running'):
+        return moku.discover_instrument(use_cache=True)
+
+
+def test_state_cache_roundtrip(tmpdir):
+    cache = StateCache(str(tmpdir.join('state')))
+    assert cache.load('123456', 1) is None
+
+    snap = {'instrument': 1, 'registers': [1, 2, 3]}
+    cache.save('123456', snap)
+    assert cache.load('123456', 1) == snap
+    assert cache.load('123456', 2) is None
+
+    cache.invalidate('123456', 1)
+    assert cache.load('123456', 1) is None
+
+
+def test_discover_uses_cache(moku, device):
+    first = _discover(moku)
+    assert isinstance(first, instruments.Oscilloscope)
+    assert moku._read_regs.call_count == 1
+    assert first._stateid == 5
+
+    # Reconnecting only reads back the registers needed to validate the
+    # cached state
+    moku.reset_mock(return_value=False, side_effect=False)
+    second = _discover(moku)
+    assert moku._read_regs.call_count == 1
+    assert len(moku._read_regs.call_args[0][0]) == 3
+
+    assert second._remoteregs == first._remoteregs
+    assert second._stateid == first._stateid
+    assert second.scales[5] == first.scales[5]
+    assert second._trig_level == first._trig_level
+
+
+def test_discover_stale_cache(moku, device):
+    _discover(moku)
+
+    # Someone else has reconfigured the instrument
+    device[REG_STATE] = 0x00060006
+
+    i = _discover(moku)
+    assert moku._read_regs.call_args[0][0] == list(range(128))
+    assert i._stateid == 6
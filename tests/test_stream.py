@@ -0,0 +1,109 @@
+import pytest
+import struct
+
+from pymoku.dataparser import LIDataFileReader
+from pymoku.instruments import Datalogger
+from pymoku.tools import stream
+from pymoku.tools import moku as moku_cli
+
+
+@pytest.fixture
+def fmt():
+    i = Datalogger()
+    i.ch1 = i.ch2 = True
+    i.procstr = ['*2', '*C']
+    return stream.StreamFormat(i)
+
+
+def _chunks(values, split):
+    # Chunks of '<s32' records, split mid-record
+    data = struct.pack('<%di' % len(values), *values)
+    return [(x, data[x:x + split]) for x in range(0, len(data), split)]
+
+
+def _read(fname):
+    reader = LIDataFileReader(fname)
+    try:
+        return reader.readall()
+    finally:
+        reader.close()
+
+
+def test_writer_li_rotation(tmp_path, fmt):
+    prefix = str(tmp_path / 'log')
+    w = stream.StreamWriter(prefix, fmt, 'li', rotate_size=100)
+
+    for start, data in _chunks(list(range(100)), 30):
+        w.put(0, start, 1.0, data)
+        w.put(1, start, 3.0, data)
+    w.close()
+
+    assert w.stats()['records'] == [100, 100]
+    assert len(w.files) > 2
+
+    rows = sum([_read(f) for f in w.files], [])
+    assert rows == [[2.0 * n, 3.0 * n] for n in range(100)]
+
+
+def test_writer_gap(tmp_path, fmt):
+    w = stream.StreamWriter(str(tmp_path / 'log'), fmt, 'li')
+    chunks = _chunks(list(range(20)), 10)
+
+    # A chunk lost mid-record realigns to the next whole record
+    for start, data in chunks[:2] + chunks[3:]:
+        w.put(0, start, 1.0, data)
+        w.put(1, start, 1.0, data)
+    w.close()
+
+    assert w.stats()['gaps'] == 2
+    rows = _read(w.files[0])
+    assert [r[0] for r in rows] == [2.0 * n for n in list(range(5)) +
+                                    list(range(8, 20))]
+
+
+def test_writer_npy(tmp_path, fmt):
+    np = pytest.importorskip('numpy')
+    w = stream.StreamWriter(str(tmp_path / 'log'), fmt, 'npy')
+
+    for start, data in _chunks(list(range(10)), 12):
+        w.put(0, start, 1.0, data)
+        w.put(1, start, 1.0, data)
+    w.close()
+
+    assert w.files[0].endswith('.npy')
+    a = np.load(w.files[0])
+    assert a.shape == (10, 2)
+    assert list(a[:, 1]) == list(range(10))
+
+
+def test_capture(tmp_path, emulated_moku):
+    _, m = emulated_moku()
+    i = m.deploy_or_connect(Datalogger)
+    i.set_samplerate(1000)
+    i.start_stream_data(duration=1, ch1=True, ch2=False)
+
+    w = stream.StreamWriter(str(tmp_path / 'log'), stream.StreamFormat(i))
+    stats = stream.capture(i, w)
+    i.stop_stream_data()
+    w.close()
+
+    assert stats['records'] == [1000]
+    assert not stats['device_overflow']
+    assert len(_read(w.files[0])) == 1000
+
+
+@pytest.mark.parametrize('rate,expected', [(None, 500), ('2000', 2000)])
+def test_stream_command_rate(tmp_path, emulated_moku, rate, expected):
+    # The command only changes the rate of an already running instrument if
+    # asked to
+    _, m = emulated_moku()
+    m.deploy_instrument(Datalogger).set_samplerate(500)
+
+    argv = ['--ip', '127.0.0.1', '--force', 'stream', 'datalogger',
+            str(tmp_path / 'log'), '--duration', '1', '--channels', '1']
+    if rate:
+        argv += ['--rate', rate]
+    moku_cli.stream(moku_cli.parser.parse_args(argv))
+
+    assert m.discover_instrument().get_samplerate() == \
+        pytest.approx(expected, rel=0.01)